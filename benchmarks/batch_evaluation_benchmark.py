@@ -0,0 +1,51 @@
+"""
+Benchmark for evaluating many positions: per board python loops (getLineRuns on every stone,
+as updateStatus does for the last move) vs vectorised evaluateBoards over the whole batch.
+
+Run from project root:
+    python -m benchmarks.batch_evaluation_benchmark
+"""
+
+import time
+
+import numpy as np
+
+from mnk.helpers.batch_evaluation import evaluateBoards
+from mnk.helpers.tictactoe_helper import getLineRuns
+
+
+CONFIGS = [(3, 3, 3, 100_000), (15, 15, 5, 10_000)] # rows, columns, win length, boards
+
+
+def evaluateLoop(board, win_length):
+    """
+    status code of one list-of-lists board, 0 in progress, 1/2 player wins, 3 tied
+    """
+    vacant = False
+    for row, cells in enumerate(board):
+        for col, cell in enumerate(cells):
+            if cell == 0:
+                vacant = True
+            elif max(getLineRuns(row, col, board, cell, win_length)) >= win_length:
+                return cell
+    return 0 if vacant else 3
+
+
+if __name__ == "__main__":
+    generator = np.random.default_rng(7)
+    for rows, columns, win_length, count in CONFIGS:
+        boards = generator.choice(np.array([0, 1, 2], dtype=np.int8), size=(count, rows, columns), p=[0.6, 0.2, 0.2])
+        board_lists = boards.tolist()
+
+        start = time.perf_counter()
+        loop_status = [evaluateLoop(board, win_length) for board in board_lists]
+        loop_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        status, _, _ = evaluateBoards(boards, win_length)
+        batch_seconds = time.perf_counter() - start
+
+        # same results, except boards where both players have a line (loop reports the first found)
+        agree = sum(1 for a, b in zip(loop_status, status.tolist()) if a == b) / count
+        print(f"{rows}x{columns} k={win_length}: loop {count / loop_seconds:10,.0f} boards/sec  "
+            f"batch {count / batch_seconds:12,.0f} boards/sec  ({loop_seconds / batch_seconds:5.1f}x, {agree:.1%} agree)")
@@ -0,0 +1,77 @@
+"""
+Benchmark for move application + win detection of the last move: list-of-lists board vs bitboard engine.
+
+Run from project root:
+    python -m benchmarks.bitboard_benchmark
+"""
+
+import random
+import time
+
+from mnk.helpers import tictactoe_helper
+from mnk.models.bitboard import BitBoard
+from mnk.models.tictactoe_models import GameMode, GameStatus, TicTacToeData
+
+
+GAMES = 2000
+CONFIGS = [(3, 3, 3), (15, 15, 5), (19, 19, 5)]
+
+
+def randomGames(rows, columns, games):
+    cells = [(r, c) for r in range(rows) for c in range(columns)]
+    sequences = []
+    for _ in range(games):
+        random.shuffle(cells)
+        sequences.append(list(cells))
+    return sequences
+
+
+def newGame(rows, columns, win_length):
+    return TicTacToeData(id="bench", status=GameStatus.IN_PROGRESS, created="",
+        mode=GameMode.TWO_PLAYER, player_1="x", player_2="o", player_turn="x",
+        rows=rows, columns=columns, win_length=win_length)
+
+
+def benchListPath(sequences, rows, columns, win_length):
+    moves = 0
+    start = time.perf_counter()
+    for sequence in sequences:
+        game = newGame(rows, columns, win_length)
+        for row, col in sequence:
+            game.board[row][col] = game.player_turn
+            game.number_of_vacant_cells -= 1
+            moves += 1
+            if max(tictactoe_helper.getLineRuns(row, col, game.board, game.player_turn, win_length)) >= win_length:
+                break
+            game.player_turn = game.player_1 if (game.player_turn == game.player_2) else game.player_2
+    return moves / (time.perf_counter() - start)
+
+
+def benchBitboardPath(sequences, rows, columns, win_length):
+    moves = 0
+    start = time.perf_counter()
+    for sequence in sequences:
+        bitboard = BitBoard(rows, columns, win_length)
+        player = 0
+        for row, col in sequence:
+            bitboard.place(row, col, player)
+            moves += 1
+            # as updateStatus does for every move of the api
+            if max(bitboard.getLineRuns(row, col, player)) >= win_length:
+                break
+            player ^= 1
+    return moves / (time.perf_counter() - start)
+
+
+def main():
+    random.seed(42)
+    print(f"{'board':<12}{'list moves/s':>16}{'bitboard moves/s':>20}")
+    for rows, columns, win_length in CONFIGS:
+        sequences = randomGames(rows, columns, GAMES)
+        list_rate = benchListPath(sequences, rows, columns, win_length)
+        bitboard_rate = benchBitboardPath(sequences, rows, columns, win_length)
+        print(f"{f'{rows}x{columns} k={win_length}':<12}{list_rate:>16,.0f}{bitboard_rate:>20,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Microbenchmark of the timestamp work done per move:
+before: strftime when the move is made, strptime before the db write, strftime again for moves read back from db
+after: datetime kept as is, formatted once for the json response with getDateToStr
+
+Run from project root:
+    python -m benchmarks.datetime_benchmark
+"""
+
+import timeit
+from datetime import datetime
+
+from mnk.helpers.tictactoe_helper import getDateToStr, getNow
+from mnk.models.tictactoe_constants import Constants
+
+
+MOVES = 100_000
+
+
+def before():
+    created = datetime.now().astimezone().strftime(Constants.DATE_FORMAT)
+    db_value = datetime.strptime(created, Constants.DATE_FORMAT)
+    return db_value.strftime(Constants.DATE_FORMAT)
+
+
+def after():
+    created = getNow()
+    return getDateToStr(created)
+
+
+def report(name, function):
+    seconds = min(timeit.repeat(function, number=MOVES, repeat=5))
+    print(f"{name:<8} {seconds / MOVES * 1e6:7.3f} us per move")
+    return seconds
+
+
+if __name__ == "__main__":
+    before_seconds = report("before", before)
+    after_seconds = report("after", after)
+    print(f"speedup  {before_seconds / after_seconds:7.1f}x")
@@ -0,0 +1,52 @@
+"""
+Bytes per cached game:
+before: TicTacToeData, list of lists board, one Move object per move
+after: CompactGame, bytearray board and moves packed in an array
+
+Run from project root:
+    python -m benchmarks.memory_benchmark
+"""
+
+import random
+import tracemalloc
+from datetime import timedelta
+
+from mnk.helpers.tictactoe_helper import getNow, placePawn
+from mnk.models.compact_game import CompactGame
+from mnk.models.tictactoe_models import GameMode, GameStatus, Move, TicTacToeData
+
+
+GAMES = 2_000
+BOARDS = [(3, 3, 3, 5), (15, 15, 5, 40)] # rows, columns, win length, moves made
+
+
+def getGame(index: int, rows: int, columns: int, win_length: int, moves: int) -> TicTacToeData:
+    created = getNow()
+    game = TicTacToeData(f"game-{index:06d}", GameStatus.IN_PROGRESS, created, mode=GameMode.TWO_PLAYER,
+        player_1="x", player_2="o", player_turn="x", rows=rows, columns=columns, win_length=win_length)
+    cells = random.sample([(row, col) for row in range(rows) for col in range(columns)], moves)
+    for number, (row, col) in enumerate(cells):
+        pawn = "x" if number % 2 == 0 else "o"
+        placePawn(row, col, pawn, game)
+        game.moves.append(Move(pawn, row, col, created + timedelta(seconds=number)))
+    return game
+
+
+def measure(build) -> float:
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    games = [build(index) for index in range(GAMES)]
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del games
+    return used / GAMES
+
+
+if __name__ == "__main__":
+    random.seed(7)
+    for rows, columns, win_length, moves in BOARDS:
+        games = [getGame(index, rows, columns, win_length, moves) for index in range(GAMES)]
+        before = measure(lambda index: getGame(index, rows, columns, win_length, moves))
+        after = measure(lambda index: CompactGame(games[index]))
+        print(f"{rows}x{columns}, {moves} moves: before {before:8.0f} B/game  after {after:6.0f} B/game"
+            f"  ({before / after:4.1f}x smaller)")
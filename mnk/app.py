@@ -1,40 +1,151 @@
+import asyncio
 import logging
+import time
 
-from fastapi import FastAPI
-from mnk.routers import tictactoe
-from mnk.database import database
+from fastapi import FastAPI, Request
+from mnk.routers import admin, metrics, tictactoe
+from mnk.metrics import Metrics, SamplingProfiler
+from mnk.database import getDatabase
+from mnk.migrations import migrate
+from mnk.repository.game_repository import GameRepo, getCacheBackend
+from mnk.repository.table_repository import TableRepo
+from mnk.repository.move_journal import MoveJournal
+from mnk.repository.game_db_repository import GameDBRepo
+from mnk.repository.shard_router import ShardRouter, getNodes
+from mnk.repository.position_cache import PositionCache
+from mnk.repository.game_archive import GameArchive
+from mnk.svc import tictactoe_service
 from .config import settings
 
 logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S', level=logging.INFO)
 
-cache_enabled = settings.use_cache
-
 tags_metadata = [
     {
         "name": "tictactoe",
         "description": "Operations performed on tictactoe, like creating a game and making a move.",
     },
+    {
+        "name": "admin",
+        "description": "Operational stats of the app.",
+    },
+    {
+        "name": "metrics",
+        "description": "Latency metrics in prometheus text format.",
+    },
 ]
 
 app = FastAPI(openapi_tags=tags_metadata, title="TicTacToe")
 
 app.include_router(tictactoe.router)
+app.include_router(admin.router)
+app.include_router(metrics.router)
+
+# background task writing journaled moves to db, in write-behind mode
+flush_worker: asyncio.Task = None
+
+# background task moving finished games to the archive, when enabled
+archive_worker: asyncio.Task = None
+
+# sampling profiler for slow requests, when enabled
+profiler: SamplingProfiler = None
+
+
+
+@app.middleware("http")
+async def measureRequest(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        end = time.perf_counter()
+        # labelled by endpoint name, so paths with game ids do not make a series each
+        endpoint = request.scope.get("endpoint")
+        route = endpoint.__name__ if endpoint else "unmatched"
+        Metrics.observeRequest(route, status, end - start)
+        if profiler:
+            profiler.onRequest(route, start, end)
+
 
 
 @app.on_event("startup")
 async def startup():
+    global flush_worker, archive_worker, profiler
+    # settings and the db pool are only built here, importing the app needs no environment or db
+    if settings.db_migrate_on_startup:
+        await asyncio.get_running_loop().run_in_executor(None, migrate)
+
+    database = getDatabase()
     if not database.is_connected:
         await database.connect()
-    
+
+    GameRepo.backend = getCacheBackend()
+    tictactoe.cache_enabled = settings.use_cache
+
+    # games owned by this node, when the api runs on several nodes
+    ShardRouter.configure(getNodes(settings.shard_nodes), settings.shard_self.rstrip("/"),
+        settings.shard_vnodes, settings.shard_forward_timeout)
+
+    # memory map perfect play tables, so computer moves on those boards are lookups
+    TableRepo.loadTables()
+
+    # processes searching computer moves, one search at a time each
+    await tictactoe_service.startSearchProcesses(settings.search_workers)
+
+    if settings.position_cache_enabled:
+        PositionCache.active = PositionCache(settings.position_cache_size)
+        PositionCache.active.load(settings.position_cache_path)
+
+    if settings.write_behind:
+        MoveJournal.active = MoveJournal(settings.journal_path, GameDBRepo.saveJournalEntries, settings.journal_flush_batch)
+        # replay entries that were not written before the last shutdown/crash
+        replay_count = len(MoveJournal.active.pending)
+        await MoveJournal.active.flushAll()
+        logging.info(f"Journal | {replay_count} unflushed entries replayed")
+        flush_worker = asyncio.create_task(MoveJournal.active.runFlushWorker(settings.journal_flush_interval))
+
+    if settings.archive_enabled:
+        GameArchive.active = GameArchive(settings.archive_after_days, settings.archive_batch)
+        archive_worker = asyncio.create_task(GameArchive.active.runArchiveWorker(settings.archive_interval))
+
+    if settings.profile_slow_requests:
+        profiler = SamplingProfiler(settings.profile_dir, settings.profile_threshold / 1000, settings.profile_interval / 1000)
+        profiler.start()
+
     logging.info("APP STARTED!")
-    logging.info(f"Config | In memory cache enabled: {cache_enabled}")
+    logging.info(f"Config | In memory cache enabled: {settings.use_cache}")
+    logging.info(f"Config | Write-behind enabled: {settings.write_behind}")
+    logging.info(f"Config | Position cache enabled: {settings.position_cache_enabled}")
+    logging.info(f"Config | Sharding enabled: {ShardRouter.ring is not None}")
+    logging.info(f"Config | Archival enabled: {settings.archive_enabled}")
+    logging.info(f"Config | Slow request profiling enabled: {profiler is not None}")
 
 
 
 @app.on_event("shutdown")
 async def shutdown():
-    logging.INFO("Shutting down app.")
+    logging.info("Shutting down app.")
+    if flush_worker:
+        flush_worker.cancel()
+        # write whatever is left before disconnecting
+        await MoveJournal.active.flushAll()
+        MoveJournal.active.close()
+
+    if archive_worker:
+        archive_worker.cancel()
+
+    await ShardRouter.close()
+
+    tictactoe_service.stopSearchProcesses()
+
+    if PositionCache.active:
+        PositionCache.active.save(settings.position_cache_path)
+
+    if profiler:
+        profiler.stop()
+
+    database = getDatabase()
     if database.is_connected:
         await database.disconnect()
-    
-    
\ No newline at end of file
@@ -1,8 +1,73 @@
+from functools import lru_cache
+
 from pydantic import BaseSettings, Field
 
 
 class Settings(BaseSettings):
     db_url: str = Field(..., env='DATABASE_URL')
+    # create/upgrade the schema on startup, for single process runs (with several workers run `python -m mnk.migrations` first)
+    db_migrate_on_startup: bool = Field(False, env='DB_MIGRATE_ON_STARTUP')
+    # postgres connection pool, sized to the concurrent requests a worker serves
+    db_pool_min_size: int = Field(5, env='DB_POOL_MIN_SIZE') # connections kept open
+    db_pool_max_size: int = Field(20, env='DB_POOL_MAX_SIZE')
+    # prepared statements kept per connection, 0 to disable (e.g. behind pgbouncer in transaction mode)
+    db_statement_cache_size: int = Field(1024, env='DB_STATEMENT_CACHE_SIZE')
+    db_command_timeout: float = Field(30, env='DB_COMMAND_TIMEOUT') # seconds per query
+    db_connect_timeout: float = Field(10, env='DB_CONNECT_TIMEOUT') # seconds
+    db_max_idle_time: float = Field(300, env='DB_MAX_IDLE_TIME') # seconds before an idle connection above min size is closed
     use_cache: bool = Field(..., env='CACHE_ENABLED')
+    cache_size: int = Field(10_000, env='CACHE_SIZE') # max number of games in cache
+    cache_ttl: float = Field(300, env='CACHE_TTL') # seconds
+    cache_policy: str = Field('LRU', env='CACHE_POLICY') # LRU, LFU or TINY_LFU
+    cache_sliding_ttl: bool = Field(True, env='CACHE_SLIDING_TTL') # restart ttl whenever a game is used
+    # LOCAL: cache per worker process, SHARED: cache server shared by all workers
+    cache_backend: str = Field('LOCAL', env='CACHE_BACKEND')
+    cache_address: str = Field('127.0.0.1:50055', env='CACHE_ADDRESS') # host:port of the shared cache server
+    cache_authkey: str = Field('', env='CACHE_AUTHKEY') # secret shared with the cache server, required for SHARED
+    # write-behind mode: moves are journaled locally and written to the db in the background
+    write_behind: bool = Field(False, env='WRITE_BEHIND')
+    journal_path: str = Field('journal/moves.journal', env='JOURNAL_PATH') # one process per journal, run one worker per path
+    journal_flush_interval: float = Field(0.2, env='JOURNAL_FLUSH_INTERVAL') # seconds
+    journal_flush_batch: int = Field(500, env='JOURNAL_FLUSH_BATCH') # entries per db transaction
+    # sharding: base urls of all app nodes (comma separated) and of this node, empty to disable
+    shard_nodes: str = Field('', env='SHARD_NODES')
+    shard_self: str = Field('', env='SHARD_SELF')
+    shard_vnodes: int = Field(160, env='SHARD_VNODES') # points per node on the hash ring
+    shard_forward_timeout: float = Field(5, env='SHARD_FORWARD_TIMEOUT') # seconds
+    # computer moves found by search, shared by all games and saved to disk on shutdown
+    position_cache_enabled: bool = Field(True, env='POSITION_CACHE_ENABLED')
+    position_cache_size: int = Field(100_000, env='POSITION_CACHE_SIZE') # max number of positions
+    position_cache_path: str = Field('cache/positions.json', env='POSITION_CACHE_PATH')
+    # processes searching MEDIUM/HARD computer moves, about one per cpu core
+    search_workers: int = Field(4, env='SEARCH_WORKERS')
+    # background archival of finished games, on one node only (or run `python -m mnk.repository.game_archive` from cron)
+    archive_enabled: bool = Field(False, env='ARCHIVE_ENABLED')
+    archive_after_days: float = Field(30, env='ARCHIVE_AFTER_DAYS') # age of the finished games to archive
+    archive_interval: float = Field(3600, env='ARCHIVE_INTERVAL') # seconds between runs
+    archive_batch: int = Field(1000, env='ARCHIVE_BATCH') # games per transaction
+    # sampling profiler, writes a profile of every request slower than the threshold
+    profile_slow_requests: bool = Field(False, env='PROFILE_SLOW_REQUESTS')
+    profile_threshold: float = Field(500, env='PROFILE_THRESHOLD') # milliseconds
+    profile_interval: float = Field(5, env='PROFILE_INTERVAL') # milliseconds between samples
+    profile_dir: str = Field('profiles', env='PROFILE_DIR')
+
+
+
+@lru_cache()
+def getSettings() -> Settings:
+    return Settings()
+
+
+
+class LazySettings:
+    """
+    Settings read from the environment on first use (app startup), so modules can be imported
+    by tests and tools without DATABASE_URL.
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(getSettings(), name)
+
+
 
-settings = Settings()
\ No newline at end of file
+settings: Settings = LazySettings()
@@ -1,51 +1,104 @@
-
-from datetime import datetime
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import AsyncIterator, Dict
 import databases
-import ormar
 import sqlalchemy
 
 from .config import settings
+from .metrics import Metrics
+from .models.tictactoe_models import Difficulty, GameMode, GameStatus
 
 
 
-database = databases.Database(settings.db_url)
-metadata = sqlalchemy.MetaData()
-
-
-
-class BaseMeta(ormar.ModelMeta):
-    metadata = metadata
-    database = database
-
-
-
-class Games(ormar.Model):
-    class Meta(BaseMeta):
-        tablename = "games"
-
-    id: str = ormar.String(primary_key=True, max_length=128)
-    mode: str = ormar.String(max_length=128, nullable=False)
-    player_1_pawn: str = ormar.String(max_length=128, nullable=False)
-    player_2_pawn: str = ormar.String(max_length=128, nullable=False)
-    player_turn: str = ormar.String(max_length=128, nullable=False)
-    status: str = ormar.String(max_length=128, nullable=False)
-    created: datetime = ormar.DateTime(timezone=True, nullable=False)
-
-
-
-class Moves(ormar.Model):
-    class Meta(BaseMeta):
-        tablename = "moves"
-
-    id: int = ormar.Integer(primary_key=True)
-    game: Optional[Games] = ormar.ForeignKey(Games, skip_reverse=True)
-    pawn: str = ormar.String(max_length=128, nullable=False)
-    row: int = ormar.Integer(nullable=False)
-    column: int = ormar.Integer(nullable=False)
-    created: datetime = ormar.DateTime(timezone=True, nullable=False)
-
+## schema
+# Tables are only declared here, they are created and upgraded by the bootstrap step (mnk.migrations),
+# so importing the app needs neither a database nor DATABASE_URL.
 
+metadata = sqlalchemy.MetaData()
 
-engine = sqlalchemy.create_engine(settings.db_url)
-metadata.create_all(engine)
\ No newline at end of file
+# enum types on postgres (4 bytes a value), labels are the values of the python enums
+game_mode = sqlalchemy.Enum(*[mode.value for mode in GameMode], name="game_mode")
+game_status = sqlalchemy.Enum(*[status.value for status in GameStatus], name="game_status")
+difficulty = sqlalchemy.Enum(*[level.value for level in Difficulty], name="difficulty")
+
+games = sqlalchemy.Table("games", metadata,
+    sqlalchemy.Column("id", sqlalchemy.String(128), primary_key=True),
+    sqlalchemy.Column("mode", game_mode, nullable=False),
+    sqlalchemy.Column("player_1_pawn", sqlalchemy.String(128), nullable=False),
+    sqlalchemy.Column("player_2_pawn", sqlalchemy.String(128), nullable=False),
+    sqlalchemy.Column("player_turn", sqlalchemy.String(128), nullable=False),
+    sqlalchemy.Column("status", game_status, nullable=False),
+    sqlalchemy.Column("created", sqlalchemy.DateTime(timezone=True), nullable=False),
+    sqlalchemy.Column("rows", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("columns", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("win_length", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("difficulty", difficulty, nullable=False),
+    sqlalchemy.Column("version", sqlalchemy.Integer, nullable=False), # bumped on every update, for optimistic concurrency
+    sqlalchemy.Column("board_snapshot", sqlalchemy.Text, nullable=True), # packed stone masks (BitBoard.getSnapshot), null for games saved before snapshots
+)
+
+moves = sqlalchemy.Table("moves", metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("game", sqlalchemy.String(128), sqlalchemy.ForeignKey("games.id"), nullable=True),
+    sqlalchemy.Column("pawn", sqlalchemy.String(128), nullable=False),
+    sqlalchemy.Column("row", sqlalchemy.SmallInteger, nullable=False),
+    sqlalchemy.Column("column", sqlalchemy.SmallInteger, nullable=False),
+    sqlalchemy.Column("created", sqlalchemy.DateTime(timezone=True), nullable=False),
+)
+
+# move history of a game is read in order and paged by id
+moves_game_index = sqlalchemy.Index("ix_moves_game_id", moves.c.game, moves.c.id)
+
+# active games only, a small index however many finished games the table holds
+games_in_progress_index = sqlalchemy.Index("ix_games_in_progress", games.c.created,
+    postgresql_where=games.c.status == GameStatus.IN_PROGRESS.value)
+
+# finished games, found by age to move them to the archive (games_archive, created by mnk.migrations)
+games_finished_index = sqlalchemy.Index("ix_games_finished", games.c.created,
+    postgresql_where=games.c.status != GameStatus.IN_PROGRESS.value)
+
+
+
+def getPoolOptions(db_url: str) -> Dict:
+    """
+    asyncpg pool options from the settings, other dialects keep their defaults
+    """
+    if not db_url.startswith("postgres"):
+        return {}
+    return {"min_size": settings.db_pool_min_size, "max_size": settings.db_pool_max_size,
+        "statement_cache_size": settings.db_statement_cache_size, "command_timeout": settings.db_command_timeout,
+        "timeout": settings.db_connect_timeout, "max_inactive_connection_lifetime": settings.db_max_idle_time}
+
+
+@lru_cache()
+def getDatabase() -> databases.Database:
+    """
+    the database of this process, built on first use (app startup), connected by the app
+    """
+    return databases.Database(settings.db_url, **getPoolOptions(settings.db_url))
+
+
+
+# set while the current task holds a connection taken with getConnection
+connection_held: ContextVar[bool] = ContextVar("connection_held", default=False)
+
+
+
+@asynccontextmanager
+async def getConnection() -> AsyncIterator[databases.core.Connection]:
+    """
+    connection of the current task. The wait for a free connection of the pool is timed
+    as the db_pool_wait stage, when the task does not hold one already.
+    """
+    held = connection_held.get()
+    start = time.perf_counter()
+    async with getDatabase().connection() as connection:
+        if not held:
+            Metrics.observeStage("db_pool_wait", time.perf_counter() - start)
+        token = connection_held.set(True)
+        try:
+            yield connection
+        finally:
+            connection_held.reset(token)
@@ -52,4 +52,49 @@ class GameNotFoundException(Exception):
     """
     def __init__(self):
         message = 'The game against which operation was attempted does not exist.'
-        super().__init__(message)
\ No newline at end of file
+        super().__init__(message)
+
+
+class ConcurrentUpdateException(Exception):
+    """
+    Thrown when the game was updated by another request since it was read.
+    """
+    def __init__(self):
+        message = 'The game was updated by another request, please retry.'
+        super().__init__(message)
+
+
+class ShardUnavailableException(Exception):
+    """
+    Thrown when the request could not be forwarded to the node owning the game.
+    """
+    def __init__(self):
+        message = 'The server owning the game is unavailable, please retry.'
+        super().__init__(message)
+
+
+class MisdirectedShardException(Exception):
+    """
+    Thrown when a request forwarded by another node is for games this node does not own.
+    """
+    def __init__(self, owners):
+        message = f'The games of this request are owned by {", ".join(sorted(owners))}, not this server.'
+        super().__init__(message)
+
+
+class CrossShardBatchException(Exception):
+    """
+    Thrown when the games of a batch of moves are owned by different nodes.
+    """
+    def __init__(self):
+        message = 'All moves of a batch must be for games owned by the same server.'
+        super().__init__(message)
+
+
+class JournalLockedException(Exception):
+    """
+    Thrown when the journal file is already in use by another process.
+    """
+    def __init__(self, path: str):
+        message = f'Journal {path} is in use by another process, write-behind mode needs one journal path per worker.'
+        super().__init__(message)
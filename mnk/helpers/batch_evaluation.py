@@ -0,0 +1,86 @@
+"""
+Vectorised evaluation of many m-n-k positions at once, for analytics and training data.
+Boards are (N, rows, columns) int8 arrays: 0 vacant, 1 player_1, 2 player_2.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from mnk.models.tictactoe_models import GameStatus, TicTacToeData
+
+
+# status codes of evaluateBoards, index into STATUSES
+IN_PROGRESS, PLAYER_1_WINS, PLAYER_2_WINS, TIED = 0, 1, 2, 3
+STATUSES = (GameStatus.IN_PROGRESS, GameStatus.PLAYER_1_WINS, GameStatus.PLAYER_2_WINS, GameStatus.TIED)
+
+VACANT, PLAYER_1, PLAYER_2 = 0, 1, 2
+
+# line directions as (row step, column step): horizontal, vertical, main diagonal, reverse diagonal
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+
+def getBoardArray(games: List[TicTacToeData]) -> np.ndarray:
+    """
+    boards of games of the same size as one (N, rows, columns) int8 array
+    """
+    boards = np.zeros((len(games), games[0].rows, games[0].columns), dtype=np.int8)
+    for index, game in enumerate(games):
+        pawns = {game.player_1: PLAYER_1, game.player_2: PLAYER_2}
+        boards[index] = [[pawns.get(cell, VACANT) for cell in row] for row in game.board]
+    return boards
+
+
+def getWindowSums(cells: np.ndarray, win_length: int) -> List[np.ndarray]:
+    """
+    Sum of cells over every line of win_length cells, one (N, windows) array per direction.
+    Each direction is a sliding-window sum, i.e. a convolution with a line of win_length ones,
+    done as win_length shifted slice additions over the whole batch.
+    """
+    _, rows, columns = cells.shape
+    sums = []
+    for row_step, col_step in DIRECTIONS:
+        window_rows = rows - row_step * (win_length - 1)
+        window_columns = columns - abs(col_step) * (win_length - 1)
+        if window_rows <= 0 or window_columns <= 0:
+            continue
+        # windows are identified by their first cell, reverse diagonals start in the right end column
+        col_start = 0 if col_step >= 0 else win_length - 1
+        total = np.zeros((cells.shape[0], window_rows, window_columns), dtype=np.int16)
+        for offset in range(win_length):
+            row, col = offset * row_step, col_start + offset * col_step
+            total += cells[:, row:row + window_rows, col:col + window_columns]
+        sums.append(total.reshape(cells.shape[0], -1))
+    return sums
+
+
+def evaluateBoards(boards: np.ndarray, win_length: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Evaluates all boards at once, returns:
+    - status: (N,) int8 status code (IN_PROGRESS, PLAYER_1_WINS, PLAYER_2_WINS, TIED)
+    - legal: (N, rows, columns) bool mask of the cells that can be played, none once the game is over
+    - threats: (N, 2) number of lines each player is one stone away from completing (rest of the line vacant)
+    Positions where both players have a line are not reachable in a game, player_1 wins for those.
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    vacant = boards == VACANT
+    stones = [(boards == player).astype(np.int16) for player in (PLAYER_1, PLAYER_2)]
+
+    vacant_sums = getWindowSums(vacant.astype(np.int16), win_length)
+    wins = []
+    threats = np.zeros((boards.shape[0], 2), dtype=np.int32)
+    for player, player_stones in enumerate(stones):
+        player_sums = getWindowSums(player_stones, win_length)
+        wins.append(np.zeros(boards.shape[0], dtype=bool))
+        for player_sum, vacant_sum in zip(player_sums, vacant_sums):
+            wins[player] |= (player_sum == win_length).any(axis=1)
+            threats[:, player] += ((player_sum == win_length - 1) & (vacant_sum == 1)).sum(axis=1)
+
+    status = np.full(boards.shape[0], IN_PROGRESS, dtype=np.int8)
+    status[~vacant.any(axis=(1, 2))] = TIED
+    status[wins[1]] = PLAYER_2_WINS
+    status[wins[0]] = PLAYER_1_WINS
+
+    legal = vacant & (status == IN_PROGRESS)[:, None, None]
+    return status, legal, threats
@@ -0,0 +1,75 @@
+"""
+Board symmetries (rotations and reflections) used to share work between equivalent positions
+"""
+
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+
+
+@lru_cache(maxsize=None)
+def getSymmetries(rows: int, columns: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    cell permutations of the board, cells numbered row-major (row * columns + col).
+    permutation[cell] is where the cell lands after the transform.
+    Square boards have the 8 symmetries of the dihedral group, rectangular boards 4.
+    """
+    transforms = [
+        lambda r, c: (r, c), # identity
+        lambda r, c: (rows - 1 - r, columns - 1 - c), # rotate 180
+        lambda r, c: (r, columns - 1 - c), # mirror left-right
+        lambda r, c: (rows - 1 - r, c), # mirror top-bottom
+    ]
+    if rows == columns:
+        transforms += [
+            lambda r, c: (c, rows - 1 - r), # rotate 90
+            lambda r, c: (columns - 1 - c, r), # rotate 270
+            lambda r, c: (c, r), # main diagonal
+            lambda r, c: (columns - 1 - c, rows - 1 - r), # reverse diagonal
+        ]
+
+    permutations = []
+    for transform in transforms:
+        permutation = []
+        for row in range(rows):
+            for col in range(columns):
+                new_row, new_col = transform(row, col)
+                permutation.append(new_row * columns + new_col)
+        permutations.append(tuple(permutation))
+    return tuple(permutations)
+
+
+
+def invertPermutation(permutation: Sequence[int]) -> List[int]:
+    inverse = [0] * len(permutation)
+    for cell, target in enumerate(permutation):
+        inverse[target] = cell
+    return inverse
+
+
+
+def getBase3Key(cells: Sequence[int]) -> int:
+    """
+    position key with cells as base 3 digits, cell 0 being the least significant
+    """
+    key = 0
+    for value in reversed(cells):
+        key = key * 3 + value
+    return key
+
+
+
+def getCanonicalKey(cells: Sequence[int], rows: int, columns: int) -> Tuple[int, Tuple[int, ...]]:
+    """
+    smallest base 3 key over all symmetries of the position, along with the permutation used.
+    Equivalent positions always share the same canonical key.
+    """
+    best_key, best_permutation = None, None
+    for permutation in getSymmetries(rows, columns):
+        transformed = [0] * len(cells)
+        for cell, value in enumerate(cells):
+            transformed[permutation[cell]] = value
+        key = getBase3Key(transformed)
+        if best_key is None or key < best_key:
+            best_key, best_permutation = key, permutation
+    return best_key, best_permutation
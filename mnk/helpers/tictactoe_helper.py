@@ -1,5 +1,6 @@
+from dataclasses import replace
 from datetime import datetime
-from typing import List
+from typing import Dict, List
 from uuid import uuid4
 
 from mnk.models.tictactoe_constants import Constants
@@ -11,15 +12,57 @@ from mnk.exceptions.mnk_exceptions import *
 ## Helper methods for tictactoe router and service
 
 
+# timezone of the server, looked up once instead of for every timestamp
+LOCAL_TIMEZONE = datetime.now().astimezone().tzinfo
+
+
+def getNow() -> datetime:
+    """
+    timestamps are kept as datetimes, and only formatted for the json response
+    """
+    return datetime.now(LOCAL_TIMEZONE)
+
+
+
 ## Router helpers
 def getDateToStr(date_val:datetime):
-    return date_val.strftime(Constants.DATE_FORMAT)
+    """
+    same as date_val.strftime(Constants.DATE_FORMAT), without interpreting the format on every call
+    """
+    return (f"{date_val.day:02d}/{date_val.month:02d}/{date_val.year:04d}, "
+        f"{date_val.hour:02d}:{date_val.minute:02d}:{date_val.second:02d}:{date_val.microsecond:06d}")
 
 
 def getDateFromStr(str_date: str):
     return datetime.strptime(str_date, Constants.DATE_FORMAT)
 
 
+def getMovesJson(moves: List[Move]) -> List[Dict]:
+    """
+    moves in the shape of the json response, with formatted timestamps
+    """
+    return [{"pawn": move.pawn, "row": move.row, "column": move.column, "created": getDateToStr(move.created)}
+        for move in moves]
+
+
+def getStateEvent(game: TicTacToeData) -> Dict:
+    """
+    websocket event with the whole game, sent when a client subscribes to it
+    """
+    return {"event": "state", "game_id": game.id, "version": game.version, "game_board": game.board,
+        "game_status": game.status.value, "player_1": game.player_1, "player_2": game.player_2,
+        "player_turn": game.player_turn}
+
+
+def getMoveEvent(game: TicTacToeData, moves: List[Move]) -> Dict:
+    """
+    websocket event with only what changed: cells placed as [row, column, pawn], status and next turn
+    """
+    return {"event": "move", "game_id": game.id, "version": game.version,
+        "placed": [[move.row, move.column, move.pawn] for move in moves],
+        "game_status": game.status.value, "player_turn": game.player_turn}
+
+
 
 ## Service helpers
 def getOnePlayerGame(game_data: CreateGameRequest) -> TicTacToeData:
@@ -48,8 +91,10 @@ def getOnePlayerGame(game_data: CreateGameRequest) -> TicTacToeData:
 
     # Generate new id and set status to created, with other initialised data
     return TicTacToeData(id=str(uuid4()), status=GameStatus.IN_PROGRESS, 
-        created=datetime.now().astimezone().strftime(Constants.DATE_FORMAT), mode=game_data.mode, 
-        player_turn=curr_player_turn, player_1=game_data.player_1, player_2= game_data.player_2)
+        created=getNow(), mode=game_data.mode, 
+        player_turn=curr_player_turn, player_1=game_data.player_1, player_2= game_data.player_2,
+        rows=game_data.rows, columns=game_data.columns, win_length=game_data.win_length,
+        difficulty=game_data.difficulty)
     
 
 
@@ -87,8 +132,20 @@ def getTwoPlayerGame(game_data: CreateGameRequest) -> TicTacToeData:
 
     # Generate new id and set status to created, with other initialised data
     return TicTacToeData(id=str(uuid4()), status=GameStatus.IN_PROGRESS, 
-        created=datetime.now().astimezone().strftime(Constants.DATE_FORMAT), mode=game_data.mode, player_turn=curr_player_turn,
-        player_1=game_data.player_1, player_2= game_data.player_2)
+        created=getNow(), mode=game_data.mode, player_turn=curr_player_turn,
+        player_1=game_data.player_1, player_2= game_data.player_2,
+        rows=game_data.rows, columns=game_data.columns, win_length=game_data.win_length)
+
+
+
+def validateBoardConfig(game_data: CreateGameRequest) -> None:
+    """
+    check if the m,n,k values requested can make up a playable board
+    """
+    if not (0 < game_data.rows <= Constants.MAX_BOARD_SIZE and 0 < game_data.columns <= Constants.MAX_BOARD_SIZE):
+        raise InvalidGameConfigException(f"Rows and columns must be between 1 and {Constants.MAX_BOARD_SIZE}.")
+    if not (0 < game_data.win_length <= max(game_data.rows, game_data.columns)):
+        raise InvalidGameConfigException("Win length must fit on the board.")
 
 
 
@@ -96,86 +153,100 @@ def isValidSpot(row:int, col:int, board: List[List[int]]) -> bool:
     """
     check if cell attempted to fill is available/empty 
     """
-    if row<0 or row>2 or col<0 or col>2:
+    if row<0 or row>=len(board) or col<0 or col>=len(board[0]):
         return False
     return board[row][col] == '-'
 
 
 
-def __isRowComplete(row_number, board: List[List[int]], pawn:str) -> bool:
+def placePawn(row:int, col:int, pawn:str, game: TicTacToeData) -> None:
     """
-    checks if all the cells in the given row have same value
-    Value checked with the current player number 
+    marks the cell on both the display board and the bitboard engine
     """
-    for spot in board[row_number]:
-        if spot != pawn:
-            return False
-    return True 
+    game.board[row][col] = pawn
+    game.bitboard.place(row, col, 0 if (pawn == game.player_1) else 1)
+    # decrease count of valid spots
+    game.number_of_vacant_cells -= 1
 
 
 
-def __isColumnComplete(col_number, board: List[List[int]], pawn:str) -> bool:
+def getMoveCount(game: TicTacToeData) -> int:
     """
-    checks if all the cells in the given column have same value
-    Value checked with the current player number 
+    number of moves made in the game, including the ones not loaded
     """
-    for row in range(3):
-        if board[row][col_number] != pawn:
-            return False
-    return True
+    return game.rows * game.columns - game.number_of_vacant_cells
 
 
 
-def __isMainDiagonalComplete(board: List[List[int]], pawn:str) -> bool:
+def restoreBoard(snapshot: str, game: TicTacToeData) -> None:
     """
-    checks if all the cells in the main diagonal have same value
-    Value checked with the current player number 
+    sets the board from a bitboard snapshot, without the move history (loaded separately if needed)
     """
-    # start from top-left, move to bottom-right
-    for index in range(3):
-        if board[index][index] != pawn:
-            return False
-    return True
+    game.bitboard.loadSnapshot(snapshot)
+    for player, pawn in enumerate((game.player_1, game.player_2)):
+        for row, col in game.bitboard.stoneCells(player):
+            game.board[row][col] = pawn
+    game.number_of_vacant_cells = game.rows * game.columns - game.bitboard.stoneCount()
+    game.moves = []
+    game.moves_loaded = False
 
 
 
-def __isReverseDiagonalComplete(board: List[List[int]], pawn:str) -> bool:
+def copyGame(game: TicTacToeData) -> TicTacToeData:
     """
-    checks if all the cells in the reverse diagonal have same value
-    Value checked with the current player number
+    copy of the game that can be changed without changing the original (moves themselves are never changed)
     """
-    row, col = 0, 2 # start from top-right
-    for _ in range(3):
-        if board[row][col] != pawn:
-            return False
-        # move to bottom-left
-        row += 1
-        col -= 1
-    return True
+    return replace(game, board=[list(row) for row in game.board], moves=list(game.moves),
+        bitboard=game.bitboard.copy())
 
-    
 
-def updateStatus(row:int, col:int, game: TicTacToeData) -> None:
+
+# line directions as (row step, column step): horizontal, vertical, main diagonal, reverse diagonal
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+
+def __getRunLength(row:int, col:int, row_step:int, col_step:int, board: List[List[int]], pawn:str, limit:int) -> int:
     """
-    checks if any player has won, tied or game can proceed
+    counts continuous cells with the given pawn, starting next to (row, col) and walking
+    in one direction. Stops after `limit` cells, since only k-1 cells out can affect a win.
     """
-    
-    # if criteria is met then player has won
-    # check the row, column and diagonals for win possibility
-    if __isRowComplete(row, game.board, game.player_turn):
-        game.status = GameStatus.PLAYER_1_WINS if (game.player_turn == game.player_1) else GameStatus.PLAYER_2_WINS
+    rows, columns = len(board), len(board[0])
+    count = 0
+    row, col = row + row_step, col + col_step
+    while count < limit and 0 <= row < rows and 0 <= col < columns and board[row][col] == pawn:
+        count += 1
+        row += row_step
+        col += col_step
+    return count
 
-    elif __isColumnComplete(col, game.board, game.player_turn):
-        game.status = GameStatus.PLAYER_1_WINS if (game.player_turn == game.player_1) else GameStatus.PLAYER_2_WINS
 
-    # if row and col have same value then element lies on main diagonal
-    elif row == col and __isMainDiagonalComplete(game.board, game.player_turn):
-        game.status = GameStatus.PLAYER_1_WINS if (game.player_turn == game.player_1) else GameStatus.PLAYER_2_WINS
 
-    # if row and (3[board size] - 1 - col)are same then element lies on reverse diagonal 
-    elif row == (2 - col) and __isReverseDiagonalComplete(game.board, game.player_turn):
-        game.status = GameStatus.PLAYER_1_WINS if (game.player_turn == game.player_1) else GameStatus.PLAYER_2_WINS
-        
+def getLineRuns(row:int, col:int, board: List[List[int]], pawn:str, win_length:int) -> List[int]:
+    """
+    run length through (row, col) in each of the four directions, including the cell itself.
+    Only the neighbourhood up to win_length-1 cells out is looked at, so the cost is O(k)
+    regardless of the board size.
+    """
+    limit = win_length - 1
+    return [1 + __getRunLength(row, col, row_step, col_step, board, pawn, limit)
+            + __getRunLength(row, col, -row_step, -col_step, board, pawn, limit)
+            for row_step, col_step in DIRECTIONS]
+
+
+
+def updateStatus(row:int, col:int, game: TicTacToeData) -> None:
+    """
+    checks if the player who moved to (row, col) has won, tied or game can proceed.
+    Only the runs through the move are looked at, on the bitboard engine, up to k-1 cells out.
+    """
+    player = 0 if (game.player_turn == game.player_1) else 1
+
+    # if criteria is met then player has won
+    # check the runs through the move made in row, column and diagonals for win possibility
+    if max(game.bitboard.getLineRuns(row, col, player)) >= game.win_length:
+        game.status = GameStatus.PLAYER_1_WINS if (player == 0) else GameStatus.PLAYER_2_WINS
+
     elif game.number_of_vacant_cells == 0:
         # if criteria is not met and no more cells available to make a move then TIE
         game.status = GameStatus.TIED
@@ -0,0 +1,212 @@
+"""
+Request path instrumentation: per stage timing spans, request counters, exposed as prometheus
+text at /metrics, and an opt-in sampling profiler for slow requests.
+"""
+
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Tuple
+
+from mnk.exceptions.mnk_exceptions import (ConcurrentUpdateException, GameNotFoundException, IllegalPlayerTurnException,
+    InvalidGameConfigException, InvalidGameStateException, InvalidMoveException)
+
+
+# upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# errors answered as client errors (invalid moves, unknown games) or retried, not counted as stage errors
+EXPECTED_ERRORS = (InvalidMoveException, IllegalPlayerTurnException, InvalidGameStateException,
+    InvalidGameConfigException, GameNotFoundException, ConcurrentUpdateException)
+
+
+
+class Histogram:
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        # per bucket counts (not cumulative), last one for values above every bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+    def getCumulative(self) -> List[Tuple[str, int]]:
+        """
+        (le, cumulative count) pairs as in the prometheus exposition format
+        """
+        pairs, total = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            pairs.append((repr(bound), total))
+        pairs.append(("+Inf", self.count))
+        return pairs
+
+
+    def countAtOrBelow(self, bound: float) -> int:
+        """
+        number of observations in the buckets with an upper bound <= bound,
+        exact when bound is one of the bucket bounds
+        """
+        return sum(self.counts[:bisect.bisect_right(self.buckets, bound)])
+
+
+
+def getLabels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    return ",".join(f'{name}="{value}"' for name, value in labels)
+
+
+
+class Metrics:
+    """
+    Metrics of this process. Stages are the parts of a request (db read, move replay, game logic,
+    cache, db write), requests are labelled by route (endpoint name, not the raw path) and status.
+    """
+
+    stages: Dict[str, Histogram] = {}
+    stage_errors: Counter = Counter()
+    requests: Dict[str, Histogram] = {}
+    responses: Counter = Counter()
+
+
+    @contextmanager
+    def span(stage: str) -> Iterator[None]:
+        """
+        times the block as one stage, also around awaits (wall time, including waiting on io)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except EXPECTED_ERRORS:
+            raise
+        except Exception:
+            Metrics.stage_errors[stage] += 1
+            raise
+        finally:
+            Metrics.observeStage(stage, time.perf_counter() - start)
+
+
+    def observeStage(stage: str, seconds: float) -> None:
+        Metrics.stages.setdefault(stage, Histogram()).observe(seconds)
+
+
+    def observeRequest(route: str, status: int, seconds: float) -> None:
+        Metrics.requests.setdefault(route, Histogram()).observe(seconds)
+        Metrics.responses[(route, status)] += 1
+
+
+    def reset() -> None:
+        Metrics.stages, Metrics.requests = {}, {}
+        Metrics.stage_errors, Metrics.responses = Counter(), Counter()
+
+
+    def render() -> str:
+        """
+        all metrics in the prometheus text exposition format
+        """
+        lines = []
+
+        def addHistogram(name: str, help_text: str, label: str, histograms: Dict[str, Histogram]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key in sorted(histograms):
+                histogram = histograms[key]
+                for bound, count in histogram.getCumulative():
+                    lines.append(f"{name}_bucket{{{getLabels(((label, key), ('le', bound)))}}} {count}")
+                lines.append(f"{name}_sum{{{getLabels(((label, key),))}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{getLabels(((label, key),))}}} {histogram.count}")
+
+        addHistogram("mnk_stage_duration_seconds", "Time spent per request stage.", "stage", Metrics.stages)
+        lines.append("# HELP mnk_stage_errors_total Stages that ended with an exception.")
+        lines.append("# TYPE mnk_stage_errors_total counter")
+        for stage in sorted(Metrics.stage_errors):
+            lines.append(f"mnk_stage_errors_total{{{getLabels((('stage', stage),))}}} {Metrics.stage_errors[stage]}")
+
+        addHistogram("mnk_request_duration_seconds", "Time to respond per route.", "route", Metrics.requests)
+        lines.append("# HELP mnk_responses_total Responses per route and status code.")
+        lines.append("# TYPE mnk_responses_total counter")
+        for route, status in sorted(Metrics.responses):
+            labels = getLabels((("route", route), ("status", str(status))))
+            lines.append(f"mnk_responses_total{{{labels}}} {Metrics.responses[(route, status)]}")
+        return "\n".join(lines) + "\n"
+
+
+
+class SamplingProfiler:
+
+    """
+    Sampling Profiler Doc
+    ______________________
+
+    A background thread samples the stack of the event loop thread every interval seconds into
+    a bounded buffer. When a request takes longer than the threshold, the samples taken while it
+    was in flight are written as a folded stack file (one "outer;...;inner count" line per stack,
+    readable by flamegraph.pl or speedscope).
+    Requests share the event loop, so under concurrency a profile also has samples of the requests
+    interleaved with the slow one.
+    """
+
+    def __init__(self, directory: str, threshold: float, interval: float = 0.005, max_samples: int = 100_000):
+        self.directory = directory
+        self.threshold = threshold
+        self.interval = interval
+        self.samples: Deque[Tuple[float, Tuple[str, ...]]] = deque(maxlen=max_samples)
+        self.thread_id = None
+        self.stopped = threading.Event()
+        self.thread = None
+        self.dumped = 0
+
+
+    def start(self) -> None:
+        """
+        samples the thread calling start, i.e. the event loop thread when called at app startup
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self.run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples.append((time.perf_counter(), tuple(reversed(stack))))
+
+
+    def getFoldedStacks(self, start: float, end: float) -> Counter:
+        return Counter(";".join(stack) for sampled_at, stack in list(self.samples) if start <= sampled_at <= end)
+
+
+    def onRequest(self, route: str, start: float, end: float) -> None:
+        if end - start < self.threshold:
+            return
+        stacks = self.getFoldedStacks(start, end)
+        file_name = f"{time.strftime('%Y%m%d-%H%M%S')}_{self.dumped}_{route}_{(end - start) * 1000:.0f}ms.folded"
+        path = os.path.join(self.directory, file_name)
+        with open(path, "w", encoding="utf-8") as profile_file:
+            for stack, count in stacks.most_common():
+                profile_file.write(f"{stack} {count}\n")
+        self.dumped += 1
+        logging.warning(f"slow request {route} took {(end - start) * 1000:.0f} ms, {sum(stacks.values())} samples written to {path}")
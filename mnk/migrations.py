@@ -0,0 +1,117 @@
+"""
+Schema bootstrap: creates the tables and applies the schema revisions the database does not have yet.
+Run once per deploy before starting the app (every uvicorn worker would otherwise race to do it):
+    python -m mnk.migrations
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+import sqlalchemy
+
+from mnk.config import settings
+from mnk.database import difficulty, game_mode, game_status, metadata
+
+
+SCHEMA_REVISION_SQL = """
+CREATE TABLE IF NOT EXISTS schema_revision (revision INTEGER PRIMARY KEY, description TEXT NOT NULL, applied TIMESTAMPTZ NOT NULL DEFAULT now())
+"""
+
+# one migrator at a time, a second one waits and then finds the revisions applied
+LOCK_SQL = "SELECT pg_advisory_xact_lock(7262713)"
+
+
+
+def getCreateEnumSql(enum_type: sqlalchemy.Enum) -> str:
+    """
+    creates the postgres enum type unless it exists (a new database gets it from the tables of revision 1)
+    """
+    labels = ", ".join(f"'{label}'" for label in enum_type.enums)
+    return f"DO $$ BEGIN CREATE TYPE {enum_type.name} AS ENUM ({labels}); EXCEPTION WHEN duplicate_object THEN NULL; END $$"
+
+
+def getToEnumSql(column: str, enum_type: sqlalchemy.Enum) -> str:
+    return f"ALTER COLUMN {column} TYPE {enum_type.name} USING CAST(CAST({column} AS TEXT) AS {enum_type.name})"
+
+
+
+## schema revisions, applied in order and recorded in schema_revision
+# (revision, description, statements). No statements means the tables of mnk.database are created.
+# Revisions after the first upgrade databases created by earlier versions of the app,
+# on a new database they find their changes already in place.
+MIGRATIONS: List[Tuple[int, str, Optional[List[str]]]] = [
+    (1, "create tables", None),
+    # games saved before board sizes and difficulty were configurable were 3x3 games against the EASY computer.
+    # Defaults only fill existing rows, the app always sets these columns (and revision 3 retypes difficulty).
+    (2, "board size, difficulty, board snapshot, version and move history index", [
+        'ALTER TABLE games ADD COLUMN IF NOT EXISTS "rows" INTEGER NOT NULL DEFAULT 3',
+        'ALTER TABLE games ADD COLUMN IF NOT EXISTS "columns" INTEGER NOT NULL DEFAULT 3',
+        "ALTER TABLE games ADD COLUMN IF NOT EXISTS win_length INTEGER NOT NULL DEFAULT 3",
+        "ALTER TABLE games ADD COLUMN IF NOT EXISTS difficulty VARCHAR(128) NOT NULL DEFAULT 'EASY'",
+        "ALTER TABLE games ADD COLUMN IF NOT EXISTS board_snapshot TEXT",
+        "ALTER TABLE games ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0",
+        'ALTER TABLE games ALTER COLUMN "rows" DROP DEFAULT, ALTER COLUMN "columns" DROP DEFAULT, '
+            "ALTER COLUMN win_length DROP DEFAULT, ALTER COLUMN difficulty DROP DEFAULT, ALTER COLUMN version DROP DEFAULT",
+        "CREATE INDEX IF NOT EXISTS ix_moves_game_id ON moves (game, id)",
+    ]),
+    # rewrites both tables under an exclusive lock, takes a while on large tables
+    (3, "enum types for mode, status and difficulty, smallint row and column, index of games in progress", [
+        getCreateEnumSql(game_mode),
+        getCreateEnumSql(game_status),
+        getCreateEnumSql(difficulty),
+        "ALTER TABLE games " + ", ".join(getToEnumSql(column, enum_type)
+            for column, enum_type in [("mode", game_mode), ("status", game_status), ("difficulty", difficulty)]),
+        'ALTER TABLE moves ALTER COLUMN "row" TYPE SMALLINT, ALTER COLUMN "column" TYPE SMALLINT',
+        "CREATE INDEX IF NOT EXISTS ix_games_in_progress ON games (created) WHERE status = 'IN_PROGRESS'",
+    ]),
+    # partitions by month are created by the archiver (mnk.repository.game_archive) as needed
+    (4, "archive of finished games, partitioned by month, index of finished games", [
+        """CREATE TABLE IF NOT EXISTS games_archive (
+            id VARCHAR(128) NOT NULL, mode game_mode NOT NULL, player_1_pawn VARCHAR(128) NOT NULL,
+            player_2_pawn VARCHAR(128) NOT NULL, player_turn VARCHAR(128) NOT NULL, status game_status NOT NULL,
+            created TIMESTAMPTZ NOT NULL, "rows" INTEGER NOT NULL, "columns" INTEGER NOT NULL, win_length INTEGER NOT NULL,
+            difficulty difficulty NOT NULL, version INTEGER NOT NULL, board_snapshot TEXT,
+            moves JSONB NOT NULL, archived TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created)
+        ) PARTITION BY RANGE (created)""",
+        "CREATE INDEX IF NOT EXISTS ix_games_finished ON games (created) WHERE status <> 'IN_PROGRESS'",
+    ]),
+]
+
+
+
+def getRevision(connection) -> int:
+    return connection.execute(sqlalchemy.text("SELECT COALESCE(MAX(revision), 0) FROM schema_revision")).scalar()
+
+
+def migrate(db_url: str = None) -> int:
+    """
+    Brings the schema to the latest revision in one transaction, returns the number of revisions applied.
+    The engine only lives for the migration, the app itself uses the async pool.
+    """
+    engine = sqlalchemy.create_engine(db_url or settings.db_url)
+    try:
+        with engine.begin() as connection:
+            connection.execute(sqlalchemy.text(LOCK_SQL))
+            connection.execute(sqlalchemy.text(SCHEMA_REVISION_SQL))
+            current = getRevision(connection)
+            pending = [migration for migration in MIGRATIONS if migration[0] > current]
+            for revision, description, statements in pending:
+                if statements is None:
+                    metadata.create_all(connection)
+                else:
+                    for statement in statements:
+                        connection.execute(sqlalchemy.text(statement))
+                connection.execute(sqlalchemy.text("INSERT INTO schema_revision (revision, description) VALUES (:revision, :description)"),
+                    revision=revision, description=description)
+                logging.info(f"migrations | revision {revision} applied: {description}")
+    finally:
+        engine.dispose()
+    logging.info(f"migrations | schema at revision {MIGRATIONS[-1][0]}, {len(pending)} applied")
+    return len(pending)
+
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    migrate()
@@ -0,0 +1,172 @@
+"""
+Compact m-n-k board engine backed by integer bitmasks
+"""
+
+from typing import Iterator, List, Tuple
+
+
+def getRunSteps(length: int) -> List[int]:
+    """
+    steps used to collapse a run of `length` bits into one.
+    After every step bit i stays set only if the whole span starting at i is set,
+    and the span is doubled each time, so it takes O(log k) shift-and-mask steps.
+    """
+    steps = []
+    span = 1
+    while span < length:
+        step = min(span, length - span)
+        steps.append(step)
+        span += step
+    return steps
+
+
+
+def hasRun(stones: int, shift: int, length: int) -> bool:
+    """
+    checks if there is a run of `length` set bits spaced `shift` apart.
+    """
+    for step in getRunSteps(length):
+        stones &= stones >> (step * shift)
+    return stones != 0
+
+
+
+class BitBoard:
+
+    """
+    Bitboard Doc
+    _____________
+
+    Each player's stones are kept as a single python integer, one bit per cell.
+    Cells are laid out row by row with one extra (always empty) guard bit at the
+    end of every row, so shifting a mask never wraps a line onto the next row.
+
+    With a row stride of (columns + 1) the four line directions become fixed shifts:
+        horizontal -> 1, vertical -> columns + 1,
+        main diagonal -> columns + 2, reverse diagonal -> columns
+    """
+
+    __slots__ = ('rows', 'columns', 'win_length', 'stride', 'stones', 'shifts', 'run_shifts')
+
+
+    def __init__(self, rows: int = 3, columns: int = 3, win_length: int = 3):
+        self.rows = rows
+        self.columns = columns
+        self.win_length = win_length
+        self.stride = columns + 1
+        # stones[0] -> player_1, stones[1] -> player_2
+        self.stones: List[int] = [0, 0]
+        self.shifts: Tuple[int, ...] = (1, self.stride, self.stride + 1, self.stride - 1)
+        # shift amounts applied (in order) per direction to collapse a run of win_length stones
+        self.run_shifts: Tuple[Tuple[int, ...], ...] = tuple(
+            tuple(step * shift for step in getRunSteps(win_length)) for shift in self.shifts)
+
+
+    def copy(self) -> "BitBoard":
+        bitboard = BitBoard.__new__(BitBoard)
+        for name in BitBoard.__slots__:
+            setattr(bitboard, name, getattr(self, name))
+        bitboard.stones = list(self.stones)
+        return bitboard
+
+
+    def cellIndex(self, row: int, col: int) -> int:
+        return row * self.stride + col
+
+
+    def cellLocation(self, index: int) -> Tuple[int, int]:
+        return divmod(index, self.stride)
+
+
+    def occupied(self) -> int:
+        return self.stones[0] | self.stones[1]
+
+
+    def isVacant(self, row: int, col: int) -> bool:
+        if row<0 or row>=self.rows or col<0 or col>=self.columns:
+            return False
+        return not (self.occupied() >> self.cellIndex(row, col)) & 1
+
+
+    def place(self, row: int, col: int, player: int) -> None:
+        """
+        Marks the cell for the given player index (0 -> player_1, 1 -> player_2)
+        """
+        self.stones[player] |= 1 << self.cellIndex(row, col)
+
+
+    def vacantCells(self) -> Iterator[Tuple[int, int]]:
+        """
+        Yields the vacant cells in row-major order
+        """
+        occupied = self.occupied()
+        for row in range(self.rows):
+            base = row * self.stride
+            for col in range(self.columns):
+                if not (occupied >> (base + col)) & 1:
+                    yield row, col
+
+
+    def stoneCells(self, player: int) -> Iterator[Tuple[int, int]]:
+        """
+        Yields the cells of the player's stones, one step per stone
+        """
+        stones = self.stones[player]
+        while stones:
+            lowest = stones & -stones
+            yield self.cellLocation(lowest.bit_length() - 1)
+            stones ^= lowest
+
+
+    def stoneCount(self) -> int:
+        return bin(self.occupied()).count('1')
+
+
+    def getSnapshot(self) -> str:
+        """
+        Compact encoding of the position, both stone masks in hex: '<player_1>:<player_2>'
+        """
+        return f"{self.stones[0]:x}:{self.stones[1]:x}"
+
+
+    def loadSnapshot(self, snapshot: str) -> None:
+        self.stones = [int(stones, 16) for stones in snapshot.split(':')]
+
+
+    def getLineRuns(self, row: int, col: int, player: int) -> List[int]:
+        """
+        run length of the player's stones through (row, col) in each direction, including the cell.
+        Only the neighbourhood up to win_length-1 cells out is probed, the guard bits end a run at the
+        board edge, so scoring a move costs O(k) whatever the board size.
+        """
+        stones = self.stones[player]
+        bit = 1 << self.cellIndex(row, col)
+        limit = self.win_length - 1
+        runs = []
+        for shift in self.shifts:
+            run = 1
+            probe = bit << shift
+            while run <= limit and stones & probe:
+                run += 1
+                probe <<= shift
+            forward = run
+            probe = bit >> shift
+            while run - forward < limit and stones & probe:
+                run += 1
+                probe >>= shift
+            runs.append(run)
+        return runs
+
+
+    def hasWon(self, player: int) -> bool:
+        """
+        checks if the player has win_length stones in a line in any direction
+        """
+        stones = self.stones[player]
+        for shifts in self.run_shifts:
+            bits = stones
+            for shift in shifts:
+                bits &= bits >> shift
+            if bits:
+                return True
+        return False
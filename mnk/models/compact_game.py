@@ -0,0 +1,117 @@
+"""
+Compact representation of a game, used to keep many games in memory (game cache)
+"""
+
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from mnk.helpers.tictactoe_helper import getMovesJson
+from mnk.models.tictactoe_models import Move, TicTacToeData
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+NAIVE_EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# board cell values
+VACANT, PLAYER_1, PLAYER_2 = 0, 1, 2
+
+
+
+def getEpochMicros(date_val: datetime) -> int:
+    """
+    exact microseconds since epoch (timestamp() goes through a float), naive datetimes are kept naive
+    """
+    return (date_val - (EPOCH if date_val.tzinfo else NAIVE_EPOCH)) // MICROSECOND
+
+
+
+class CompactGame:
+
+    """
+    Compact Game Doc
+    _________________
+
+    Slotted copy of a TicTacToeData without per cell or per move objects:
+    - board: bytearray, one byte per cell in row-major order (0 vacant, 1 player_1, 2 player_2)
+    - moves: array of 64 bit ints, two per move: (cell index << 1 | pawn index) and created as epoch microseconds
+    - created: epoch microseconds, timestamps are restored in the utc offset of the game's created
+
+    toGame() gives back an independent TicTacToeData, getResponse() the json response shape without it.
+    """
+
+    __slots__ = ('id', 'status', 'created', 'utc_offset', 'mode', 'player_1', 'player_2', 'player_turn',
+        'rows', 'columns', 'win_length', 'difficulty', 'version', 'moves_loaded', 'board', 'moves')
+
+
+    def __init__(self, game: TicTacToeData):
+        self.id = game.id
+        self.status = game.status
+        self.created = getEpochMicros(game.created)
+        offset = game.created.utcoffset()
+        self.utc_offset = None if offset is None else int(offset.total_seconds())
+        self.mode = game.mode
+        self.player_1 = game.player_1
+        self.player_2 = game.player_2
+        self.player_turn = game.player_turn
+        self.rows = game.rows
+        self.columns = game.columns
+        self.win_length = game.win_length
+        self.difficulty = game.difficulty
+        self.version = game.version
+        self.moves_loaded = game.moves_loaded
+
+        pawns = {game.player_1: PLAYER_1, game.player_2: PLAYER_2}
+        self.board = bytearray(pawns.get(cell, VACANT) for row in game.board for cell in row)
+        self.moves = array('q')
+        for move in game.moves:
+            self.moves.append((move.row * game.columns + move.column) << 1 | (pawns[move.pawn] - 1))
+            self.moves.append(getEpochMicros(move.created))
+
+
+    def getDate(self, micros: int) -> datetime:
+        if self.utc_offset is None:
+            return NAIVE_EPOCH + micros * MICROSECOND
+        return (EPOCH + micros * MICROSECOND).astimezone(timezone(timedelta(seconds=self.utc_offset)))
+
+
+    def getMoves(self):
+        pawns = (self.player_1, self.player_2)
+        for i in range(0, len(self.moves), 2):
+            row, column = divmod(self.moves[i] >> 1, self.columns)
+            yield Move(pawns[self.moves[i] & 1], row, column, self.getDate(self.moves[i + 1]))
+
+
+    def getBoard(self):
+        pawns = ('-', self.player_1, self.player_2)
+        return [[pawns[cell] for cell in self.board[start:start + self.columns]]
+            for start in range(0, len(self.board), self.columns)]
+
+
+    def toGame(self) -> TicTacToeData:
+        game = TicTacToeData(self.id, self.status, self.getDate(self.created), mode=self.mode,
+            player_1=self.player_1, player_2=self.player_2, player_turn=self.player_turn,
+            board=self.getBoard(), moves=list(self.getMoves()), rows=self.rows, columns=self.columns,
+            win_length=self.win_length, difficulty=self.difficulty, version=self.version,
+            moves_loaded=self.moves_loaded)
+        for index, cell in enumerate(self.board):
+            if cell != VACANT:
+                game.bitboard.place(*divmod(index, self.columns), cell - 1)
+        game.number_of_vacant_cells = self.board.count(VACANT)
+        return game
+
+
+    def getResponse(self) -> Dict:
+        """
+        the game in the shape of the move response, with all moves kept
+        """
+        return {
+            "game_id" : self.id,
+            "game_board" : self.getBoard(),
+            "game_status" : self.status,
+            "player_1": self.player_1,
+            "player_2": self.player_2,
+            "player_turn" : self.player_turn,
+            "moves" : getMovesJson(self.getMoves())
+        }
@@ -7,5 +7,5 @@ from datetime import datetime
 class MNKGameData:
     id: str
     status: enum
-    created: str # dateTime in str for showing in json response
+    created: datetime # formatted only for the json response
     
\ No newline at end of file
@@ -7,4 +7,5 @@ class Constants:
     DATE_FORMAT = "%d/%m/%Y, %H:%M:%S:%f"
     DEFAULT_STARTING_PAWN = 'x'
     DEFAULT_SECONDARY_PAWN = 'o'
+    MAX_BOARD_SIZE = 25
     
\ No newline at end of file
@@ -1,9 +1,11 @@
 from dataclasses import dataclass, field
+from datetime import datetime
 from typing import List, Optional
 from enum import Enum
 from pydantic.main import BaseModel
 
 from .game_data import MNKGameData
+from .bitboard import BitBoard
 
 
 
@@ -27,21 +29,34 @@ class GameMode(Enum):
     TWO_PLAYER = 'TWO_PLAYER'
 
 
+class Difficulty(Enum):
+    """
+    Computer player strength in a SINGLE_PLAYER game
+    EASY: first vacant cell scanning from the corners
+    MEDIUM: shallow search
+    HARD: full depth search, bounded by a per move time/node budget
+    """
+    EASY = 'EASY'
+    MEDIUM = 'MEDIUM'
+    HARD = 'HARD'
+
+
 
 
 ## Data Models
 
 @dataclass
 class Move:
+    __slots__ = ('pawn', 'row', 'column', 'created') # no per move __dict__, there is one Move per move of every cached game
     pawn: str
     row: int
     column: int
-    created: str # dateTime in str for showing in json response
+    created: datetime # formatted only for the json response
 
 
 # helper method for dataclass field init
-def getInitialsedBoard():
-    return [['-' for _ in range(3)] for _ in range(3)] # make a 3x3 matrix | '-' => vacant spot
+def getInitialsedBoard(rows: int = 3, columns: int = 3):
+    return [['-' for _ in range(columns)] for _ in range(rows)] # make a rows x columns matrix | '-' => vacant spot
 
 @dataclass
 class TicTacToeData(MNKGameData):
@@ -49,9 +64,24 @@ class TicTacToeData(MNKGameData):
     player_1: str
     player_2: str
     player_turn: str
-    board: List[List[int]] = field(default_factory=getInitialsedBoard)
+    board: List[List[int]] = None
     moves: List[Move] = field(default_factory=list)
-    number_of_vacant_cells: int = 9 # initially the 3x3 board would be empty, so all 9 are available
+    number_of_vacant_cells: int = None # initially the board would be empty, so all rows x columns are available
+    rows: int = 3 # m
+    columns: int = 3 # n
+    win_length: int = 3 # k
+    difficulty: Difficulty = Difficulty.EASY # computer player strength, used in SINGLE_PLAYER mode
+    version: int = 0 # number of saved updates, a cached copy is only replaced by a newer version
+    moves_loaded: bool = True # False when restored from a board snapshot, moves then only has the moves made since
+    bitboard: BitBoard = field(default=None, repr=False, compare=False) # fast engine used for move validation and win checks
+
+    def __post_init__(self):
+        if self.board is None:
+            self.board = getInitialsedBoard(self.rows, self.columns)
+        if self.number_of_vacant_cells is None:
+            self.number_of_vacant_cells = self.rows * self.columns
+        if self.bitboard is None:
+            self.bitboard = BitBoard(self.rows, self.columns, self.win_length)
 
 
 
@@ -64,6 +94,10 @@ class CreateGameRequest(BaseModel):
     player_1: str # player 1 pawn
     player_2: Optional[str] # player 2 pawn can be computer in case of SINGLE_PLAYER mode
     starting_pawn: Optional[str] = None # Override the default 'x' starting pawn
+    rows: int = 3 # m, number of rows on board
+    columns: int = 3 # n, number of columns on board
+    win_length: int = 3 # k, number of continuous cells needed to win
+    difficulty: Difficulty = Difficulty.EASY # computer player strength in SINGLE_PLAYER mode
 
 
 class MakeMoveRequest(BaseModel):
@@ -72,3 +106,7 @@ class MakeMoveRequest(BaseModel):
     row: int 
     column: int  
     
+
+
+class BatchMoveRequest(BaseModel):
+    moves: List[MakeMoveRequest] # moves applied in order, can be for different games
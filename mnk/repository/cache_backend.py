@@ -0,0 +1,267 @@
+"""
+Game cache backends. LOCAL keeps games in the worker process, SHARED keeps them in a
+cache server process that every uvicorn worker connects to.
+
+Start the shared cache server from project root, with the CACHE_AUTHKEY secret the workers use:
+    CACHE_AUTHKEY=... python -m mnk.repository.cache_backend --address 127.0.0.1:50055
+"""
+
+import argparse
+import logging
+import os
+import pickle
+import threading
+import time
+from multiprocessing import ProcessError
+from multiprocessing.managers import BaseManager, RemoteError
+from typing import Any, Dict, Optional, Tuple
+
+from mnk.models.compact_game import CompactGame
+from mnk.models.tictactoe_models import TicTacToeData
+from mnk.repository.game_cache import CachePolicy, GameCache
+
+
+
+class VersionedStore:
+
+    """
+    Cache entries are (version, game). A game is only stored if the cached copy is still
+    at the version the update was based on, so a stale board never overwrites a newer one.
+    Thread safe, the shared cache server handles every worker connection in its own thread.
+    """
+
+    def __init__(self, cache: GameCache):
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.conflicts = 0
+
+
+    def get(self, key: str) -> Optional[Tuple[int, Any]]:
+        with self.lock:
+            return self.cache.get(key)
+
+
+    def compareAndSet(self, key: str, value: Any, version: int, expected_version: Optional[int]) -> bool:
+        """
+        expected_version: version the update was based on, None when the game was read from db.
+        A missing entry accepts any version (it may have been evicted), a cached one only
+        accepts a newer version based on it.
+        """
+        with self.lock:
+            entry = self.cache.peek(key)
+            if entry is not None and (entry[0] >= version or
+                    (expected_version is not None and entry[0] != expected_version)):
+                self.conflicts += 1
+                return False
+            self.cache.put(key, (version, value))
+            return True
+
+
+    def remove(self, key: str) -> None:
+        with self.lock:
+            self.cache.invalidate(key)
+
+
+    def clear(self) -> None:
+        with self.lock:
+            self.cache.clear()
+
+
+    def getStats(self) -> Dict:
+        with self.lock:
+            return dict(self.cache.getStats(), version_conflicts=self.conflicts)
+
+
+
+class CacheBackend:
+    """
+    Interface of a game cache backend
+    """
+
+    name: str = None
+    # calls block on the network, GameRepo makes them on a worker thread instead of the event loop
+    blocking: bool = False
+
+    def get(self, game_id: str) -> Optional[TicTacToeData]:
+        raise NotImplementedError
+
+    def compareAndSet(self, game: TicTacToeData, expected_version: Optional[int]) -> bool:
+        raise NotImplementedError
+
+    def remove(self, game_id: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def getStats(self) -> Dict:
+        raise NotImplementedError
+
+
+
+class LocalCacheBackend(CacheBackend):
+
+    """
+    Games cached in this process, as CompactGame. A hit hands out a new TicTacToeData, so a
+    request changing its game never changes the cached one, only a successful compareAndSet does.
+    """
+
+    name = 'LOCAL'
+
+    def __init__(self, cache: GameCache):
+        self.store = VersionedStore(cache)
+
+
+    def get(self, game_id: str) -> Optional[TicTacToeData]:
+        entry = self.store.get(game_id)
+        return entry[1].toGame() if entry else None
+
+
+    def compareAndSet(self, game: TicTacToeData, expected_version: Optional[int]) -> bool:
+        return self.store.compareAndSet(game.id, CompactGame(game), game.version, expected_version)
+
+
+    def remove(self, game_id: str) -> None:
+        self.store.remove(game_id)
+
+
+    def clear(self) -> None:
+        self.store.clear()
+
+
+    def getStats(self) -> Dict:
+        return dict(self.store.getStats(), backend=self.name)
+
+
+
+## Shared cache server, a multiprocessing manager serving one VersionedStore
+
+# errors of a call to the cache server: not running, restarted (connection reset) or failing the call
+CACHE_SERVER_ERRORS = (OSError, EOFError, ProcessError, RemoteError)
+
+# seconds without trying to connect again, once the cache server could not be reached
+RECONNECT_INTERVAL = 1.0
+
+# the server and workers unpickle what they are sent, so anyone with the authkey can run code on them
+INSECURE_AUTHKEYS = {"", "mnk-cache"}
+
+shared_store: VersionedStore = None
+
+
+def initSharedStore(capacity: int, ttl: float, policy: str, sliding: bool) -> None:
+    global shared_store
+    shared_store = VersionedStore(GameCache(capacity, ttl, CachePolicy[policy], sliding))
+
+
+def getSharedStore() -> VersionedStore:
+    return shared_store
+
+
+class SharedCacheManager(BaseManager):
+    pass
+
+SharedCacheManager.register("getStore", callable=getSharedStore)
+
+
+def getAddress(address: str) -> Tuple[str, int]:
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def checkAuthkey(authkey: str) -> None:
+    if authkey in INSECURE_AUTHKEYS:
+        raise ValueError("The shared cache needs a secret CACHE_AUTHKEY, it is not set or is the old default.")
+
+
+
+class SharedCacheBackend(CacheBackend):
+
+    """
+    Games cached in the shared cache server, pickled CompactGame, so every worker reads the latest saved board.
+    Connects on first use, so workers can start before the cache server. If the server cannot be reached
+    (down, restarted), calls are treated as misses and the next call after RECONNECT_INTERVAL connects again.
+    """
+
+    name = 'SHARED'
+    blocking = True
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self.store = None
+        self.retry_at = 0.0
+        self.failures = 0
+
+
+    def getStore(self):
+        if self.store is None:
+            manager = SharedCacheManager(address=self.address, authkey=self.authkey)
+            manager.connect()
+            self.store = manager.getStore()
+        return self.store
+
+
+    def call(self, method: str, *args, default: Any = None) -> Any:
+        """
+        calls the store on the cache server, returns default if it cannot be reached
+        """
+        if self.store is None and time.monotonic() < self.retry_at:
+            return default
+        try:
+            return getattr(self.getStore(), method)(*args)
+        except CACHE_SERVER_ERRORS as e:
+            # drop the proxy, its connection is gone
+            self.store = None
+            self.retry_at = time.monotonic() + RECONNECT_INTERVAL
+            self.failures += 1
+            logging.warning(f"shared cache unavailable, treated as a miss: {e!r}")
+            return default
+
+
+    def get(self, game_id: str) -> Optional[TicTacToeData]:
+        entry = self.call("get", game_id)
+        return pickle.loads(entry[1]).toGame() if entry else None
+
+
+    def compareAndSet(self, game: TicTacToeData, expected_version: Optional[int]) -> bool:
+        data = pickle.dumps(CompactGame(game), protocol=pickle.HIGHEST_PROTOCOL)
+        return self.call("compareAndSet", game.id, data, game.version, expected_version, default=False)
+
+
+    def remove(self, game_id: str) -> None:
+        self.call("remove", game_id)
+
+
+    def clear(self) -> None:
+        self.call("clear")
+
+
+    def getStats(self) -> Dict:
+        stats = self.call("getStats", default={})
+        return dict(stats, backend=self.name, available=bool(stats), connection_failures=self.failures)
+
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Run the shared game cache server.")
+    parser.add_argument("--address", default="127.0.0.1:50055", help="host:port to listen on")
+    parser.add_argument("--authkey", default=os.environ.get("CACHE_AUTHKEY", ""), help="secret shared with the workers (default CACHE_AUTHKEY)")
+    parser.add_argument("--size", type=int, default=10_000, help="max number of games")
+    parser.add_argument("--ttl", type=float, default=300, help="seconds")
+    parser.add_argument("--policy", default="LRU", choices=[policy.value for policy in CachePolicy])
+    parser.add_argument("--fixed-ttl", action="store_true", help="do not restart ttl when a game is used")
+    options = parser.parse_args(args)
+    try:
+        checkAuthkey(options.authkey)
+    except ValueError as e:
+        parser.error(str(e))
+
+    initSharedStore(options.size, options.ttl, options.policy, not options.fixed_ttl)
+    manager = SharedCacheManager(address=getAddress(options.address), authkey=options.authkey.encode())
+    print(f"shared game cache listening on {options.address}")
+    manager.get_server().serve_forever()
+
+
+
+if __name__ == "__main__":
+    main()
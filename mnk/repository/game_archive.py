@@ -0,0 +1,210 @@
+"""
+Archival of finished games. Games finished and created more than a number of days ago are moved out of
+the live games/moves tables into games_archive, one row per game with its moves packed in a json array,
+in a table partitioned by month of creation. Archived games are still read by game_id (GameDBRepo).
+
+Run once from project root (e.g. from cron), instead of the background worker of the app:
+    python -m mnk.repository.game_archive --days 30
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from mnk.database import getDatabase
+
+
+# games are moved with their moves by a single statement, so a game is never half archived.
+# Games are locked and skipped if locked, so concurrent archivers never take the same game.
+ARCHIVE_GAMES_SQL = """
+WITH finished AS (
+    SELECT id FROM games WHERE status <> 'IN_PROGRESS' AND created < :cutoff
+    ORDER BY created LIMIT :limit FOR UPDATE SKIP LOCKED
+),
+archived_moves AS (
+    DELETE FROM moves WHERE game IN (SELECT id FROM finished)
+    RETURNING game, id, pawn, "row", "column", created
+),
+archived_games AS (
+    DELETE FROM games WHERE id IN (SELECT id FROM finished)
+    RETURNING id, mode, player_1_pawn, player_2_pawn, player_turn, status, created, "rows", "columns", win_length, difficulty, version, board_snapshot
+),
+game_moves AS (
+    SELECT archived_moves.game, jsonb_agg(jsonb_build_array(archived_moves.id, archived_moves."row", archived_moves."column",
+        CASE WHEN archived_moves.pawn = archived_games.player_1_pawn THEN 0 ELSE 1 END,
+        CAST(EXTRACT(EPOCH FROM archived_moves.created) * 1000000 AS BIGINT)) ORDER BY archived_moves.id) AS moves
+    FROM archived_moves JOIN archived_games ON archived_games.id = archived_moves.game
+    GROUP BY archived_moves.game
+),
+inserted AS (
+    INSERT INTO games_archive (id, mode, player_1_pawn, player_2_pawn, player_turn, status, created, "rows", "columns", win_length, difficulty, version, board_snapshot, moves)
+    SELECT archived_games.id, mode, player_1_pawn, player_2_pawn, player_turn, status, created, "rows", "columns", win_length, difficulty, version, board_snapshot,
+        COALESCE(game_moves.moves, CAST('[]' AS JSONB))
+    FROM archived_games LEFT JOIN game_moves ON game_moves.game = archived_games.id
+    RETURNING 1
+)
+SELECT COUNT(*) FROM inserted
+"""
+
+OLDEST_FINISHED_SQL = """
+SELECT MIN(created) FROM games WHERE status <> 'IN_PROGRESS' AND created < :cutoff
+"""
+
+CREATE_PARTITION_SQL = """
+CREATE TABLE IF NOT EXISTS {name} PARTITION OF games_archive FOR VALUES FROM ('{start}') TO ('{end}')
+"""
+
+# partitions are created by one archiver at a time
+PARTITION_LOCK_SQL = "SELECT pg_advisory_xact_lock(7262714)"
+
+
+
+def getMonths(first: datetime, last: datetime) -> List[datetime]:
+    """
+    starts (utc) of the months from the month of first to the month of last
+    """
+    month = datetime(first.year, first.month, 1, tzinfo=timezone.utc)
+    months = []
+    while month <= last:
+        months.append(month)
+        month = getNextMonth(month)
+    return months
+
+
+def getNextMonth(month: datetime) -> datetime:
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def getPartitionSql(month: datetime) -> str:
+    return CREATE_PARTITION_SQL.format(name=f"games_archive_{month:%Y_%m}", start=f"{month:%Y-%m-%d} 00:00:00+00",
+        end=f"{getNextMonth(month):%Y-%m-%d} 00:00:00+00")
+
+
+
+class GameArchive:
+
+    """
+    Game Archive Doc
+    _________________
+
+    Moves games finished and created more than age_days ago from the live tables to the archive,
+    batch_size games per transaction, so the live tables (and their indexes) only hold active and
+    recently finished games.
+    """
+
+    # archiver in use, set at app startup when enabled
+    active: "GameArchive" = None
+
+
+    def __init__(self, age_days: float, batch_size: int = 1000):
+        self.age_days = age_days
+        self.batch_size = batch_size
+        self.archived_games = 0
+        self.runs = 0
+        self.failures = 0
+        self.last_run_games = 0
+        self.last_run_duration = 0.0
+        self.last_run_at: Optional[float] = None
+
+
+    def getCutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(days=self.age_days)
+
+
+    async def createPartitions(self, cutoff: datetime) -> None:
+        """
+        monthly partitions for every finished game to archive, before moving them
+        """
+        database = getDatabase()
+        oldest = await database.fetch_val(OLDEST_FINISHED_SQL, {"cutoff": cutoff})
+        if oldest is None:
+            return
+        async with database.transaction():
+            await database.execute(PARTITION_LOCK_SQL)
+            for month in getMonths(oldest.astimezone(timezone.utc), cutoff):
+                await database.execute(getPartitionSql(month))
+
+
+    async def archiveBatch(self, cutoff: datetime) -> int:
+        """
+        moves the next batch of games to archive, returns the number moved
+        """
+        return await getDatabase().fetch_val(ARCHIVE_GAMES_SQL, {"cutoff": cutoff, "limit": self.batch_size})
+
+
+    async def archiveAll(self) -> int:
+        """
+        archives every finished game older than the cutoff, returns the number archived
+        """
+        start = time.perf_counter()
+        cutoff = self.getCutoff()
+        await self.createPartitions(cutoff)
+        archived = 0
+        while True:
+            count = await self.archiveBatch(cutoff)
+            archived += count
+            if count < self.batch_size:
+                break
+
+        self.runs += 1
+        self.archived_games += archived
+        self.last_run_games = archived
+        self.last_run_duration = time.perf_counter() - start
+        self.last_run_at = time.time()
+        logging.info(f"archive | {archived} games archived in {self.last_run_duration:.1f} s")
+        return archived
+
+
+    async def runArchiveWorker(self, interval: float) -> None:
+        """
+        background task, archives finished games every interval seconds
+        """
+        while True:
+            try:
+                await self.archiveAll()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failures += 1
+                logging.exception("archive: run failed, will retry")
+            await asyncio.sleep(interval)
+
+
+    def getStats(self) -> Dict:
+        return {
+            "age_days": self.age_days,
+            "archived_games_total": self.archived_games,
+            "runs_total": self.runs,
+            "failures_total": self.failures,
+            "last_run_games": self.last_run_games,
+            "last_run_duration_seconds": self.last_run_duration,
+            "last_run_at": self.last_run_at,
+        }
+
+
+
+async def archiveOnce(age_days: float, batch_size: int) -> int:
+    database = getDatabase()
+    await database.connect()
+    try:
+        return await GameArchive(age_days, batch_size).archiveAll()
+    finally:
+        await database.disconnect()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Move finished games out of the live tables into the archive.")
+    parser.add_argument("--days", type=float, default=30, help="archive games finished and created more than this many days ago")
+    parser.add_argument("--batch", type=int, default=1000, help="games per transaction")
+    options = parser.parse_args(args)
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    print(f"{asyncio.run(archiveOnce(options.days, options.batch))} games archived")
+
+
+
+if __name__ == "__main__":
+    main()
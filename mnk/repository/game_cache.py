@@ -0,0 +1,325 @@
+import math
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Callable, Dict, Hashable, List
+
+
+
+class CachePolicy(Enum):
+    """
+    Eviction/admission policy of the cache, once it is full
+    LRU: evict least recently used
+    LFU: evict least frequently used (least recently used among those)
+    TINY_LFU: LRU eviction, but a new entry is only admitted if it is used more often than the entry it would evict
+    """
+    LRU = 'LRU'
+    LFU = 'LFU'
+    TINY_LFU = 'TINY_LFU'
+
+
+
+## Policies: keep track of the order in which keys are evicted
+
+class LRUPolicy:
+
+    def __init__(self, capacity: int):
+        self.order: "OrderedDict[Hashable, None]" = OrderedDict()
+
+
+    def recordRequest(self, key: Hashable) -> None:
+        pass
+
+
+    def onInsert(self, key: Hashable) -> None:
+        self.order[key] = None
+
+
+    def onAccess(self, key: Hashable) -> None:
+        self.order.move_to_end(key)
+
+
+    def onRemove(self, key: Hashable) -> None:
+        self.order.pop(key, None)
+
+
+    def getVictim(self) -> Hashable:
+        return next(iter(self.order))
+
+
+    def admit(self, candidate: Hashable, victim: Hashable) -> bool:
+        return True
+
+
+
+class LFUPolicy:
+
+    def __init__(self, capacity: int):
+        self.counts: Dict[Hashable, int] = {}
+        # use count -> keys with that count, least recently used first
+        self.buckets: Dict[int, "OrderedDict[Hashable, None]"] = {}
+        self.min_count = 0
+
+
+    def recordRequest(self, key: Hashable) -> None:
+        pass
+
+
+    def onInsert(self, key: Hashable) -> None:
+        self.counts[key] = 1
+        self.buckets.setdefault(1, OrderedDict())[key] = None
+        self.min_count = 1
+
+
+    def onAccess(self, key: Hashable) -> None:
+        count = self.counts[key]
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+            if self.min_count == count:
+                self.min_count = count + 1
+        self.counts[key] = count + 1
+        self.buckets.setdefault(count + 1, OrderedDict())[key] = None
+
+
+    def onRemove(self, key: Hashable) -> None:
+        count = self.counts.pop(key, None)
+        if count is None:
+            return
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+            if self.min_count == count:
+                self.min_count = min(self.buckets) if self.buckets else 0
+
+
+    def getVictim(self) -> Hashable:
+        return next(iter(self.buckets[self.min_count]))
+
+
+    def admit(self, candidate: Hashable, victim: Hashable) -> bool:
+        return True
+
+
+
+MASK_64 = (1 << 64) - 1
+
+
+class CountMinSketch:
+    """
+    Approximate request counts in fixed memory (4 rows of small counters).
+    Counters are halved every sample_size requests, so old popularity fades out.
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+    # unrelated odd 64 bit multipliers, one per row
+    SEEDS = (0x9E3779B97F4A7C15, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB, 0xD6E8FEB86659FD93)
+
+
+    def __init__(self, capacity: int):
+        width = 16
+        while width < capacity:
+            width <<= 1
+        # multiply-shift hashing: the top bits of (hash * odd seed) pick the counter in each row
+        self.shift = 64 - (width.bit_length() - 1)
+        self.rows: List[bytearray] = [bytearray(width) for _ in range(CountMinSketch.DEPTH)]
+        self.seeds = CountMinSketch.SEEDS
+        self.sample_size = 10 * max(capacity, 16)
+        self.additions = 0
+
+
+    def getIndexes(self, key: Hashable) -> List[int]:
+        base = hash(key) & MASK_64
+        return [((base * seed) & MASK_64) >> self.shift for seed in self.seeds]
+
+
+    def add(self, key: Hashable) -> None:
+        for row, index in zip(self.rows, self.getIndexes(key)):
+            if row[index] < CountMinSketch.MAX_COUNT:
+                row[index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.age()
+
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[index] for row, index in zip(self.rows, self.getIndexes(key)))
+
+
+    def age(self) -> None:
+        for row in self.rows:
+            for index in range(len(row)):
+                row[index] >>= 1
+        self.additions //= 2
+
+
+
+class TinyLFUPolicy(LRUPolicy):
+
+    def __init__(self, capacity: int):
+        super().__init__(capacity)
+        self.sketch = CountMinSketch(capacity)
+
+
+    def recordRequest(self, key: Hashable) -> None:
+        # every request counts towards popularity, hits and misses alike
+        self.sketch.add(key)
+
+
+    def admit(self, candidate: Hashable, victim: Hashable) -> bool:
+        return self.sketch.estimate(candidate) > self.sketch.estimate(victim)
+
+
+
+POLICIES = {
+    CachePolicy.LRU: LRUPolicy,
+    CachePolicy.LFU: LFUPolicy,
+    CachePolicy.TINY_LFU: TinyLFUPolicy,
+}
+
+
+
+class GameCache:
+
+    """
+    Game Cache Doc
+    _______________
+
+    Bounded in-memory cache with time based expiry and hit/miss/eviction counters.
+    With sliding expiry the ttl restarts on every read/write, so an entry only expires
+    after ttl seconds without being used.
+    """
+
+    def __init__(self, capacity: int, ttl: float, policy: CachePolicy = CachePolicy.LRU,
+        sliding: bool = True, timer: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.policy_type = policy
+        self.sliding = sliding
+        self.timer = timer
+        self.policy = POLICIES[policy](capacity)
+        # key -> [value, expires at]
+        self.entries: Dict[Hashable, List[Any]] = {}
+        self.resetStats()
+
+
+    def resetStats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+        self.removals = 0
+
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self.policy.recordRequest(key)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        now = self.timer()
+        if entry[1] <= now:
+            self.remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self.policy.onAccess(key)
+        if self.sliding:
+            entry[1] = now + self.ttl
+        return entry[0]
+
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """
+        reads an entry that has not expired, without counting it as a request or use
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry[1] <= self.timer():
+            return default
+        return entry[0]
+
+
+    def put(self, key: Hashable, value: Any) -> None:
+        expires_at = self.timer() + self.ttl
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry[0], entry[1] = value, expires_at
+            self.policy.onAccess(key)
+            return
+
+        self.policy.recordRequest(key)
+        if len(self.entries) >= self.capacity:
+            victim = self.policy.getVictim()
+            if self.entries[victim][1] <= self.timer():
+                # already expired, make room without competing for admission
+                self.remove(victim)
+                self.expirations += 1
+            elif self.policy.admit(key, victim):
+                self.remove(victim)
+                self.evictions += 1
+            else:
+                self.rejections += 1
+                return
+
+        self.entries[key] = [value, expires_at]
+        self.policy.onInsert(key)
+
+
+    def remove(self, key: Hashable) -> bool:
+        if self.entries.pop(key, None) is None:
+            return False
+        self.policy.onRemove(key)
+        return True
+
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        drops the entry on request (e.g. game is over), counted separately from evictions
+        """
+        if self.remove(key):
+            self.removals += 1
+
+
+    def purgeExpired(self) -> None:
+        if self.ttl == math.inf:
+            # nothing ever expires
+            return
+        now = self.timer()
+        for key in [key for key, entry in self.entries.items() if entry[1] <= now]:
+            self.remove(key)
+            self.expirations += 1
+
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.policy = POLICIES[self.policy_type](self.capacity)
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def getStats(self) -> Dict:
+        self.purgeExpired()
+        requests = self.hits + self.misses
+        return {
+            "policy": self.policy_type.value,
+            "capacity": self.capacity,
+            "ttl_seconds": self.ttl,
+            "sliding_expiry": self.sliding,
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / requests) if requests else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "admission_rejections": self.rejections,
+            "removals": self.removals,
+        }
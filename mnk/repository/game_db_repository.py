@@ -0,0 +1,446 @@
+import json
+import re
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from mnk.config import settings
+from mnk.database import getConnection, getDatabase
+from mnk.exceptions.mnk_exceptions import ConcurrentUpdateException, GameNotFoundException
+from mnk.helpers.tictactoe_helper import getMoveCount, placePawn, restoreBoard
+from mnk.metrics import Metrics
+from mnk.models.compact_game import EPOCH, MICROSECOND
+from mnk.models.tictactoe_models import Difficulty, GameMode, GameStatus, Move, TicTacToeData
+from mnk.repository.move_journal import OP_CREATE, getJournalDate, getMove
+
+
+# pool waits longer than this are reported as slow, one of the metrics bucket bounds so the count is exact
+SLOW_POOL_WAIT = 0.01
+
+
+## SQL for the write path
+# On postgres the game row and its new moves are written by a single statement (data modifying CTE),
+# so a move costs one round trip and can never be half saved.
+# Other dialects write the same rows with two statements in a transaction.
+# Updates are conditional on the version the game was read at (optimistic concurrency),
+# if another request updated the game in between nothing is written.
+
+INSERT_GAME_SQL = """
+INSERT INTO games (id, mode, player_1_pawn, player_2_pawn, player_turn, status, created, "rows", "columns", win_length, difficulty, version, board_snapshot)
+VALUES (:game_id, :mode, :player_1_pawn, :player_2_pawn, :player_turn, :status, :created, :rows, :columns, :win_length, :difficulty, :version, :board_snapshot)
+"""
+
+INSERT_GAME_IF_MISSING_SQL = INSERT_GAME_SQL.rstrip() + """ ON CONFLICT (id) DO NOTHING
+"""
+
+UPDATE_GAME_SQL = """
+UPDATE games SET player_turn = :player_turn, status = :status, version = :version, board_snapshot = :board_snapshot
+WHERE id = :game_id AND version = :expected_version
+"""
+
+# journal entries are checked for conflicts when appended, so they are written unconditionally
+SET_GAME_STATE_SQL = """
+UPDATE games SET player_turn = :player_turn, status = :status, version = :version, board_snapshot = :board_snapshot
+WHERE id = :game_id
+"""
+
+INSERT_MOVES_SQL = """
+INSERT INTO moves (game, pawn, "row", "column", created) VALUES {values}
+"""
+
+# insert/update the game first, moves are only inserted if the game row was written.
+# returns the number of game rows written, 0 if the version check failed
+WRITE_GAME_WITH_MOVES_SQL = """
+WITH written_game AS ({game_sql} RETURNING id),
+new_moves AS (
+    INSERT INTO moves (game, pawn, "row", "column", created)
+    SELECT written_game.id, new_move.pawn, new_move.move_row, new_move.move_column, new_move.created
+    FROM written_game, (VALUES {values}) AS new_move (pawn, move_row, move_column, created)
+)
+SELECT COUNT(*) FROM written_game
+"""
+
+COUNT_MOVES_SQL = """
+SELECT game, COUNT(*) AS move_count FROM moves WHERE game IN ({game_ids}) GROUP BY game
+"""
+
+# one page of the move history, oldest first, after the cursor (id of the last move of the previous page)
+MOVE_HISTORY_SQL = """
+SELECT id, pawn, "row", "column", created FROM moves WHERE game = :game_id AND id > :after ORDER BY id LIMIT :limit
+"""
+
+GAME_EXISTS_SQL = """
+SELECT 1 FROM games WHERE id = :game_id
+"""
+
+GET_GAME_SQL = """
+SELECT id, mode, player_1_pawn, player_2_pawn, player_turn, status, created, "rows", "columns", win_length, difficulty, version, board_snapshot
+FROM games WHERE id = :game_id
+"""
+
+GET_MOVES_SQL = """
+SELECT pawn, "row", "column", created FROM moves WHERE game = :game_id ORDER BY id
+"""
+
+GET_FIRST_MOVES_SQL = GET_MOVES_SQL.rstrip() + """ LIMIT :limit
+"""
+
+# finished games moved to the archive (see mnk.repository.game_archive), looked up in every partition
+ARCHIVED_GAME_SQL = """
+SELECT id, mode, player_1_pawn, player_2_pawn, player_turn, status, created, "rows", "columns", win_length, difficulty, version, board_snapshot, moves
+FROM games_archive WHERE id = :game_id
+"""
+
+ARCHIVED_GAME_EXISTS_SQL = """
+SELECT 1 FROM games_archive WHERE id = :game_id
+"""
+
+MOVE_VALUES_SQL = "(CAST(:pawn_{i} AS VARCHAR), CAST(:row_{i} AS SMALLINT), CAST(:column_{i} AS SMALLINT), CAST(:created_{i} AS TIMESTAMPTZ))"
+MOVE_VALUES_WITH_GAME_SQL = "(:game_{i}, :pawn_{i}, :row_{i}, :column_{i}, :created_{i})"
+
+
+
+def getMoveValues(moves: List[Move], offset: int = 0, game_id: str = None) -> Dict:
+    """
+    bind values for the moves, numbered from offset. game_id is only bound when given.
+    """
+    values = {}
+    for i, move in enumerate(moves, start=offset):
+        if game_id:
+            values[f"game_{i}"] = game_id
+        values[f"pawn_{i}"] = move.pawn
+        values[f"row_{i}"] = move.row
+        values[f"column_{i}"] = move.column
+        values[f"created_{i}"] = move.created
+    return values
+
+
+def getMoveData(db_move) -> Move:
+    """
+    move of a moves row, raw sql on sqlite returns its timestamp as text
+    """
+    created = db_move["created"]
+    if isinstance(created, str):
+        created = datetime.fromisoformat(created)
+    return Move(db_move["pawn"], db_move["row"], db_move["column"], created)
+
+
+
+def getGameData(db_game) -> TicTacToeData:
+    """
+    game of a games (or games_archive) row, without its board
+    """
+    return TicTacToeData(db_game["id"], GameStatus[db_game["status"]],
+        db_game["created"], mode=GameMode[db_game["mode"]],
+        player_1=db_game["player_1_pawn"], player_2=db_game["player_2_pawn"],
+        player_turn=db_game["player_turn"], rows=db_game["rows"], columns=db_game["columns"],
+        win_length=db_game["win_length"], difficulty=Difficulty[db_game["difficulty"]], version=db_game["version"])
+
+
+def getArchivedMoves(db_game) -> List[Tuple[int, Move]]:
+    """
+    (id, move) of the moves of an archived game, stored as [id, row, column, pawn index, created epoch microseconds]
+    """
+    pawns = (db_game["player_1_pawn"], db_game["player_2_pawn"])
+    return [(move_id, Move(pawns[pawn], row, column, EPOCH + micros * MICROSECOND))
+        for move_id, row, column, pawn, micros in json.loads(db_game["moves"])]
+
+
+
+## prepared statements for the hot queries
+# On postgres they run straight on the asyncpg connection with positional parameters, which skips
+# the per call query compilation of `databases`, and asyncpg prepares each sql text once per
+# connection (statement cache of DB_STATEMENT_CACHE_SIZE entries).
+# Other dialects run the same sql through `databases`.
+
+PARAMETER = re.compile(r"(?<!:):(\w+)")
+
+
+
+class PreparedQuery:
+
+    def __init__(self, sql: str):
+        self.sql = sql.strip()
+        # names in order of first use, parameter $n is names[n - 1]
+        self.names = list(dict.fromkeys(PARAMETER.findall(self.sql)))
+        self.positional_sql = PARAMETER.sub(lambda match: f"${self.names.index(match.group(1)) + 1}", self.sql)
+
+
+    def getArgs(self, values: Dict) -> List[Any]:
+        return [values[name] for name in self.names]
+
+
+    async def fetchOne(self, values: Dict) -> Optional[Any]:
+        async with getConnection() as connection:
+            if GameDBRepo.isPostgres():
+                return await connection.raw_connection.fetchrow(self.positional_sql, *self.getArgs(values))
+            return await connection.fetch_one(self.sql, values)
+
+
+    async def fetchAll(self, values: Dict) -> List[Any]:
+        async with getConnection() as connection:
+            if GameDBRepo.isPostgres():
+                return await connection.raw_connection.fetch(self.positional_sql, *self.getArgs(values))
+            return await connection.fetch_all(self.sql, values)
+
+
+    async def fetchVal(self, values: Dict) -> Any:
+        async with getConnection() as connection:
+            if GameDBRepo.isPostgres():
+                return await connection.raw_connection.fetchval(self.positional_sql, *self.getArgs(values))
+            return await connection.fetch_val(self.sql, values)
+
+
+
+GET_GAME_QUERY = PreparedQuery(GET_GAME_SQL)
+GET_MOVES_QUERY = PreparedQuery(GET_MOVES_SQL)
+GET_FIRST_MOVES_QUERY = PreparedQuery(GET_FIRST_MOVES_SQL)
+ARCHIVED_GAME_QUERY = PreparedQuery(ARCHIVED_GAME_SQL)
+INSERT_GAME_QUERY = PreparedQuery(INSERT_GAME_SQL.strip() + " RETURNING id")
+UPDATE_GAME_QUERY = PreparedQuery(UPDATE_GAME_SQL.strip() + " RETURNING id")
+
+# writes of a game with its new moves, by (game sql, number of moves), as the sql has one row per move
+write_queries: Dict[Tuple[str, int], PreparedQuery] = {}
+
+
+def getWriteQuery(game_sql: str, move_count: int) -> PreparedQuery:
+    key = (game_sql, move_count)
+    if key not in write_queries:
+        rows = ", ".join(MOVE_VALUES_SQL.format(i=i) for i in range(move_count))
+        write_queries[key] = PreparedQuery(WRITE_GAME_WITH_MOVES_SQL.format(game_sql=game_sql.strip(), values=rows))
+    return write_queries[key]
+
+
+
+class GameDBRepo:
+    """
+    This class will be the means to read and write games in the db.
+    """
+
+    def isPostgres() -> bool:
+        return getDatabase().url.dialect.startswith("postgres")
+
+
+    async def getGame(game_id: str) -> TicTacToeData:
+        """
+        Reads the game with a single primary key read, its board is restored from the snapshot.
+        The move history is not loaded (see loadMoves), except for games saved before snapshots,
+        whose board is rebuilt from their moves. Games no longer in the live tables are read from the archive.
+        """
+        db_game = await GET_GAME_QUERY.fetchOne({"game_id": game_id})
+        if db_game is None:
+            game = await GameDBRepo.getArchivedGame(game_id)
+            if game is None:
+                raise GameNotFoundException()
+            return game
+
+        game = getGameData(db_game)
+
+        if db_game["board_snapshot"] is not None:
+            restoreBoard(db_game["board_snapshot"], game)
+            return game
+
+        #read corresponding moves from db (to get vacant spots and for winning logic)
+        game.moves = await GameDBRepo.getMoves(game_id)
+        # update board (and vacant spots count) with moves made so far
+        for move in game.moves:
+            placePawn(move.row, move.column, move.pawn, game)
+
+        return game
+
+
+    async def getArchivedGame(game_id: str) -> Optional[TicTacToeData]:
+        """
+        archived game with its moves, None if it is not archived (the archive is postgres only)
+        """
+        if not GameDBRepo.isPostgres():
+            return None
+        db_game = await ARCHIVED_GAME_QUERY.fetchOne({"game_id": game_id})
+        if db_game is None:
+            return None
+
+        game = getGameData(db_game)
+        moves = [move for _, move in getArchivedMoves(db_game)]
+        if db_game["board_snapshot"] is not None:
+            restoreBoard(db_game["board_snapshot"], game)
+        else:
+            for move in moves:
+                placePawn(move.row, move.column, move.pawn, game)
+        game.moves = moves
+        game.moves_loaded = True
+        return game
+
+
+    async def getMoves(game_id: str, limit: int = None) -> List[Move]:
+        """
+        moves of the game in the order they were made, the first `limit` ones if given
+        """
+        if limit is None:
+            rows = await GET_MOVES_QUERY.fetchAll({"game_id": game_id})
+        else:
+            rows = await GET_FIRST_MOVES_QUERY.fetchAll({"game_id": game_id, "limit": limit})
+        return [getMoveData(row) for row in rows]
+
+
+    async def iterateMoves(game_id: str, after: int, limit: int) -> AsyncIterator[Tuple[int, Move]]:
+        """
+        streams (id, move) of up to limit moves of the game made after the move with id `after`,
+        from the archive if the game has been archived (move ids are kept, so cursors stay valid)
+        """
+        found = False
+        async for row in getDatabase().iterate(MOVE_HISTORY_SQL, {"game_id": game_id, "after": after, "limit": limit}):
+            found = True
+            yield row["id"], getMoveData(row)
+        if found or not GameDBRepo.isPostgres():
+            return
+
+        db_game = await ARCHIVED_GAME_QUERY.fetchOne({"game_id": game_id})
+        if db_game is not None:
+            for move_id, move in [(move_id, move) for move_id, move in getArchivedMoves(db_game) if move_id > after][:limit]:
+                yield move_id, move
+
+
+    async def gameExists(game_id: str) -> bool:
+        if await getDatabase().fetch_val(GAME_EXISTS_SQL, {"game_id": game_id}) is not None:
+            return True
+        return GameDBRepo.isPostgres() and await getDatabase().fetch_val(ARCHIVED_GAME_EXISTS_SQL, {"game_id": game_id}) is not None
+
+
+    def getPoolStats() -> Dict:
+        """
+        pool settings and the time requests waited for a free connection
+        """
+        waits = Metrics.stages.get("db_pool_wait")
+        count = waits.count if waits else 0
+        fast_waits = waits.countAtOrBelow(SLOW_POOL_WAIT) if waits else 0
+        return {"min_size": settings.db_pool_min_size, "max_size": settings.db_pool_max_size,
+            "statement_cache_size": settings.db_statement_cache_size, "waits": count,
+            "avg_wait_ms": round(waits.sum / count * 1000, 3) if count else 0.0, "waits_over_10ms": count - fast_waits}
+
+
+    async def loadMoves(game: TicTacToeData) -> None:
+        """
+        Loads the move history of a game restored from its snapshot,
+        ahead of the moves made since it was restored.
+        """
+        if game.moves_loaded:
+            return
+        earlier_moves = getMoveCount(game) - len(game.moves)
+        if earlier_moves > 0:
+            game.moves = await GameDBRepo.getMoves(game.id, limit=earlier_moves) + game.moves
+        game.moves_loaded = True
+
+
+    async def createGame(game: TicTacToeData) -> None:
+        """
+        Inserts a new game along with any move already made in it (automove case)
+        """
+        values = {"game_id": game.id, "mode": game.mode.value, "player_1_pawn": game.player_1,
+            "player_2_pawn": game.player_2, "player_turn": game.player_turn, "status": game.status.value,
+            "created": game.created, "rows": game.rows, "columns": game.columns,
+            "win_length": game.win_length, "difficulty": game.difficulty.value, "version": game.version,
+            "board_snapshot": game.bitboard.getSnapshot()}
+        await GameDBRepo.writeGame(INSERT_GAME_SQL, INSERT_GAME_QUERY, values, game.id, game.moves)
+
+
+    async def saveMoves(game: TicTacToeData, moves: List[Move], expected_version: int) -> None:
+        """
+        Inserts the new moves of a game and updates its status, next player turn and version, atomically.
+        Raises ConcurrentUpdateException if the game is no longer at expected_version.
+        """
+        await GameDBRepo.writeGame(UPDATE_GAME_SQL, UPDATE_GAME_QUERY, GameDBRepo.getUpdateValues(game, expected_version),
+            game.id, moves)
+
+
+    async def saveBatch(games_moves: List[Tuple[TicTacToeData, List[Move], int]]) -> None:
+        """
+        Saves new moves of many games (game, moves, expected version) in one transaction,
+        with a single multi-row insert for all moves.
+        Raises ConcurrentUpdateException, and nothing is saved, if any game is no longer at its expected version.
+        """
+        values, rows = {}, []
+        for game, moves, _ in games_moves:
+            rows += [MOVE_VALUES_WITH_GAME_SQL.format(i=i) for i in range(len(rows), len(rows) + len(moves))]
+            values.update(getMoveValues(moves, offset=len(rows) - len(moves), game_id=game.id))
+
+        async with getConnection() as connection, connection.transaction():
+            for game, moves, expected_version in games_moves:
+                if moves and not await UPDATE_GAME_QUERY.fetchVal(GameDBRepo.getUpdateValues(game, expected_version)):
+                    raise ConcurrentUpdateException()
+            if rows:
+                await connection.execute(INSERT_MOVES_SQL.format(values=", ".join(rows)), values)
+
+
+    def getUpdateValues(game: TicTacToeData, expected_version: int) -> Dict:
+        return {"game_id": game.id, "player_turn": game.player_turn, "status": game.status.value,
+            "version": game.version, "expected_version": expected_version, "board_snapshot": game.bitboard.getSnapshot()}
+
+
+    async def writeGame(game_sql: str, game_query: PreparedQuery, game_values: Dict, game_id: str, moves: List[Move]) -> None:
+        """
+        Writes the game row (game_sql, game_query when written alone) and its new moves,
+        raises ConcurrentUpdateException if the game row was not written.
+        """
+        if not moves:
+            if not await game_query.fetchVal(game_values):
+                raise ConcurrentUpdateException()
+            return
+
+        if GameDBRepo.isPostgres():
+            # one statement, one round trip
+            values = dict(game_values, **getMoveValues(moves))
+            if not await getWriteQuery(game_sql, len(moves)).fetchVal(values):
+                raise ConcurrentUpdateException()
+        else:
+            rows = ", ".join(MOVE_VALUES_WITH_GAME_SQL.format(i=i) for i in range(len(moves)))
+            async with getConnection() as connection, connection.transaction():
+                if not await game_query.fetchVal(game_values):
+                    raise ConcurrentUpdateException()
+                await connection.execute(INSERT_MOVES_SQL.format(values=rows), getMoveValues(moves, game_id=game_id))
+
+
+    async def getMoveCounts(game_ids: List[str]) -> Dict[str, int]:
+        params = {f"game_id_{i}": game_id for i, game_id in enumerate(game_ids)}
+        rows = await getDatabase().fetch_all(COUNT_MOVES_SQL.format(game_ids=", ".join(f":{name}" for name in params)), params)
+        return {row["game"]: row["move_count"] for row in rows}
+
+
+    async def saveJournalEntries(entries: List[Dict]) -> None:
+        """
+        Group commit of write-behind journal entries, in one transaction.
+        Entries already in the db (replay after a crash) are skipped: games are only inserted
+        if missing, and moves only past the number of moves the game already has.
+        """
+        games_status: Dict[str, Dict] = {}
+        async with getDatabase().transaction():
+            for entry in entries:
+                if entry["op"] == OP_CREATE:
+                    game = entry["game"]
+                    await getDatabase().execute(INSERT_GAME_IF_MISSING_SQL, {"game_id": game["id"], "mode": game["mode"],
+                        "player_1_pawn": game["player_1"], "player_2_pawn": game["player_2"],
+                        "player_turn": game["player_turn"], "status": game["status"],
+                        "created": getJournalDate(game["created"]), "rows": game["rows"],
+                        "columns": game["columns"], "win_length": game["win_length"],
+                        "difficulty": game["difficulty"], "version": game.get("version", 0),
+                        "board_snapshot": game.get("board")})
+                else:
+                    games_status[entry["game_id"]] = {"game_id": entry["game_id"],
+                        "player_turn": entry["player_turn"], "status": entry["status"],
+                        "version": entry.get("version", 0), "board_snapshot": entry.get("board")}
+
+            game_ids = list({entry["game"]["id"] if entry["op"] == OP_CREATE else entry["game_id"] for entry in entries})
+            move_counts = await GameDBRepo.getMoveCounts(game_ids)
+
+            values, rows = {}, []
+            for entry in entries:
+                game_id = entry["game"]["id"] if entry["op"] == OP_CREATE else entry["game_id"]
+                start = entry.get("start", 0)
+                moves = [getMove(record) for index, record in enumerate(entry["moves"], start=start)
+                    if index >= move_counts.get(game_id, 0)]
+                rows += [MOVE_VALUES_WITH_GAME_SQL.format(i=i) for i in range(len(rows), len(rows) + len(moves))]
+                values.update(getMoveValues(moves, offset=len(rows) - len(moves), game_id=game_id))
+
+            if rows:
+                await getDatabase().execute(INSERT_MOVES_SQL.format(values=", ".join(rows)), values)
+            # latest status, next player turn and version of each game
+            for game_values in games_status.values():
+                await getDatabase().execute(SET_GAME_STATE_SQL, game_values)
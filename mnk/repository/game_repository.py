@@ -1,32 +1,79 @@
-from datetime import datetime, timedelta
+import asyncio
 import logging
-from cachetools import TTLCache
+from typing import Any, Dict, Optional
+
+from mnk.config import settings
+from mnk.models.tictactoe_models import GameStatus, TicTacToeData
+from mnk.repository.cache_backend import CacheBackend, LocalCacheBackend, SharedCacheBackend, checkAuthkey, getAddress
+from mnk.repository.game_cache import CachePolicy, GameCache
+
+
+
+def getCacheBackend() -> CacheBackend:
+    if settings.cache_backend == SharedCacheBackend.name:
+        # size, ttl and policy are set when starting the cache server
+        checkAuthkey(settings.cache_authkey)
+        return SharedCacheBackend(getAddress(settings.cache_address), settings.cache_authkey.encode())
+    # A sized cache with configurable eviction policy and expiration.
+    # Only games in progress are kept, with sliding expiry so active games stay cached.
+    return LocalCacheBackend(GameCache(capacity=settings.cache_size, ttl=settings.cache_ttl,
+        policy=CachePolicy[settings.cache_policy], sliding=settings.cache_sliding_ttl))
 
-from mnk.models.tictactoe_models import TicTacToeData
 
 
 class GameRepo:
     """
-    This class will be the means to access all games. 
+    This class will be the means to access all games.
     """
 
-    # A LRU TTL cache (eviction based on least recently used with time expiration)
-    game_cache = TTLCache(maxsize=100, ttl=timedelta(seconds=30), timer=datetime.now)
+    # set at app startup
+    backend: CacheBackend = None
+
+
+    async def call(method: str, *args) -> Any:
+        """
+        calls the cache backend, on a worker thread if the backend blocks on the network (SHARED)
+        """
+        function = getattr(GameRepo.backend, method)
+        if GameRepo.backend.blocking:
+            return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+        return function(*args)
 
 
-    def addGame(game_data: TicTacToeData) -> None:
-        GameRepo.game_cache[game_data.id] = game_data    
-        logging.info("cache updated")    
+    async def addGame(game_data: TicTacToeData, expected_version: Optional[int] = None) -> bool:
+        """
+        expected_version: version of the game before this update, None if it was just read from db.
+        Returns False if the cache already has a newer version of the game (or cannot be reached).
+        """
+        # finished games will not get more moves, so there is no need to keep them
+        if game_data.status != GameStatus.IN_PROGRESS:
+            await GameRepo.call("remove", game_data.id)
+            logging.info("cache entry removed, game over")
+            return True
+        if not await GameRepo.call("compareAndSet", game_data, expected_version):
+            logging.warning(f"cache not updated for game {game_data.id}, newer version cached or cache unavailable")
+            return False
+        logging.info("cache updated")
+        return True
 
 
-    def getGameById(game_id: str) -> TicTacToeData:
+    async def getGameById(game_id: str) -> TicTacToeData:
         # get from cache if possible
         logging.info("cache read")
-        return GameRepo.game_cache.get(game_id, None)
+        return await GameRepo.call("get", game_id)
+
+
+    async def removeGame(game_id: str) -> None:
+        await GameRepo.call("remove", game_id)
+        logging.info("cache entry removed")
+
+
+    async def getStats() -> Dict:
+        return await GameRepo.call("getStats")
 
 
-    def _clearCache() -> None:
+    async def _clearCache() -> None:
         """
         To flush the cache if needed
         """
-        GameRepo.game_cache.clear()
+        await GameRepo.call("clear")
@@ -0,0 +1,354 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from mnk.exceptions.mnk_exceptions import ConcurrentUpdateException, JournalLockedException
+from mnk.helpers.tictactoe_helper import copyGame, getDateFromStr, getMoveCount
+from mnk.metrics import Metrics
+from mnk.models.tictactoe_models import Move, TicTacToeData
+
+
+## Journal entry format (one json object per line)
+# create: {"seq", "op": "create", "game": {game fields}, "moves": [...]}
+# moves:  {"seq", "op": "moves", "game_id", "player_turn", "status", "version", "board", "start", "moves": [...]}
+# "board" is the board snapshot after the entry (BitBoard.getSnapshot).
+# "start" is the number of moves the game had before these, so writing an entry twice is detected.
+OP_CREATE = "create"
+OP_MOVES = "moves"
+
+
+
+# timestamps are written in iso format, which datetime parses without a format string
+def getMoveRecords(moves: List[Move]) -> List[List]:
+    return [[move.pawn, move.row, move.column, move.created.isoformat()] for move in moves]
+
+
+
+def getJournalDate(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        # entry journaled before timestamps were kept as datetimes
+        return getDateFromStr(value)
+
+
+
+def getMove(record: List) -> Move:
+    pawn, row, column, created = record
+    return Move(pawn, row, column, getJournalDate(created))
+
+
+
+def getCreateEntry(game: TicTacToeData) -> Dict:
+    return {"op": OP_CREATE, "moves": getMoveRecords(game.moves), "game": {
+        "id": game.id, "mode": game.mode.value, "player_1": game.player_1, "player_2": game.player_2,
+        "player_turn": game.player_turn, "status": game.status.value, "created": game.created.isoformat(),
+        "rows": game.rows, "columns": game.columns, "win_length": game.win_length,
+        "difficulty": game.difficulty.value, "version": game.version, "board": game.bitboard.getSnapshot()}}
+
+
+
+def getMovesEntry(game: TicTacToeData, moves: List[Move]) -> Dict:
+    return {"op": OP_MOVES, "game_id": game.id, "player_turn": game.player_turn, "status": game.status.value,
+        "version": game.version, "board": game.bitboard.getSnapshot(), "start": getMoveCount(game) - len(moves),
+        "moves": getMoveRecords(moves)}
+
+
+
+class MoveJournal:
+
+    """
+    Move Journal Doc
+    _________________
+
+    Write-behind mode: games and moves are appended to a local append-only journal
+    (fsynced, so they survive a crash) and the request returns without waiting on the db.
+    Appends are group committed: one fsync on an executor thread covers every entry appended
+    before it started, each request waits for the fsync covering its entry.
+    A background worker group-commits pending entries to the db, and records the last
+    written entry in a checkpoint file. Entries after the checkpoint are replayed on startup.
+
+    Until its entries are written, the in-memory game is the source of truth and is served
+    from here instead of the cache/db. So a journal is only used by one process at a time
+    (locked while open), with several workers each one needs its own path.
+    """
+
+    # journal in use, set at app startup when write-behind mode is enabled
+    active: "MoveJournal" = None
+
+
+    def __init__(self, path: str, writer: Callable[[List[Dict]], Awaitable[None]], batch_size: int = 500):
+        """
+        writer: writes a list of entries to the db in one transaction, must be idempotent per entry
+        """
+        self.path = path
+        self.checkpoint_path = path + ".checkpoint"
+        self.writer = writer
+        self.batch_size = batch_size
+
+        self.pending: List[Dict] = []
+        # game id -> latest game state / seq of its last entry, for games with entries not yet written
+        self.pending_games: Dict[str, TicTacToeData] = {}
+        self.pending_game_seq: Dict[str, int] = {}
+        # seq -> time the entry was appended
+        self.append_times: Dict[int, float] = {}
+        # seq of the last entry known to be on disk, fsync in progress
+        self.synced_seq = 0
+        self.sync_task: Optional[asyncio.Future] = None
+        # one flush at a time (flush worker and requests flushing a game), made on first flush
+        # as on python 3.8 a lock is bound to the event loop it is made in
+        self.flush_lock: Optional[asyncio.Lock] = None
+
+        # flush metrics
+        self.flushed_entries = 0
+        self.flush_failures = 0
+        self.last_flush_entries = 0
+        self.last_flush_duration = 0.0
+        self.last_flush_at: Optional[float] = None
+        # fsync metrics
+        self.syncs = 0
+        self.last_sync_entries = 0
+        self.last_sync_duration = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+        self.lock()
+        self.checkpoint = self.readCheckpoint()
+        self.pending = [entry for entry in self.readEntries() if entry["seq"] > self.checkpoint]
+        self.next_seq = max([self.checkpoint] + [entry["seq"] for entry in self.pending]) + 1
+        self.synced_seq = self.next_seq - 1
+        now = time.time()
+        for entry in self.pending:
+            self.append_times[entry["seq"]] = now
+
+
+    def lock(self) -> None:
+        """
+        Takes the journal for this process, raises JournalLockedException if another process has it:
+        a second process would append and checkpoint with its own seq and pending games.
+        The lock is released when the file is closed (or the process dies).
+        """
+        try:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.file.close()
+            raise JournalLockedException(self.path)
+
+
+    def readCheckpoint(self) -> int:
+        if not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path, encoding="utf-8") as checkpoint_file:
+            content = checkpoint_file.read().strip()
+        return int(content) if content else 0
+
+
+    def writeCheckpoint(self, seq: int) -> None:
+        # write to a temp file and rename, so the checkpoint is never half written
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as checkpoint_file:
+            checkpoint_file.write(str(seq))
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temp_path, self.checkpoint_path)
+        self.checkpoint = seq
+
+
+    def readEntries(self) -> List[Dict]:
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # torn write at the end of the file from a crash, the request was never answered
+                    logging.warning("journal: skipping incomplete entry")
+        return entries
+
+
+    def append(self, entry: Dict, game: TicTacToeData) -> int:
+        """
+        writes the entry to the file buffer, returns its seq. It is on disk once sync(seq) returns.
+        Later requests see the game right away, their own sync also covers this entry.
+        """
+        entry["seq"] = self.next_seq
+        self.next_seq += 1
+        self.file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+        self.pending.append(entry)
+        self.append_times[entry["seq"]] = time.time()
+        self.pending_games[game.id] = game
+        self.pending_game_seq[game.id] = entry["seq"]
+        return entry["seq"]
+
+
+    async def sync(self, seq: int) -> None:
+        """
+        waits until the entry is on disk. If an fsync is running the entry waits for the next one,
+        which then covers every entry appended in the meantime.
+        """
+        while self.synced_seq < seq:
+            if self.sync_task is None:
+                self.sync_task = asyncio.ensure_future(self.syncFile())
+            # shielded, a cancelled request does not cancel the fsync other requests wait on
+            await asyncio.shield(self.sync_task)
+
+
+    async def syncFile(self) -> None:
+        try:
+            last_seq = self.next_seq - 1
+            entries = last_seq - self.synced_seq
+            self.file.flush()
+            start = time.perf_counter()
+            await asyncio.get_running_loop().run_in_executor(None, os.fsync, self.file.fileno())
+            self.last_sync_duration = time.perf_counter() - start
+            Metrics.observeStage("journal_fsync", self.last_sync_duration)
+
+            self.synced_seq = max(self.synced_seq, last_seq)
+            self.syncs += 1
+            self.last_sync_entries = entries
+        finally:
+            self.sync_task = None
+
+
+    async def appendCreate(self, game: TicTacToeData) -> None:
+        await self.sync(self.append(getCreateEntry(game), game))
+
+
+    def checkVersion(self, game: TicTacToeData, expected_version: int) -> None:
+        """
+        Raises ConcurrentUpdateException if the game has pending entries past expected_version
+        """
+        pending_game = self.pending_games.get(game.id)
+        if pending_game is not None and pending_game.version != expected_version:
+            raise ConcurrentUpdateException()
+
+
+    async def appendMoves(self, game: TicTacToeData, moves: List[Move], expected_version: int) -> None:
+        self.checkVersion(game, expected_version)
+        await self.sync(self.append(getMovesEntry(game, moves), game))
+
+
+    async def appendBatch(self, games_moves: List[Tuple[TicTacToeData, List[Move], int]]) -> None:
+        """
+        appends the moves of several games, waiting for one fsync.
+        Every game is checked first, so a conflict leaves none of the batch journaled.
+        """
+        for game, _, expected_version in games_moves:
+            self.checkVersion(game, expected_version)
+        seq = self.synced_seq
+        for game, moves, _ in games_moves:
+            seq = self.append(getMovesEntry(game, moves), game)
+        await self.sync(seq)
+
+
+    def getPendingGame(self, game_id: str) -> Optional[TicTacToeData]:
+        """
+        copy of the latest journaled state of the game, a request changes it without changing
+        the pending game until its moves are appended
+        """
+        pending_game = self.pending_games.get(game_id)
+        return copyGame(pending_game) if pending_game is not None else None
+
+
+    async def flush(self) -> int:
+        """
+        writes the next batch of pending entries to the db, returns the number written
+        """
+        if self.flush_lock is None:
+            self.flush_lock = asyncio.Lock()
+        async with self.flush_lock:
+            return await self.flushBatch()
+
+
+    async def flushBatch(self) -> int:
+        batch = self.pending[:self.batch_size]
+        if not batch:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            await self.writer(batch)
+        except Exception:
+            self.flush_failures += 1
+            raise
+        last_seq = batch[-1]["seq"]
+        self.writeCheckpoint(last_seq)
+
+        del self.pending[:len(batch)]
+        for entry in batch:
+            self.append_times.pop(entry["seq"], None)
+        # games with nothing left to write are served from cache/db again
+        for game_id in [game_id for game_id, seq in self.pending_game_seq.items() if seq <= last_seq]:
+            del self.pending_game_seq[game_id]
+            del self.pending_games[game_id]
+        if not self.pending:
+            # everything is in the db, start over with an empty journal file
+            self.file.truncate(0)
+
+        self.flushed_entries += len(batch)
+        self.last_flush_entries = len(batch)
+        self.last_flush_duration = time.perf_counter() - start
+        self.last_flush_at = time.time()
+        return len(batch)
+
+
+    async def flushAll(self) -> None:
+        while await self.flush():
+            pass
+
+
+    async def flushGame(self, game_id: str) -> None:
+        """
+        writes the pending entries up to the last one of the game (entries are written in order),
+        so the db has all of its moves. Does nothing if the game has no pending entries.
+        """
+        while game_id in self.pending_game_seq:
+            await self.flush()
+
+
+    async def runFlushWorker(self, interval: float) -> None:
+        """
+        background task, flushes pending entries every interval seconds
+        """
+        while True:
+            try:
+                await self.flushAll()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("journal: flush failed, will retry")
+            await asyncio.sleep(interval)
+
+
+    def getStats(self) -> Dict:
+        oldest = min(self.append_times.values()) if self.append_times else None
+        return {
+            "pending_entries": len(self.pending),
+            "pending_games": len(self.pending_games),
+            # flush lag: age of the oldest entry not yet in the db
+            "flush_lag_seconds": (time.time() - oldest) if oldest else 0.0,
+            "flushed_entries_total": self.flushed_entries,
+            "flush_failures_total": self.flush_failures,
+            "last_flush_entries": self.last_flush_entries,
+            "last_flush_duration_seconds": self.last_flush_duration,
+            "last_flush_at": self.last_flush_at,
+            "checkpoint": self.checkpoint,
+            # group commit: entries per fsync
+            "syncs_total": self.syncs,
+            "last_sync_entries": self.last_sync_entries,
+            "last_sync_duration_seconds": self.last_sync_duration,
+        }
+
+
+    def close(self) -> None:
+        self.file.close()
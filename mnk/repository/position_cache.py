@@ -0,0 +1,119 @@
+import json
+import logging
+import math
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from mnk.helpers.board_symmetry import getCanonicalKey, invertPermutation
+from mnk.models.bitboard import BitBoard
+from mnk.models.tictactoe_models import Difficulty
+from mnk.repository.game_cache import CachePolicy, GameCache
+from mnk.repository.table_repository import OUTCOME_DRAW, OUTCOME_LOSS, OUTCOME_WIN, getCells
+
+
+# outcome of a searched position that was not solved within the search budget
+OUTCOME_UNKNOWN = 0
+
+POSITION_CACHE_VERSION = 1
+
+
+
+class PositionCache:
+
+    """
+    Position Cache Doc
+    ___________________
+
+    Computer moves found by search, shared by all games of this process. Positions are keyed by
+    their canonical form under the board symmetries (the 8 of the dihedral group on square boards),
+    so a move searched once is reused in every equivalent position, in any game.
+    Entries are (canonical cell, outcome for the computer), bounded with LRU eviction, and can be
+    saved to disk and loaded back on startup.
+    Thread safe, moves may be added from other threads while stats are read or the cache is saved.
+    """
+
+    # cache in use, set at app startup when enabled
+    active: "PositionCache" = None
+
+
+    def __init__(self, capacity: int):
+        self.cache = GameCache(capacity, math.inf, CachePolicy.LRU, sliding=False)
+        self.lock = threading.Lock()
+
+
+    def getKey(self, bitboard: BitBoard, player: int, difficulty: Difficulty) -> Tuple[Tuple, Tuple[int, ...]]:
+        canonical_key, permutation = getCanonicalKey(getCells(bitboard, player), bitboard.rows, bitboard.columns)
+        return (bitboard.rows, bitboard.columns, bitboard.win_length, difficulty.value, canonical_key), permutation
+
+
+    def getMove(self, bitboard: BitBoard, player: int, difficulty: Difficulty) -> Optional[Tuple[int, int]]:
+        """
+        cached (row, col) for the player to move, mapped back to the orientation of this board
+        """
+        key, permutation = self.getKey(bitboard, player, difficulty)
+        with self.lock:
+            entry = self.cache.get(key)
+        if entry is None:
+            return None
+        return divmod(invertPermutation(permutation)[entry[0]], bitboard.columns)
+
+
+    def putMove(self, bitboard: BitBoard, player: int, difficulty: Difficulty, move: Tuple[int, int], outcome: int) -> None:
+        key, permutation = self.getKey(bitboard, player, difficulty)
+        with self.lock:
+            self.cache.put(key, (permutation[move[0] * bitboard.columns + move[1]], outcome))
+
+
+    def getStats(self) -> Dict:
+        with self.lock:
+            stats = self.cache.getStats()
+        return {name: stats[name] for name in ("capacity", "size", "hits", "misses", "hit_rate", "evictions")}
+
+
+    def save(self, path: str) -> None:
+        # written to a temp file and renamed, so a crash never leaves a half written file
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # least recently used first, copied under the lock and written without it
+        with self.lock:
+            entries = [[*key, *self.cache.entries[key][0]] for key in self.cache.policy.order]
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as cache_file:
+            json.dump({"version": POSITION_CACHE_VERSION, "entries": entries}, cache_file, separators=(",", ":"))
+        os.replace(temp_path, path)
+        logging.info(f"position cache | {len(entries)} positions saved to {path}")
+
+
+    def load(self, path: str) -> None:
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+        except ValueError:
+            logging.warning(f"position cache | {path} is not readable, starting empty")
+            return
+        if data.get("version") != POSITION_CACHE_VERSION:
+            return
+        # saved least recently used first, so the order of use is kept
+        with self.lock:
+            for rows, columns, win_length, difficulty, canonical_key, cell, outcome in data["entries"]:
+                self.cache.put((rows, columns, win_length, difficulty, canonical_key), (cell, outcome))
+            self.cache.resetStats()
+        logging.info(f"position cache | {len(self.cache)} positions loaded from {path}")
+
+
+
+def getOutcome(score: int, solved: bool, win_score: int) -> int:
+    """
+    outcome for the player who searched, from the score of the search
+    """
+    if not solved:
+        return OUTCOME_UNKNOWN
+    if score >= win_score:
+        return OUTCOME_WIN
+    if score <= -win_score:
+        return OUTCOME_LOSS
+    return OUTCOME_DRAW
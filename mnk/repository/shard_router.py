@@ -0,0 +1,211 @@
+"""
+Game sharding across app nodes. Every game is owned by one node, picked by consistent hashing
+of its game_id. Requests for a game are forwarded to its owner, so only the owner caches (and,
+in write-behind mode, journals) the game.
+
+Run a local cluster from project root, one uvicorn process per shard:
+    python -m mnk.repository.shard_router --shards 3 --base-port 8001
+"""
+
+import argparse
+import bisect
+import hashlib
+import logging
+import os
+import subprocess
+import sys
+from typing import Dict, Iterable, List, Optional
+from uuid import uuid4
+
+import httpx
+
+from mnk.exceptions.mnk_exceptions import CrossShardBatchException, MisdirectedShardException, ShardUnavailableException
+
+
+# header set on forwarded requests, the receiving node handles them itself
+FORWARDED_HEADER = "X-Forwarded-Shard"
+
+
+
+def getHash(key: str) -> int:
+    """
+    stable across processes and restarts, unlike hash() of a str
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+
+def getNodes(nodes: str) -> List[str]:
+    """
+    comma separated base urls, e.g. "http://10.0.0.1:8000,http://10.0.0.2:8000"
+    """
+    return [node.strip().rstrip("/") for node in nodes.split(",") if node.strip()]
+
+
+
+class HashRing:
+
+    """
+    Hash Ring Doc
+    ______________
+
+    Consistent hashing: every node is placed at vnodes points on a ring of 64 bit hashes, and a key
+    belongs to the first node point at or after the key's hash. Adding or removing a node only moves
+    the keys of that node, about 1/N of all games.
+    """
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = 160):
+        self.nodes: List[str] = sorted(set(nodes))
+        self.vnodes = vnodes
+        points = sorted((getHash(f"{node}#{index}"), node) for node in self.nodes for index in range(vnodes))
+        self.hashes = [point for point, _ in points]
+        self.owners = [node for _, node in points]
+
+
+    def getNode(self, key: str) -> str:
+        index = bisect.bisect_left(self.hashes, getHash(key))
+        return self.owners[index % len(self.owners)]
+
+
+    def getShares(self) -> Dict[str, float]:
+        """
+        fraction of the hash space owned by every node
+        """
+        shares = dict.fromkeys(self.nodes, 0)
+        previous = self.hashes[-1] - (1 << 64)
+        for point, node in zip(self.hashes, self.owners):
+            shares[node] += point - previous
+            previous = point
+        return {node: share / (1 << 64) for node, share in shares.items()}
+
+
+
+class ShardRouter:
+    """
+    Node of this process in the cluster. Sharding is off (this node owns every game) when no
+    nodes are configured.
+    """
+
+    ring: HashRing = None
+    self_node: str = None
+    timeout: float = 5
+    client: httpx.AsyncClient = None
+    stats = {"forwarded": 0, "received": 0, "unavailable": 0, "misrouted": 0}
+
+
+    def configure(nodes: List[str], self_node: str, vnodes: int = 160, timeout: float = 5) -> None:
+        if nodes and self_node not in nodes:
+            raise ValueError(f"Shard {self_node} is not one of the shard nodes {nodes}.")
+        ShardRouter.ring = HashRing(nodes, vnodes) if nodes else None
+        ShardRouter.self_node = self_node
+        ShardRouter.timeout = timeout
+
+
+    def getOwner(game_id: str) -> str:
+        if not ShardRouter.ring:
+            return ShardRouter.self_node
+        return ShardRouter.ring.getNode(game_id)
+
+
+    def isOwner(game_id: str) -> bool:
+        return ShardRouter.ring is None or ShardRouter.getOwner(game_id) == ShardRouter.self_node
+
+
+    def getOwnedId(game_id: str) -> str:
+        """
+        game_id if this node owns it, otherwise a new uuid that this node owns, so a game is created on its owner
+        """
+        while not ShardRouter.isOwner(game_id):
+            game_id = str(uuid4())
+        return game_id
+
+
+    def getForwardNode(game_ids: Iterable[str], forwarded_by: Optional[str]) -> Optional[str]:
+        """
+        Node to forward a request for the given games to, None to handle it here.
+        Forwarded requests are never forwarded again, so a ring configured differently on two nodes cannot loop.
+        They are rejected with MisdirectedShardException unless this node owns their games: the header can be
+        sent by any client, and only the owner may cache or journal a game.
+        """
+        if not ShardRouter.ring:
+            return None
+        owners = {ShardRouter.getOwner(game_id) for game_id in game_ids}
+        # nothing to route, e.g. an empty batch
+        if not owners:
+            return None
+        if forwarded_by:
+            ShardRouter.stats["received"] += 1
+            if owners != {ShardRouter.self_node}:
+                ShardRouter.stats["misrouted"] += 1
+                logging.warning(f"request forwarded by {forwarded_by} for games not owned by {ShardRouter.self_node}")
+                raise MisdirectedShardException(owners - {ShardRouter.self_node})
+            return None
+        if len(owners) != 1:
+            raise CrossShardBatchException()
+        owner = owners.pop()
+        return None if owner == ShardRouter.self_node else owner
+
+
+    async def forward(node: str, path: str, body: Dict, params: Dict) -> httpx.Response:
+        if ShardRouter.client is None:
+            ShardRouter.client = httpx.AsyncClient(timeout=ShardRouter.timeout)
+        try:
+            response = await ShardRouter.client.post(f"{node}{path}", json=body, params=params,
+                headers={FORWARDED_HEADER: ShardRouter.self_node})
+        except httpx.HTTPError:
+            ShardRouter.stats["unavailable"] += 1
+            logging.error(f"shard {node} unavailable for {path}")
+            raise ShardUnavailableException()
+        ShardRouter.stats["forwarded"] += 1
+        return response
+
+
+    async def close() -> None:
+        if ShardRouter.client:
+            await ShardRouter.client.aclose()
+            ShardRouter.client = None
+
+
+    def getStats() -> Dict:
+        return {
+            "enabled": ShardRouter.ring is not None,
+            "self": ShardRouter.self_node,
+            "shares": ShardRouter.ring.getShares() if ShardRouter.ring else {},
+            **ShardRouter.stats,
+        }
+
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Run a local cluster of sharded app nodes.")
+    parser.add_argument("--shards", type=int, default=3)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=8001, help="port of the first shard, the others follow")
+    options = parser.parse_args(args)
+
+    # schema once, before the shards start
+    from mnk.migrations import migrate
+    migrate()
+
+    nodes = [f"http://{options.host}:{options.base_port + index}" for index in range(options.shards)]
+    processes = []
+    for index, node in enumerate(nodes):
+        env = dict(os.environ, SHARD_NODES=",".join(nodes), SHARD_SELF=node)
+        if env.get("WRITE_BEHIND", "").lower() in ("1", "true"):
+            # one journal per shard
+            env["JOURNAL_PATH"] = f"journal/shard_{index}.journal"
+        processes.append(subprocess.Popen([sys.executable, "-m", "uvicorn", "mnk.app:app",
+            "--host", options.host, "--port", str(options.base_port + index)], env=env))
+        print(f"shard {index} on {node}")
+
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+
+if __name__ == "__main__":
+    main()
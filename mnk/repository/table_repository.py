@@ -0,0 +1,112 @@
+import logging
+import mmap
+import os
+from typing import Dict, List, Optional, Tuple
+
+from mnk.helpers.board_symmetry import getCanonicalKey, invertPermutation
+from mnk.models.bitboard import BitBoard
+
+
+## Table file format
+# header: b'MNKT' + bytes([rows, columns, win_length, version])
+# body: one byte per base 3 position key (cells: 0 vacant, 1 player to move, 2 opponent),
+#       filled only for canonical (symmetry reduced) reachable positions that are not over yet.
+#       high 4 bits -> outcome for the player to move, low 4 bits -> best cell in canonical orientation
+TABLE_MAGIC = b'MNKT'
+TABLE_VERSION = 1
+TABLE_HEADER_SIZE = 8
+TABLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'tables')
+
+OUTCOME_WIN, OUTCOME_DRAW, OUTCOME_LOSS = 1, 2, 3
+NOT_IN_TABLE = 0xFF
+
+
+
+def getTableFileName(rows: int, columns: int, win_length: int) -> str:
+    return f"{rows}x{columns}x{win_length}.bin"
+
+
+
+def getCells(bitboard: BitBoard, player: int) -> List[int]:
+    """
+    row-major cell values from the view of the player to move (1 -> own stone, 2 -> opponent stone)
+    """
+    own, opponent = bitboard.stones[player], bitboard.stones[1 - player]
+    cells = []
+    for row in range(bitboard.rows):
+        for col in range(bitboard.columns):
+            index = bitboard.cellIndex(row, col)
+            cells.append(1 if (own >> index) & 1 else (2 if (opponent >> index) & 1 else 0))
+    return cells
+
+
+
+class PerfectPlayTable:
+
+    """
+    Precomputed best move and outcome of every position of a small m-n-k game.
+    Backed by a read only memory map of the table file, so lookups are O(1)
+    and the pages are shared between worker processes.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as table_file:
+            self.data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = self.data[:TABLE_HEADER_SIZE]
+        if header[:4] != TABLE_MAGIC or header[7] != TABLE_VERSION:
+            raise ValueError(f"{path} is not a valid perfect play table.")
+        self.rows, self.columns, self.win_length = header[4], header[5], header[6]
+
+
+    def lookup(self, bitboard: BitBoard, player: int) -> Optional[Tuple[int, int, int]]:
+        """
+        returns (row, col, outcome) for the player to move, None if the position is not in the table
+        """
+        key, permutation = getCanonicalKey(getCells(bitboard, player), self.rows, self.columns)
+        entry = self.data[TABLE_HEADER_SIZE + key]
+        if entry == NOT_IN_TABLE:
+            return None
+        # map the canonical cell back to the orientation of the actual board
+        cell = invertPermutation(permutation)[entry & 0x0F]
+        row, col = divmod(cell, self.columns)
+        return row, col, entry >> 4
+
+
+    def close(self) -> None:
+        self.data.close()
+
+
+
+class TableRepo:
+    """
+    This class will be the means to access precomputed perfect play tables, keyed by (rows, columns, win_length).
+    """
+
+    tables: Dict[Tuple[int, int, int], PerfectPlayTable] = {}
+    # configurations already looked up on disk without a table file
+    missing = set()
+
+
+    def loadTables(directory: str = TABLES_DIR) -> None:
+        """
+        memory maps all table files in the directory, done at app startup
+        """
+        if not os.path.isdir(directory):
+            return
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith('.bin'):
+                table = PerfectPlayTable(os.path.join(directory, file_name))
+                TableRepo.tables[(table.rows, table.columns, table.win_length)] = table
+                logging.info(f"perfect play table loaded: {file_name}")
+
+
+    def getTable(rows: int, columns: int, win_length: int) -> Optional[PerfectPlayTable]:
+        config = (rows, columns, win_length)
+        if config not in TableRepo.tables and config not in TableRepo.missing:
+            # lazy load, in case it was not loaded at startup
+            path = os.path.join(TABLES_DIR, getTableFileName(rows, columns, win_length))
+            if os.path.exists(path):
+                TableRepo.tables[config] = PerfectPlayTable(path)
+            else:
+                TableRepo.missing.add(config)
+        return TableRepo.tables.get(config)
@@ -0,0 +1,88 @@
+from fastapi import APIRouter, HTTPException
+
+from mnk.repository.game_archive import GameArchive
+from mnk.repository.game_db_repository import GameDBRepo
+from mnk.repository.game_repository import GameRepo
+from mnk.repository.move_journal import MoveJournal
+from mnk.repository.position_cache import PositionCache
+from mnk.repository.shard_router import ShardRouter
+from mnk.svc.game_channels import GameChannels
+
+
+router = APIRouter(prefix="/admin")
+
+
+
+# route to get write-behind journal stats
+@router.get("/journal", tags=["admin"])
+async def getJournalStats():
+    """
+    API to get pending entries and flush lag of the write-behind journal.
+    """
+    if not MoveJournal.active:
+        raise HTTPException(status_code=404, detail="Write-behind mode is not enabled.")
+    return MoveJournal.active.getStats()
+
+
+
+# route to get game cache stats
+@router.get("/cache", tags=["admin"])
+async def getCacheStats():
+    """
+    API to get size, hit/miss and eviction counters of the game cache.
+    """
+    return await GameRepo.getStats()
+
+
+
+# route to get sharding stats
+@router.get("/shards", tags=["admin"])
+async def getShardStats():
+    """
+    API to get this node, the share of games owned by every node and forwarding counters.
+    """
+    return ShardRouter.getStats()
+
+
+
+# route to get websocket stats
+@router.get("/channels", tags=["admin"])
+async def getChannelStats():
+    """
+    API to get the number of games with websocket clients, connected clients and clients dropped for being slow.
+    """
+    return GameChannels.getStats()
+
+
+
+# route to get position cache stats
+@router.get("/positions", tags=["admin"])
+async def getPositionCacheStats():
+    """
+    API to get size, hits and hit rate of the cache of searched computer moves.
+    """
+    if not PositionCache.active:
+        raise HTTPException(status_code=404, detail="Position cache is not enabled.")
+    return PositionCache.active.getStats()
+
+
+
+# route to get db pool stats
+@router.get("/db", tags=["admin"])
+async def getDBPoolStats():
+    """
+    API to get the connection pool settings and the time requests waited for a free connection.
+    """
+    return GameDBRepo.getPoolStats()
+
+
+
+# route to get archival stats
+@router.get("/archive", tags=["admin"])
+async def getArchiveStats():
+    """
+    API to get the number of finished games moved to the archive and the timings of the last run.
+    """
+    if not GameArchive.active:
+        raise HTTPException(status_code=404, detail="Archival is not enabled.")
+    return GameArchive.active.getStats()
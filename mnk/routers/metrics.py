@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Response
+
+from mnk.metrics import Metrics
+
+
+router = APIRouter()
+
+
+
+# route to scrape metrics
+@router.get("/metrics", tags=["metrics"])
+async def getMetrics():
+    """
+    API to get per stage and per route latency histograms and response counters, in prometheus text format.
+    """
+    return Response(Metrics.render(), media_type="text/plain; version=0.0.4")
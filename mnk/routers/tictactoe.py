@@ -1,22 +1,126 @@
+import json
 import logging
 import traceback
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
-from mnk.models.tictactoe_constants import Constants
-from ormar import NoMatch
+from fastapi import APIRouter, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 
-from mnk.database import Games, Moves
 from mnk.exceptions.mnk_exceptions import *
 from mnk.models.tictactoe_models import *
 from mnk.svc.tictactoe_service import TicTacToe
+from mnk.svc.game_channels import GameChannels
+from mnk.helpers.tictactoe_helper import getMoveEvent, getMovesJson, getStateEvent
 from mnk.repository.game_repository import GameRepo
-from mnk.config import settings
-from mnk.helpers.tictactoe_helper import getDateFromStr, getDateToStr
+from mnk.repository.game_db_repository import GameDBRepo
+from mnk.repository.move_journal import MoveJournal
+from mnk.repository.shard_router import ShardRouter
+from mnk.metrics import Metrics
 
 
-cache_enabled = settings.use_cache
+# set from settings at app startup
+cache_enabled = False
 router = APIRouter(prefix="/tictactoe")
 
+# times a move is attempted on the latest game state, when other requests update the game concurrently
+MAX_UPDATE_ATTEMPTS = 3
+
+# moves per page of the move history
+MOVE_PAGE_SIZE = 100
+MAX_MOVE_PAGE_SIZE = 1000
+
+
+
+# with sharding only the node owning a game caches it, the cached copy is then always the latest
+def isCached(game_id: str) -> bool:
+    return cache_enabled and ShardRouter.isOwner(game_id)
+
+
+
+# helper to hand a request to the node owning its games, the owner's response is returned as is
+async def forwardRequest(node: str, path: str, body: BaseModel, history: bool) -> Response:
+    response = await ShardRouter.forward(node, path, body.dict(), {"history": history})
+    return Response(content=response.content, status_code=response.status_code, media_type="application/json")
+
+
+
+# helper to get a game from cache if possible, else read it from db
+async def getGame(game_id: str) -> TicTacToeData:
+    """
+    Gets the game with its board, the move history is only loaded if needed (see loadMoves).
+    """
+    game: TicTacToeData = None
+    # in write-behind mode games with moves not yet in db are read from the journal
+    if MoveJournal.active:
+        game = MoveJournal.active.getPendingGame(game_id)
+
+    # if caching is enabled and game is in cache then read from there
+    if isCached(game_id) and not game:
+        with Metrics.span("cache_read"):
+            game = await GameRepo.getGameById(game_id)
+
+    if not game:
+        try:
+            # read game from db
+            with Metrics.span("db_read_game"):
+                game = await GameDBRepo.getGame(game_id)
+
+            # add game to cache if caching enabled in config
+            if isCached(game_id):
+                with Metrics.span("cache_write"):
+                    await GameRepo.addGame(game)
+
+        except GameNotFoundException:
+            logging.error(traceback.format_exc())
+            raise
+
+        except:
+            logging.error(traceback.format_exc())
+            raise PersistenceException()
+
+    return game
+
+
+
+# helpers to persist games, directly in db or through the journal in write-behind mode
+async def saveNewGame(game: TicTacToeData) -> None:
+    if MoveJournal.active:
+        with Metrics.span("journal_append"):
+            await MoveJournal.active.appendCreate(game)
+    else:
+        with Metrics.span("db_write"):
+            await GameDBRepo.createGame(game)
+
+
+async def saveMoves(game: TicTacToeData, moves: List[Move], expected_version: int) -> None:
+    if MoveJournal.active:
+        with Metrics.span("journal_append"):
+            await MoveJournal.active.appendMoves(game, moves, expected_version)
+    else:
+        with Metrics.span("db_write"):
+            await GameDBRepo.saveMoves(game, moves, expected_version)
+
+
+async def saveBatch(games_moves: List[Tuple[TicTacToeData, List[Move], int]]) -> None:
+    if MoveJournal.active:
+        with Metrics.span("journal_append"):
+            await MoveJournal.active.appendBatch(games_moves)
+    else:
+        with Metrics.span("db_write"):
+            await GameDBRepo.saveBatch(games_moves)
+
+
+
+# helper to load the full move history of games restored from their board snapshot, for the response
+async def loadMoves(games: List[TicTacToeData]) -> None:
+    try:
+        with Metrics.span("db_load_moves"):
+            for game in games:
+                await GameDBRepo.loadMoves(game)
+    except:
+        logging.error(traceback.format_exc())
+        raise PersistenceException()
+
 
 
 # route to create a new game
@@ -29,29 +133,20 @@ async def createNewGame(create_data: CreateGameRequest):
     try:
         new_game: TicTacToeData = None
         # Initialise game data based on config
-        new_game = TicTacToe.createGame(create_data)
+        with Metrics.span("create_game"):
+            new_game = await TicTacToe.createGameAsync(create_data)
+        # the game is created on the node that will own it
+        new_game.id = ShardRouter.getOwnedId(new_game.id)
         
         # persist the game
         try:
-            # add game to db
-            await Games.objects.create(id=new_game.id, mode=new_game.mode.value, 
-            player_1_pawn=new_game.player_1, player_2_pawn=new_game.player_2, 
-            player_turn=new_game.player_turn ,status=new_game.status.value,
-            created=getDateFromStr(new_game.created))
-
-            # If moves len is 1, then add that move to db (automove case)
-            if len(new_game.moves) == 1:
-                # reference to game for foreign key constraint
-                game_fk = Games(id=new_game.id, mode=new_game.mode.value, player_1_pawn=new_game.player_1,
-                player_2_pawn=new_game.player_2, player_turn=new_game.player_turn,
-                status=new_game.status.value, created=getDateFromStr(new_game.created))
-                move: Move = new_game.moves[0]
-                # write to db
-                await Moves.objects.create(game=game_fk, pawn=move.pawn, row=move.row, column=move.column, created=getDateFromStr(move.created))
+            # add game to db, along with the automove if computer started
+            await saveNewGame(new_game)
             
             # add game to cache if caching enabled in config
             if cache_enabled:
-                GameRepo.addGame(new_game)
+                with Metrics.span("cache_write"):
+                    await GameRepo.addGame(new_game)
 
         except:
             logging.error(traceback.format_exc())
@@ -82,95 +177,96 @@ async def createNewGame(create_data: CreateGameRequest):
 
 
 
+# one attempt at making a move on the latest saved state of the game
+async def applyMove(move_data: MakeMoveRequest) -> Tuple[TicTacToeData, List[Move]]:
+    """
+    Returns the game and the moves made (player move and automove).
+    Raises ConcurrentUpdateException if the game was updated by another request since it was read.
+    """
+    game: TicTacToeData = await getGame(move_data.game_id)
+
+    moves_made = len(game.moves)
+    expected_version = game.version
+    # make move based on mode and logic
+    with Metrics.span("make_move"):
+        TicTacToe.makeMove(move_data.pawn, move_data.row, move_data.column, game)
+    if game.mode == GameMode.SINGLE_PLAYER:
+        with Metrics.span("auto_move"):
+            await TicTacToe.makeAutoMoveAsync(game)
+    game.version += 1
+    new_moves = game.moves[moves_made:]
+
+    # persist the move(s) made and the updated game status and next player turn, in one go
+    try:
+        await saveMoves(game, new_moves, expected_version)
+
+    except ConcurrentUpdateException:
+        # cached game is out of date, next attempt reads it again
+        await GameRepo.removeGame(game.id)
+        raise
+
+    except:
+        logging.error(traceback.format_exc())
+        # drop the cached game so it is read again from db
+        await GameRepo.removeGame(game.id)
+        raise PersistenceException()
+
+    # update game to cache if caching enabled in config, unless a newer version is already cached
+    if isCached(game.id):
+        with Metrics.span("cache_write"):
+            await GameRepo.addGame(game, expected_version)
+
+    return game, new_moves
+
+
+
+# makes the move, retried on the latest state of the game while other requests update it at the same time
+async def applyMoveWithRetries(move_data: MakeMoveRequest) -> Tuple[TicTacToeData, List[Move]]:
+    for attempt in range(1, MAX_UPDATE_ATTEMPTS + 1):
+        try:
+            return await applyMove(move_data)
+        except ConcurrentUpdateException:
+            logging.warning(f"concurrent update of game {move_data.game_id}, attempt {attempt}")
+            if attempt == MAX_UPDATE_ATTEMPTS:
+                raise
+
+
+
 # route to make a new move
 @router.post("/move", tags=["tictactoe"])
-async def makeNewMove(move_data: MakeMoveRequest):
+async def makeNewMove(move_data: MakeMoveRequest, history: bool = False, x_forwarded_shard: Optional[str] = Header(None)):
     """
     API to make a move in a valid game.
+    Responds with the moves made by this request, or the whole move history with `history=true`.
+    If the game is updated by another request at the same time, the move is retried on the latest state.
     """
 
-    # Get the game for which move is requested to be made
     try:
-        game: TicTacToeData = None
-        # if caching is enabled and game is in cache then read from there
-        if cache_enabled:
-            game = GameRepo.getGameById(move_data.game_id)
-
-        if not game:
-            try:
-                # read game from db
-                db_game:Games = await Games.objects.get(id=move_data.game_id)
-                
-                game = TicTacToeData(db_game.id, GameStatus[db_game.status],
-                getDateToStr(db_game.created), mode=GameMode[db_game.mode], 
-                player_1=db_game.player_1_pawn, player_2=db_game.player_2_pawn,
-                player_turn=db_game.player_turn)
-
-                #read corresponding moves from db (to get vacant spots and for winning logic)
-                moves: List[Moves] = await Moves.objects.filter(game__id=db_game.id).all()
-                game.moves = [Move(move.pawn, move.row, move.column, getDateToStr(move.created)) for move in moves]
-                # update the vacant spots count
-                game.number_of_vacant_cells -= len(game.moves)
-                # update board with moves made so far
-                for move in game.moves:
-                    game.board[move.row][move.column] = move.pawn
-
-                # add game to cache if caching enabled in config
-                if cache_enabled:
-                    GameRepo.addGame(game)
-
-            except NoMatch as e:
-                logging.error(traceback.format_exc())
-                raise GameNotFoundException()
-
-            except:
-                logging.error(traceback.format_exc())
-                raise PersistenceException()
-
-
-        # make move based on mode and logic
-        if game.mode == GameMode.SINGLE_PLAYER:
-            TicTacToe.makeMove(move_data.pawn, move_data.row, move_data.column, game)
-            TicTacToe.makeAutoMove(game)
-        else:
-            TicTacToe.makeMove(move_data.pawn, move_data.row, move_data.column, game)
-        
+        owner = ShardRouter.getForwardNode([move_data.game_id], x_forwarded_shard)
+        if owner:
+            return await forwardRequest(owner, "/tictactoe/move", move_data, history)
 
-        # persist the move made in db
-        try:
-            # reference to game for foreign key constraint
-            game_fk = Games(id=game.id, mode=game.mode.value, player_1_pawn=game.player_1,
-            player_2_pawn=game.player_2, player_turn=game.player_turn,
-            status=game.status.value, created=getDateFromStr(game.created))
-            
-            last_move = len(game.moves)
-            move: Move = game.moves[last_move-1]
-            # write to db
-            await Moves.objects.create(game=game_fk, pawn=move.pawn, row=move.row, column=move.column, created=getDateFromStr(move.created))
-            
-            # if automove was made then persist second last move as well
-            if game.mode == GameMode.SINGLE_PLAYER:
-                player_move: Move = game.moves[last_move-2]
-                # write to db
-                await Moves.objects.create(game=game_fk, pawn=player_move.pawn, row=player_move.row, column=player_move.column, created=getDateFromStr(player_move.created))
-            
-            # update game status and next player turn
-            await Games.objects.filter(id__exact=game.id).update(player_turn=game.player_turn, status=game.status.value)
-
-            # update game to cache if caching enabled in config
-            if cache_enabled:
-                GameRepo.addGame(game)
+        game, new_moves = await applyMoveWithRetries(move_data)
+        # push the move to websocket clients of the game
+        GameChannels.notify(game.id, getMoveEvent(game, new_moves))
+        if history:
+            await loadMoves([game])
 
-        except:
-            logging.error(traceback.format_exc())
-            raise PersistenceException()
-        
     except GameNotFoundException as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    except ConcurrentUpdateException as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
     except PersistenceException as e:
         raise HTTPException(status_code=502, detail=str(e))
 
+    except ShardUnavailableException as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    except MisdirectedShardException as e:
+        raise HTTPException(status_code=421, detail=str(e))
+
     except (InvalidMoveException, IllegalPlayerTurnException, InvalidGameStateException) as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -182,7 +278,250 @@ async def makeNewMove(move_data: MakeMoveRequest):
         "player_1": game.player_1,
         "player_2": game.player_2,
         "player_turn" : game.player_turn,
-        "moves" : game.moves
+        "moves" : getMovesJson(game.moves if history else new_moves)
+    }
+
+    return response
+
+
+
+
+# one attempt at making a batch of moves on the latest saved state of the games
+async def applyMoves(batch_data: BatchMoveRequest) -> Tuple[int, Optional[Dict], Dict[str, TicTacToeData], Dict[str, List[Move]]]:
+    """
+    Returns the number of moves applied, the error of the first move that could not be made, the games
+    and the moves made in each of them.
+    Raises ConcurrentUpdateException, with nothing saved, if any game was updated by another request since it was read.
+    """
+    games: Dict[str, TicTacToeData] = {}
+    new_moves: Dict[str, List[Move]] = {}
+    expected_versions: Dict[str, int] = {}
+    applied = 0
+    error = None
+
+    for index, move_data in enumerate(batch_data.moves):
+        try:
+            game = games.get(move_data.game_id)
+            if not game:
+                game = await getGame(move_data.game_id)
+                games[game.id] = game
+                new_moves[game.id] = []
+                expected_versions[game.id] = game.version
+
+            moves_made = len(game.moves)
+            # make move based on mode and logic
+            with Metrics.span("make_move"):
+                TicTacToe.makeMove(move_data.pawn, move_data.row, move_data.column, game)
+            if game.mode == GameMode.SINGLE_PLAYER:
+                with Metrics.span("auto_move"):
+                    await TicTacToe.makeAutoMoveAsync(game)
+            new_moves[game.id] += game.moves[moves_made:]
+            applied += 1
+
+        except (GameNotFoundException, InvalidMoveException, IllegalPlayerTurnException, InvalidGameStateException) as e:
+            error = {"index": index, "game_id": move_data.game_id, "detail": str(e)}
+            break
+
+    # one new version per game changed by this batch
+    changed = [(games[game_id], moves, expected_versions[game_id]) for game_id, moves in new_moves.items() if moves]
+    for game, _, _ in changed:
+        game.version += 1
+
+    # persist all the moves made in one transaction
+    try:
+        await saveBatch(changed)
+
+    except ConcurrentUpdateException:
+        # cached games are out of date, next attempt reads them again
+        for game_id in games:
+            await GameRepo.removeGame(game_id)
+        raise
+
+    except:
+        logging.error(traceback.format_exc())
+        # drop the cached games so they are read again from db
+        for game_id in games:
+            await GameRepo.removeGame(game_id)
+        raise PersistenceException()
+
+    # update games to cache if caching enabled in config
+    for game, _, expected_version in changed:
+        if isCached(game.id):
+            with Metrics.span("cache_write"):
+                await GameRepo.addGame(game, expected_version)
+
+    return applied, error, games, new_moves
+
+
+
+# route to make a batch of moves, in one or many games
+@router.post("/move/batch", tags=["tictactoe"])
+async def makeNewMoves(batch_data: BatchMoveRequest, history: bool = False, x_forwarded_shard: Optional[str] = Header(None)):
+    """
+    API to make a list of moves in order, e.g. for bots or replaying games.
+    Stops at the first move that cannot be made, moves before it are kept.
+    Responds with the moves made in each game by this request, or the whole move history with `history=true`.
+    If a game is updated by another request at the same time, the whole batch is retried on the latest state.
+    With sharding, all games of a batch must be owned by the same node.
+    """
+
+    try:
+        owner = ShardRouter.getForwardNode([move_data.game_id for move_data in batch_data.moves], x_forwarded_shard)
+        if owner:
+            return await forwardRequest(owner, "/tictactoe/move/batch", batch_data, history)
+
+        for attempt in range(1, MAX_UPDATE_ATTEMPTS + 1):
+            try:
+                applied, error, games, new_moves = await applyMoves(batch_data)
+                break
+            except ConcurrentUpdateException:
+                logging.warning(f"concurrent update in move batch, attempt {attempt}")
+                if attempt == MAX_UPDATE_ATTEMPTS:
+                    raise
+        for game_id, moves in new_moves.items():
+            if moves:
+                GameChannels.notify(game_id, getMoveEvent(games[game_id], moves))
+        if history:
+            await loadMoves(list(games.values()))
+
+    except ConcurrentUpdateException as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    except PersistenceException as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+    except ShardUnavailableException as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    except MisdirectedShardException as e:
+        raise HTTPException(status_code=421, detail=str(e))
+
+    except CrossShardBatchException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+    response = {
+        "applied": applied,
+        "error": error,
+        "games": [{
+            "game_id" : game.id,
+            "game_board" : game.board,
+            "game_status" : game.status,
+            "player_1": game.player_1,
+            "player_2": game.player_2,
+            "player_turn" : game.player_turn,
+            "moves" : getMovesJson(game.moves if history else new_moves[game.id])
+        } for game in games.values()]
     }
 
     return response
+
+
+
+
+# streams one page of the move history as json, the row after the page (if any) only tells there is a next page
+async def streamMovePage(game_id: str, rows: AsyncIterator[Tuple[int, Move]], limit: int) -> AsyncIterator[str]:
+    yield '{"game_id": %s, "moves": [' % json.dumps(game_id)
+    sent, last_id, next_cursor = 0, None, None
+    async for move_id, move in rows:
+        if sent == limit:
+            next_cursor = last_id
+            continue
+        yield (", " if sent else "") + json.dumps(getMovesJson([move])[0])
+        sent, last_id = sent + 1, move_id
+    yield '], "next_cursor": %s}' % json.dumps(next_cursor)
+
+
+
+# route to page through the move history of a game
+@router.get("/{game_id}/moves", tags=["tictactoe"])
+async def getMoveHistory(game_id: str, after: int = 0, limit: int = MOVE_PAGE_SIZE):
+    """
+    API to get the moves of a game, oldest first, one page at a time.
+    For the next page pass the `next_cursor` of the previous page as `after`, it is null on the last page.
+    """
+    if limit < 1 or limit > MAX_MOVE_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"Limit must be between 1 and {MAX_MOVE_PAGE_SIZE}.")
+
+    # in write-behind mode moves still in the journal have no id yet, they are written first
+    if MoveJournal.active:
+        try:
+            await MoveJournal.active.flushGame(game_id)
+        except:
+            logging.error(traceback.format_exc())
+            raise HTTPException(status_code=502, detail=str(PersistenceException()))
+
+    # one row more than the page, to know if there is a next page
+    rows = GameDBRepo.iterateMoves(game_id, after, limit + 1)
+    try:
+        first_row = await rows.__anext__()
+    except StopAsyncIteration:
+        first_row = None
+    except:
+        logging.error(traceback.format_exc())
+        raise HTTPException(status_code=502, detail=str(PersistenceException()))
+
+    if first_row is None:
+        if after == 0 and not await GameDBRepo.gameExists(game_id):
+            raise HTTPException(status_code=400, detail=str(GameNotFoundException()))
+        return {"game_id": game_id, "moves": [], "next_cursor": None}
+
+    async def pageRows():
+        yield first_row
+        async for row in rows:
+            yield row
+
+    return StreamingResponse(streamMovePage(game_id, pageRows(), limit), media_type="application/json")
+
+
+
+
+# websocket to play a game, without polling for the other player's moves
+# (fastapi 0.70 does not add the router prefix to websocket routes, so the path is given in full)
+@router.websocket(router.prefix + "/ws/{game_id}")
+async def playGame(websocket: WebSocket, game_id: str):
+    """
+    Sends the game state on connect, then a move event whenever a move is made in the game, by any client or api.
+    Send {"pawn": "x", "row": 0, "column": 1} to make a move, an error event is only sent back to the client that sent it.
+    """
+    await websocket.accept()
+
+    # events are pushed by the node owning the game
+    owner = ShardRouter.getForwardNode([game_id], None)
+    if owner:
+        await websocket.send_json({"event": "redirect", "url": f"ws{owner[4:]}/tictactoe/ws/{game_id}"})
+        await websocket.close()
+        return
+
+    try:
+        game = await getGame(game_id)
+    except (GameNotFoundException, PersistenceException) as e:
+        await websocket.send_json({"event": "error", "detail": str(e)})
+        await websocket.close()
+        return
+
+    GameChannels.subscribe(game_id, websocket)
+    try:
+        await websocket.send_json(getStateEvent(game))
+        while True:
+            message = await websocket.receive_text()
+            try:
+                move_data = MakeMoveRequest(**dict(json.loads(message), game_id=game_id))
+            except (ValueError, TypeError):
+                await websocket.send_json({"event": "error", "detail": "Invalid move, send pawn, row and column."})
+                continue
+
+            try:
+                game, new_moves = await applyMoveWithRetries(move_data)
+            except (InvalidMoveException, IllegalPlayerTurnException, InvalidGameStateException,
+                    ConcurrentUpdateException, PersistenceException) as e:
+                await websocket.send_json({"event": "error", "detail": str(e)})
+                continue
+            # the sender is subscribed too, the event is its acknowledgement
+            GameChannels.notify(game_id, getMoveEvent(game, new_moves))
+
+    except WebSocketDisconnect:
+        pass
+
+    finally:
+        GameChannels.unsubscribe(game_id, websocket)
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+
+
+
+class GameChannels:
+
+    """
+    Game Channels Doc
+    __________________
+
+    WebSocket subscribers of every game in this process. A move event is pushed to all clients
+    subscribed to the game as soon as the move is saved, whichever api it was made through.
+    Events are sent in the background, in order per game, and a client that cannot take an
+    event within SEND_TIMEOUT seconds is dropped (and its socket closed), so one slow client
+    never holds up a move.
+    """
+
+    SEND_TIMEOUT = 1.0
+    # close code for dropped clients, they can reconnect to get the game state
+    DROP_CLOSE_CODE = 1013
+
+    subscribers: Dict[str, Set[Any]] = {}
+    # last send of every game, the next event of the game is sent after it
+    sends: Dict[str, asyncio.Task] = {}
+    dropped = 0
+
+
+    def subscribe(game_id: str, websocket: Any) -> None:
+        GameChannels.subscribers.setdefault(game_id, set()).add(websocket)
+
+
+    def unsubscribe(game_id: str, websocket: Any) -> None:
+        sockets = GameChannels.subscribers.get(game_id)
+        if sockets is None:
+            return
+        sockets.discard(websocket)
+        if not sockets:
+            del GameChannels.subscribers[game_id]
+
+
+    def notify(game_id: str, event: Dict) -> None:
+        """
+        Publishes the event in the background, after the earlier events of the game, the caller does not wait for it.
+        """
+        if game_id not in GameChannels.subscribers:
+            return
+        task = asyncio.get_running_loop().create_task(
+            GameChannels.publishAfter(GameChannels.sends.get(game_id), game_id, event))
+        GameChannels.sends[game_id] = task
+        task.add_done_callback(lambda done: GameChannels.sends.pop(game_id) if GameChannels.sends.get(game_id) is done else None)
+
+
+    async def publishAfter(previous: Optional[asyncio.Task], game_id: str, event: Dict) -> int:
+        if previous is not None:
+            await asyncio.wait([previous])
+        return await GameChannels.publish(game_id, event)
+
+
+    async def publish(game_id: str, event: Dict) -> int:
+        """
+        Sends the event to every subscriber of the game at once, returns the number of clients it reached.
+        """
+        sockets = list(GameChannels.subscribers.get(game_id, ()))
+        if not sockets:
+            return 0
+        results = await asyncio.gather(*[asyncio.wait_for(websocket.send_json(event), GameChannels.SEND_TIMEOUT)
+            for websocket in sockets], return_exceptions=True)
+
+        sent = 0
+        dropped = []
+        for websocket, result in zip(sockets, results):
+            if isinstance(result, Exception):
+                logging.warning(f"websocket of game {game_id} dropped, {type(result).__name__}")
+                GameChannels.unsubscribe(game_id, websocket)
+                GameChannels.dropped += 1
+                dropped.append(websocket)
+            else:
+                sent += 1
+        if dropped:
+            # closed, so the client knows it no longer gets events (its receive loop ends)
+            await asyncio.gather(*[asyncio.wait_for(websocket.close(code=GameChannels.DROP_CLOSE_CODE), GameChannels.SEND_TIMEOUT)
+                for websocket in dropped], return_exceptions=True)
+        return sent
+
+
+    def getStats() -> Dict:
+        return {
+            "games": len(GameChannels.subscribers),
+            "subscribers": sum(len(sockets) for sockets in GameChannels.subscribers.values()),
+            "dropped": GameChannels.dropped,
+        }
@@ -0,0 +1,315 @@
+"""
+Search based computer opponent for m-n-k games
+"""
+
+from collections import OrderedDict
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from mnk.models.bitboard import BitBoard
+from mnk.models.tictactoe_models import Difficulty
+
+
+
+## Search budgets per difficulty
+# max_depth: plies searched at most (None -> until the board is full)
+# time_limit: seconds per move, nodes: nodes visited per move
+SEARCH_BUDGETS = {
+    Difficulty.MEDIUM: {"max_depth": 2, "time_limit": 0.02, "nodes": 2_000},
+    Difficulty.HARD: {"max_depth": None, "time_limit": 0.25, "nodes": 200_000},
+}
+
+TRANSPOSITION_TABLE_SIZE = 100_000
+WIN_SCORE = 1_000_000
+
+# transposition table entry flags
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+
+
+class SearchBudgetExceeded(Exception):
+    """
+    Raised inside the search when the time or node budget for a move is used up.
+    """
+    pass
+
+
+
+def popCount(bits: int) -> int:
+    return bin(bits).count('1')
+
+
+
+class TranspositionTable:
+
+    """
+    Bounded table of searched positions keyed by zobrist hash.
+    Least recently used entries are evicted once it is full.
+    """
+
+    def __init__(self, max_size: int = TRANSPOSITION_TABLE_SIZE):
+        self.max_size = max_size
+        self.entries: "OrderedDict[int, Tuple[int, int, int, int]]" = OrderedDict()
+
+
+    def get(self, key: int) -> Optional[Tuple[int, int, int, int]]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+
+    def put(self, key: int, depth: int, score: int, flag: int, best_cell: int) -> None:
+        self.entries[key] = (depth, score, flag, best_cell)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+
+class NegamaxSearch:
+
+    """
+    Negamax Search Doc
+    ___________________
+
+    Negamax with alpha-beta pruning and iterative deepening over the bitboard engine.
+    Positions are hashed with zobrist keys into a bounded transposition table, which is
+    kept between moves (and games) for the same board configuration.
+    Every move is bounded by a time and node budget; when it runs out the best move of
+    the last fully searched depth is played.
+    """
+
+    # one search instance (zobrist keys + transposition table) per (rows, columns, win_length)
+    instances: Dict[Tuple[int, int, int], "NegamaxSearch"] = {}
+
+
+    def getInstance(rows: int, columns: int, win_length: int) -> "NegamaxSearch":
+        config = (rows, columns, win_length)
+        if config not in NegamaxSearch.instances:
+            NegamaxSearch.instances[config] = NegamaxSearch(rows, columns, win_length)
+        return NegamaxSearch.instances[config]
+
+
+    def __init__(self, rows: int, columns: int, win_length: int, table_size: int = TRANSPOSITION_TABLE_SIZE):
+        self.template = BitBoard(rows, columns, win_length)
+        self.cells = [self.template.cellIndex(row, col) for row in range(rows) for col in range(columns)]
+        self.board_mask = sum(1 << cell for cell in self.cells)
+        # small boards are searched on every vacant cell, large boards only next to existing stones
+        self.neighbours_only = len(self.cells) > 16
+        center = self.template.cellIndex(rows // 2, columns // 2)
+        # static move ordering: cells closer to the center first
+        self.ordered_cells = sorted(self.cells, key=lambda cell: abs(cell // self.template.stride - rows // 2)
+            + abs(cell % self.template.stride - columns // 2))
+        self.center = center
+
+        generator = random.Random(rows * 10_000 + columns * 100 + win_length)
+        size = self.template.stride * rows
+        self.zobrist = [[generator.getrandbits(64) for _ in range(size)] for _ in range(2)]
+        self.side_key = generator.getrandbits(64)
+        self.table = TranspositionTable(table_size)
+
+        self.nodes = 0
+        self.node_limit = 0
+        self.deadline = 0.0
+        self.last_score = 0
+        self.solved = False
+
+
+    def findMove(self, bitboard: BitBoard, player: int, difficulty: Difficulty, started: float = None) -> Tuple[int, int]:
+        """
+        returns the (row, col) to be played by the given player index
+        started: time.monotonic() when the move was asked for, the time budget counts from it (default now).
+        The monotonic clock is system wide, so it can be read in another process.
+        """
+        budget = SEARCH_BUDGETS[difficulty]
+        stones = list(bitboard.stones)
+        vacant = popCount(self.board_mask & ~(stones[0] | stones[1]))
+        max_depth = vacant if budget["max_depth"] is None else min(budget["max_depth"], vacant)
+
+        self.nodes = 0
+        self.node_limit = budget["nodes"]
+        self.deadline = (started or time.monotonic()) + budget["time_limit"]
+
+        key = self.hashPosition(stones, player)
+        best_cell = self.getCandidates(stones, None)[0]
+        # score of the last completed depth, exact (solved) if a forced result was found or the board was searched to the end
+        self.last_score, self.solved = 0, False
+        # iterative deepening, keeping the move of the last completed depth
+        for depth in range(1, max_depth + 1):
+            try:
+                score, cell = self.searchRoot(stones, player, depth, key)
+            except SearchBudgetExceeded:
+                break
+            best_cell, self.last_score = cell, score
+            self.solved = depth == vacant
+            if abs(score) >= WIN_SCORE - len(self.cells):
+                # forced result found, deeper search cannot change it
+                self.solved = True
+                break
+
+        return self.template.cellLocation(best_cell)
+
+
+    def hashPosition(self, stones: List[int], player: int) -> int:
+        key = self.side_key if player else 0
+        for index in range(2):
+            bits = stones[index]
+            while bits:
+                low = bits & -bits
+                key ^= self.zobrist[index][low.bit_length() - 1]
+                bits ^= low
+        return key
+
+
+    def getCandidates(self, stones: List[int], tt_cell: Optional[int]) -> List[int]:
+        """
+        vacant cells to try, transposition table move first then closest to center
+        """
+        occupied = stones[0] | stones[1]
+        allowed = self.board_mask & ~occupied
+        if self.neighbours_only and occupied:
+            near = 0
+            for shift in self.template.shifts:
+                near |= (occupied << shift) | (occupied >> shift)
+            allowed &= near
+        candidates = [cell for cell in self.ordered_cells if (allowed >> cell) & 1]
+        if not candidates:
+            candidates = [self.center] if not occupied else [cell for cell in self.ordered_cells if not (occupied >> cell) & 1]
+        if tt_cell is not None and tt_cell in candidates:
+            candidates.remove(tt_cell)
+            candidates.insert(0, tt_cell)
+        return candidates
+
+
+    def hasWon(self, bits: int) -> bool:
+        for shifts in self.template.run_shifts:
+            run = bits
+            for shift in shifts:
+                run &= run >> shift
+            if run:
+                return True
+        return False
+
+
+    def evaluate(self, stones: List[int], player: int) -> int:
+        """
+        heuristic score for the player to move: weighted count of runs shorter than win_length
+        """
+        score = 0
+        for index, sign in ((player, 1), (1 - player, -1)):
+            bits = stones[index]
+            for shift in self.template.shifts:
+                run = bits
+                for length in range(2, self.template.win_length):
+                    run &= run >> shift
+                    if not run:
+                        break
+                    score += sign * popCount(run) * (4 ** length)
+        return score
+
+
+    def searchRoot(self, stones: List[int], player: int, depth: int, key: int) -> Tuple[int, int]:
+        entry = self.table.get(key)
+        candidates = self.getCandidates(stones, entry[3] if entry else None)
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best_score, best_cell = -WIN_SCORE - 1, candidates[0]
+
+        for cell in candidates:
+            if depth > 1:
+                # within the iteration too, an unfinished depth is dropped (depth 1 always completes, it finds winning moves)
+                self.checkBudget()
+            score = self.scoreMove(stones, player, cell, depth, -beta, -alpha, 0, key)
+            if score > best_score:
+                best_score, best_cell = score, cell
+            alpha = max(alpha, score)
+
+        self.table.put(key, depth, best_score, EXACT, best_cell)
+        return best_score, best_cell
+
+
+    def scoreMove(self, stones: List[int], player: int, cell: int, depth: int, alpha: int, beta: int, ply: int, key: int) -> int:
+        """
+        plays the cell for the player and returns the score from that player's view
+        (alpha, beta are from the opponent's view, as passed on to the child node)
+        """
+        bit = 1 << cell
+        stones[player] |= bit
+        try:
+            if self.hasWon(stones[player]):
+                return WIN_SCORE - ply
+            if not (self.board_mask & ~(stones[0] | stones[1])):
+                return 0
+            if depth == 1:
+                return -self.evaluate(stones, 1 - player)
+            child_key = key ^ self.zobrist[player][cell] ^ self.side_key
+            return -self.negamax(stones, 1 - player, depth - 1, alpha, beta, ply + 1, child_key)
+        finally:
+            stones[player] ^= bit
+
+
+    def checkBudget(self) -> None:
+        # the clock is read on every node, a node of a large board (all its leaves evaluated) can take a millisecond
+        self.nodes += 1
+        if self.nodes >= self.node_limit or time.monotonic() >= self.deadline:
+            raise SearchBudgetExceeded()
+
+
+    def negamax(self, stones: List[int], player: int, depth: int, alpha: int, beta: int, ply: int, key: int) -> int:
+        self.checkBudget()
+
+        original_alpha = alpha
+        entry = self.table.get(key)
+        tt_cell = None
+        if entry is not None:
+            entry_depth, entry_score, flag, tt_cell = entry
+            if entry_depth >= depth:
+                # win scores are stored relative to this node, restore them to the root
+                entry_score = self.fromTableScore(entry_score, ply)
+                if flag == EXACT:
+                    return entry_score
+                if flag == LOWER_BOUND:
+                    alpha = max(alpha, entry_score)
+                elif flag == UPPER_BOUND:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
+
+        best_score, best_cell = -WIN_SCORE - 1, None
+        for cell in self.getCandidates(stones, tt_cell):
+            score = self.scoreMove(stones, player, cell, depth, -beta, -alpha, ply, key)
+            if score > best_score:
+                best_score, best_cell = score, cell
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.table.put(key, depth, self.toTableScore(best_score, ply), flag, best_cell)
+        return best_score
+
+
+    def toTableScore(self, score: int, ply: int) -> int:
+        if score >= WIN_SCORE - len(self.cells):
+            return score + ply
+        if score <= -WIN_SCORE + len(self.cells):
+            return score - ply
+        return score
+
+
+    def fromTableScore(self, score: int, ply: int) -> int:
+        if score >= WIN_SCORE - len(self.cells):
+            return score - ply
+        if score <= -WIN_SCORE + len(self.cells):
+            return score + ply
+        return score
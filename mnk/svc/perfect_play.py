@@ -0,0 +1,122 @@
+"""
+Solver for small m-n-k games, used to build the perfect play tables.
+
+Build a table file from project root:
+    python -m mnk.svc.perfect_play 3 3 3
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, List, Tuple
+
+from mnk.helpers.board_symmetry import getCanonicalKey
+from mnk.repository.table_repository import (NOT_IN_TABLE, OUTCOME_DRAW, OUTCOME_LOSS, OUTCOME_WIN,
+    TABLE_MAGIC, TABLE_VERSION, TABLES_DIR, getTableFileName)
+
+
+# largest board that can be solved into a table (cell index has to fit in 4 bits)
+MAX_TABLE_CELLS = 16
+
+
+
+class PerfectPlaySolver:
+
+    """
+    Solves every position reachable from the empty board with a memoised negamax.
+    Positions are looked at from the view of the player to move (1 -> own stone, 2 -> opponent stone)
+    and reduced by the board symmetries, so each equivalent position is solved once.
+    Scores prefer quicker wins and slower losses.
+    """
+
+    def __init__(self, rows: int, columns: int, win_length: int):
+        if rows * columns > MAX_TABLE_CELLS:
+            raise ValueError(f"Board has more than {MAX_TABLE_CELLS} cells, too big for a table.")
+        self.rows, self.columns, self.win_length = rows, columns, win_length
+        self.cell_count = rows * columns
+        # canonical key -> (score, best cell in canonical orientation)
+        self.solved: Dict[int, Tuple[int, int]] = {}
+
+        # every line of win_length cells passing through each cell
+        self.lines_through: List[List[Tuple[int, ...]]] = [[] for _ in range(self.cell_count)]
+        for row in range(rows):
+            for col in range(columns):
+                for row_step, col_step in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_row = row + row_step * (win_length - 1)
+                    end_col = col + col_step * (win_length - 1)
+                    if 0 <= end_row < rows and 0 <= end_col < columns:
+                        line = tuple((row + row_step * i) * columns + (col + col_step * i) for i in range(win_length))
+                        for cell in line:
+                            self.lines_through[cell].append(line)
+
+
+    def isWinningMove(self, cells: List[int], cell: int) -> bool:
+        for line in self.lines_through[cell]:
+            if all(cells[index] == 1 for index in line):
+                return True
+        return False
+
+
+    def solve(self, cells: List[int]) -> int:
+        """
+        score of the position for the player to move: > 0 win, 0 draw, < 0 loss
+        """
+        key, permutation = getCanonicalKey(cells, self.rows, self.columns)
+        if key in self.solved:
+            return self.solved[key][0]
+
+        vacant = [cell for cell, value in enumerate(cells) if value == 0]
+        best_score, best_cell = None, None
+        for cell in vacant:
+            cells[cell] = 1
+            if self.isWinningMove(cells, cell):
+                score = len(vacant)
+            elif len(vacant) == 1:
+                score = 0
+            else:
+                # opponent to move next, so swap the point of view
+                score = -self.solve([(3 - value) if value else 0 for value in cells])
+            cells[cell] = 0
+            if best_score is None or score > best_score:
+                best_score, best_cell = score, cell
+
+        self.solved[key] = (best_score, permutation[best_cell])
+        return best_score
+
+
+    def buildTable(self) -> bytearray:
+        self.solve([0] * self.cell_count)
+        table = bytearray([NOT_IN_TABLE]) * (3 ** self.cell_count)
+        for key, (score, cell) in self.solved.items():
+            outcome = OUTCOME_WIN if score > 0 else (OUTCOME_DRAW if score == 0 else OUTCOME_LOSS)
+            table[key] = (outcome << 4) | cell
+        return table
+
+
+    def writeTable(self, directory: str = TABLES_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, getTableFileName(self.rows, self.columns, self.win_length))
+        with open(path, 'wb') as table_file:
+            table_file.write(TABLE_MAGIC + bytes([self.rows, self.columns, self.win_length, TABLE_VERSION]))
+            table_file.write(self.buildTable())
+        return path
+
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Build a perfect play table for a small m-n-k game.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("columns", type=int)
+    parser.add_argument("win_length", type=int)
+    parser.add_argument("--out", default=TABLES_DIR, help="directory to write the table file to")
+    options = parser.parse_args(args)
+
+    solver = PerfectPlaySolver(options.rows, options.columns, options.win_length)
+    path = solver.writeTable(options.out)
+    print(f"{len(solver.solved)} canonical positions solved, table written to {path}")
+
+
+
+if __name__ == "__main__":
+    sys.setrecursionlimit(10_000)
+    main()
@@ -0,0 +1,159 @@
+"""
+Headless self-play, to generate game datasets and load without going through the http api.
+
+Play games from project root, one JSONL record per game:
+    python -m mnk.svc.simulation --games 10000 --player-1 random --player-2 medium --out games.jsonl
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from mnk.models.tictactoe_models import CreateGameRequest, Difficulty, GameMode, GameStatus, TicTacToeData
+from mnk.repository.table_repository import TableRepo
+from mnk.svc.negamax_search import NegamaxSearch
+from mnk.svc.tictactoe_service import TicTacToe
+
+
+# games played by a worker per task
+CHUNK_SIZE = 250
+
+
+
+## Policies: pick the (row, col) to play for the player to move
+
+def getPlayerIndex(game: TicTacToeData) -> int:
+    return 0 if game.player_turn == game.player_1 else 1
+
+
+def randomPolicy(game: TicTacToeData, generator: random.Random) -> Tuple[int, int]:
+    return generator.choice(list(game.bitboard.vacantCells()))
+
+
+def cornerPolicy(game: TicTacToeData, generator: random.Random) -> Tuple[int, int]:
+    # EASY computer move
+    return TicTacToe.getCornerScanMove(game)
+
+
+def mediumPolicy(game: TicTacToeData, generator: random.Random) -> Tuple[int, int]:
+    search = NegamaxSearch.getInstance(game.rows, game.columns, game.win_length)
+    return search.findMove(game.bitboard, getPlayerIndex(game), Difficulty.MEDIUM)
+
+
+def hardPolicy(game: TicTacToeData, generator: random.Random) -> Tuple[int, int]:
+    # perfect play table if there is one for the board, like the HARD computer move
+    table = TableRepo.getTable(game.rows, game.columns, game.win_length)
+    entry = table.lookup(game.bitboard, getPlayerIndex(game)) if table else None
+    if entry:
+        return entry[:2]
+    search = NegamaxSearch.getInstance(game.rows, game.columns, game.win_length)
+    return search.findMove(game.bitboard, getPlayerIndex(game), Difficulty.HARD)
+
+
+POLICIES: Dict[str, Callable[[TicTacToeData, random.Random], Tuple[int, int]]] = {
+    "random": randomPolicy,
+    "corner": cornerPolicy,
+    "medium": mediumPolicy,
+    "hard": hardPolicy,
+}
+
+
+
+@dataclass
+class SimulationConfig:
+    rows: int = 3
+    columns: int = 3
+    win_length: int = 3
+    player_1: str = "random" # policy of the player moving first
+    player_2: str = "random"
+    seed: int = 0
+
+
+
+def playGame(config: SimulationConfig, number: int) -> Dict:
+    """
+    Plays one TWO_PLAYER game through the game service, both players pick moves with their policy.
+    Game number and seed decide the game, whichever worker plays it.
+    Returns the compact record: moves are cell indexes (row * columns + column), players alternate starting with player_1.
+    """
+    generator = random.Random(config.seed * 1_000_003 + number)
+    game = TicTacToe.createGame(CreateGameRequest(mode=GameMode.TWO_PLAYER, player_1="x", player_2="o",
+        rows=config.rows, columns=config.columns, win_length=config.win_length))
+    policies = {game.player_1: POLICIES[config.player_1], game.player_2: POLICIES[config.player_2]}
+
+    while game.status == GameStatus.IN_PROGRESS:
+        row, col = policies[game.player_turn](game, generator)
+        TicTacToe.makeMove(game.player_turn, row, col, game)
+
+    return {"game": number, "status": game.status.value,
+        "moves": [move.row * game.columns + move.column for move in game.moves]}
+
+
+def playGames(config: SimulationConfig, start: int, count: int) -> List[Tuple[str, str]]:
+    """
+    (status, JSONL record) of every game, records are encoded in the worker
+    """
+    records = [playGame(config, number) for number in range(start, start + count)]
+    return [(record["status"], json.dumps(record, separators=(",", ":"))) for record in records]
+
+
+def simulate(config: SimulationConfig, games: int, workers: int) -> Iterator[Tuple[str, str]]:
+    """
+    Plays the games in a process pool, yields (status, JSONL record) in game order as chunks finish.
+    """
+    starts = range(0, games, CHUNK_SIZE)
+    counts = [min(CHUNK_SIZE, games - start) for start in starts]
+    if workers == 1:
+        for chunk in map(playGames, [config] * len(counts), starts, counts):
+            yield from chunk
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in executor.map(playGames, [config] * len(counts), starts, counts):
+            yield from chunk
+
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Play games between computer policies, one JSONL record per game.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=3)
+    parser.add_argument("--columns", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=3)
+    parser.add_argument("--player-1", default="random", choices=sorted(POLICIES))
+    parser.add_argument("--player-2", default="random", choices=sorted(POLICIES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes, defaults to all cores")
+    parser.add_argument("--out", default="-", help="JSONL file, - for stdout")
+    options = parser.parse_args(args)
+
+    config = SimulationConfig(options.rows, options.columns, options.win_length,
+        options.player_1, options.player_2, options.seed)
+    out = sys.stdout if options.out == "-" else open(options.out, "w")
+    outcomes = Counter()
+    started = time.perf_counter()
+    try:
+        # header record with the settings of the run
+        out.write(json.dumps(dict(asdict(config), games=options.games), separators=(",", ":")) + "\n")
+        for status, record in simulate(config, options.games, options.workers):
+            out.write(record + "\n")
+            outcomes[status] += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"{options.games} games in {elapsed:.2f}s, {options.games / elapsed:.0f} games/sec "
+        f"on {options.workers} workers", file=sys.stderr)
+    print(", ".join(f"{status}: {count}" for status, count in sorted(outcomes.items())), file=sys.stderr)
+
+
+
+if __name__ == "__main__":
+    main()
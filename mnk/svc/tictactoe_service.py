@@ -1,10 +1,52 @@
-from datetime import datetime
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
 
 from .mnk_game import AbstractMNKGame
-from mnk.models.tictactoe_constants import Constants
+from mnk.models.bitboard import BitBoard
 from mnk.models.tictactoe_models import *
 from mnk.exceptions.mnk_exceptions import *
 from mnk.helpers import tictactoe_helper
+from mnk.repository.table_repository import TableRepo
+from mnk.repository.position_cache import PositionCache, getOutcome
+from .negamax_search import NegamaxSearch, WIN_SCORE
+
+
+# computer moves searched for async handlers run in these processes, so neither the event loop nor the other
+# searches wait for a search. Every process keeps its own search instances (transposition tables).
+# Started by the app (SEARCH_WORKERS), without it (tests, tools) searches run on the default thread executor.
+search_executor: ProcessPoolExecutor = None
+
+
+
+async def startSearchProcesses(workers: int) -> None:
+    """
+    starts the search processes, each loaded by a small search, so the first moves do not wait for them
+    """
+    global search_executor
+    # spawned, not forked, as the app process runs threads
+    search_executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[loop.run_in_executor(search_executor, searchMove, BitBoard(), 1, Difficulty.MEDIUM)
+        for _ in range(workers)])
+
+
+
+def stopSearchProcesses() -> None:
+    if search_executor:
+        search_executor.shutdown(wait=False, cancel_futures=True)
+
+
+
+def searchMove(bitboard: BitBoard, player: int, difficulty: Difficulty, started: float = None) -> Tuple[Tuple[int, int], int]:
+    """
+    searched (row, col) for the player and its outcome for the position cache, runs in a search process for async handlers
+    """
+    search = NegamaxSearch.getInstance(bitboard.rows, bitboard.columns, bitboard.win_length)
+    location = search.findMove(bitboard, player, difficulty, started)
+    return location, getOutcome(search.last_score, search.solved, WIN_SCORE - len(search.cells))
 
 
 
@@ -19,6 +61,8 @@ class TicTacToe(AbstractMNKGame):
     generally 'x' and 'o'.
     To win a player must fill 3 number of continuous cells in any direction.
     (Possible directions: horizontal, vertical, diagonal) 
+    The board size (m x n) and win length (k) can be configured while creating a game,
+    e.g. 15x15 with k=5 for gomoku.
     """
 
 
@@ -27,6 +71,7 @@ class TicTacToe(AbstractMNKGame):
         Creates a new tic tac toe game based on the configuration provided
         """
         new_game = None
+        tictactoe_helper.validateBoardConfig(game_config)
         if game_config.mode == GameMode.SINGLE_PLAYER:
             new_game = tictactoe_helper.getOnePlayerGame(game_config)
             # If computer move is first, then make an auto move and update the game
@@ -41,6 +86,20 @@ class TicTacToe(AbstractMNKGame):
 
 
 
+    async def createGameAsync(game_config: CreateGameRequest):
+        """
+        createGame for async handlers, a game starting with a searched computer move gets it from a search process
+        """
+        if game_config.mode == GameMode.SINGLE_PLAYER and game_config.difficulty != Difficulty.EASY:
+            tictactoe_helper.validateBoardConfig(game_config)
+            new_game = tictactoe_helper.getOnePlayerGame(game_config)
+            if new_game.player_2 == new_game.player_turn:
+                await TicTacToe.makeAutoMoveAsync(new_game)
+            return new_game
+        return TicTacToe.createGame(game_config)
+
+
+
     def makeMove(pawn:str, row:int, col: int, game: TicTacToeData) -> None:
         """
         Updates cell on board where player has made a move if valid, else throws Exception
@@ -52,13 +111,11 @@ class TicTacToe(AbstractMNKGame):
                 if (game.number_of_vacant_cells>0) and tictactoe_helper.isValidSpot(row, col, game.board):
                 
                     # set move on board
-                    game.board[row][col] = pawn
-                    # decrease count of valid spots
-                    game.number_of_vacant_cells -= 1
+                    tictactoe_helper.placePawn(row, col, pawn, game)
                     # record the move made
-                    game.moves.append(Move(pawn, row, col, datetime.now().astimezone().strftime(Constants.DATE_FORMAT)))
+                    game.moves.append(Move(pawn, row, col, tictactoe_helper.getNow()))
                     
-                    # update status of the game
+                    # update status of the game, from the runs through this move
                     tictactoe_helper.updateStatus(row, col, game)
 
                     # Update next player
@@ -80,39 +137,110 @@ class TicTacToe(AbstractMNKGame):
         # note: player 2 is computer
         if (game_data.number_of_vacant_cells > 0) and (game_data.status==GameStatus.IN_PROGRESS):
 
-            start_row, start_col = 0,0
-            end_row, end_col = 2,2
-            board = game_data.board
-            selected_location = None
+            # perfect play from a precomputed table if one exists for this board
+            selected_location = TicTacToe.getTableMove(game_data) if (game_data.difficulty == Difficulty.HARD) else None
+
+            if selected_location is None and game_data.difficulty != Difficulty.EASY:
+                selected_location = TicTacToe.getSearchMove(game_data)
+            elif selected_location is None:
+                selected_location = TicTacToe.getCornerScanMove(game_data)
+
+            TicTacToe.placeAutoMove(game_data, selected_location)
+
+
+
+    async def makeAutoMoveAsync(game_data: TicTacToeData):
+        """
+        makeAutoMove for async handlers, MEDIUM/HARD moves are searched in a search process
+        """
+        if game_data.difficulty == Difficulty.EASY or game_data.number_of_vacant_cells == 0 or game_data.status != GameStatus.IN_PROGRESS:
+            TicTacToe.makeAutoMove(game_data)
+            return
+
+        # the search budget counts from here, so a wait for a free search process is part of it
+        started = time.monotonic()
+        selected_location = TicTacToe.getTableMove(game_data) if (game_data.difficulty == Difficulty.HARD) else None
+        if selected_location is None:
+            selected_location = TicTacToe.getCachedMove(game_data)
+        if selected_location is None:
+            selected_location, outcome = await asyncio.get_running_loop().run_in_executor(search_executor, searchMove,
+                game_data.bitboard, 1, game_data.difficulty, started)
+            TicTacToe.cacheMove(game_data, selected_location, outcome)
+        TicTacToe.placeAutoMove(game_data, selected_location)
+
+
+
+    def placeAutoMove(game_data: TicTacToeData, selected_location: Tuple[int, int]) -> None:
+        # Update the game board and the next player
+        tictactoe_helper.placePawn(selected_location[0], selected_location[1], game_data.player_2, game_data)
+        # record the move made
+        game_data.moves.append(Move(game_data.player_2, selected_location[0], selected_location[1], tictactoe_helper.getNow()))
+        # update status of the game, from the runs through this move
+        tictactoe_helper.updateStatus(selected_location[0], selected_location[1], game_data)
+        # Update the next player
+        game_data.player_turn = game_data.player_1
+
+
+
+    def getTableMove(game_data: TicTacToeData):
+        """
+        HARD computer move looked up from the perfect play table, None if there is no table for the board
+        """
+        table = TableRepo.getTable(game_data.rows, game_data.columns, game_data.win_length)
+        entry = table.lookup(game_data.bitboard, 1) if table else None
+        return entry[:2] if entry else None
+
+
+
+    def getSearchMove(game_data: TicTacToeData):
+        """
+        MEDIUM/HARD computer move, searched only if no equivalent position is in the position cache
+        """
+        selected_location = TicTacToe.getCachedMove(game_data)
+        if selected_location is None:
+            selected_location, outcome = searchMove(game_data.bitboard, 1, game_data.difficulty)
+            TicTacToe.cacheMove(game_data, selected_location, outcome)
+        return selected_location
+
+
+
+    def getCachedMove(game_data: TicTacToeData):
+        positions = PositionCache.active
+        return positions.getMove(game_data.bitboard, 1, game_data.difficulty) if positions else None
+
+
+
+    def cacheMove(game_data: TicTacToeData, selected_location: Tuple[int, int], outcome: int) -> None:
+        if PositionCache.active:
+            PositionCache.active.putMove(game_data.bitboard, 1, game_data.difficulty, selected_location, outcome)
+
+
+
+    def getCornerScanMove(game_data: TicTacToeData):
+        """
+        EASY computer move: first vacant cell, scanning inward from both corners
+        """
+        columns = game_data.columns
+        # cells are numbered row-major, starting pointer at first cell and end pointer at last cell
+        start, end = 0, (game_data.rows * columns) - 1
+        bitboard = game_data.bitboard
+        selected_location = None
+        
+        # check the first and last positions on board for vacancy
+        # iterate this way until vacany spot found
+        while start <= end:
             
-            # check the first and last positions on board for vacancy
-            # iterate this way until vacany spot found
-            while not (start_row>=end_row and start_col>=end_col):
-                
-                if board[start_row][start_col] == '-':
-                    selected_location = (start_row, start_col)
-                    break
-                
-                elif board[end_row][end_col] == '-':
-                    selected_location = (end_row, end_col)
-                    break
-                
-                # moving starting pointer left->right, top->bottom
-                start_row = (start_row+1) if start_col==2 else start_row
-                start_col = (start_col+1) if start_col!=2 else 0
-
-                # moving end pointer right->left, bottom->top
-                end_row = (end_row-1) if end_col==0 else end_row
-                end_col = (end_col-1) if end_col!=0 else 2
-
-            # Update the game board and the next player
-            game_data.board[selected_location[0]][selected_location[1]] = game_data.player_2
-            # decrease count of valid spots
-            game_data.number_of_vacant_cells -= 1
-            # record the move made
-            game_data.moves.append(Move(game_data.player_2, selected_location[0], selected_location[1], datetime.now().astimezone().strftime(Constants.DATE_FORMAT)))
-            # update status of the game
-            tictactoe_helper.updateStatus(selected_location[0], selected_location[1], game_data)
-            # Update the next player
-            game_data.player_turn = game_data.player_1
-            
\ No newline at end of file
+            if bitboard.isVacant(start // columns, start % columns):
+                selected_location = divmod(start, columns)
+                break
+            
+            elif bitboard.isVacant(end // columns, end % columns):
+                selected_location = divmod(end, columns)
+                break
+            
+            # moving starting pointer left->right, top->bottom
+            start += 1
+            # moving end pointer right->left, bottom->top
+            end -= 1
+
+        return selected_location
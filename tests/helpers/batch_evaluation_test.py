@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mnk.helpers.batch_evaluation import STATUSES, TIED, evaluateBoards, getBoardArray
+from mnk.helpers.tictactoe_helper import isValidSpot, placePawn, updateStatus
+from mnk.models.tictactoe_models import GameMode, GameStatus, TicTacToeData
+
+
+
+def getRandomGame(generator: random.Random, rows: int, columns: int, win_length: int) -> TicTacToeData:
+    """
+    random moves with updateStatus after each, stopped at a random point or when the game is over
+    """
+    game = TicTacToeData("game", GameStatus.IN_PROGRESS, None, mode=GameMode.TWO_PLAYER,
+        player_1="x", player_2="o", player_turn="x", rows=rows, columns=columns, win_length=win_length)
+    cells = [(row, col) for row in range(rows) for col in range(columns)]
+    generator.shuffle(cells)
+    for row, col in cells[:generator.randint(0, len(cells))]:
+        placePawn(row, col, game.player_turn, game)
+        updateStatus(row, col, game)
+        if game.status != GameStatus.IN_PROGRESS:
+            break
+        game.player_turn = game.player_1 if game.player_turn == game.player_2 else game.player_2
+    return game
+
+
+def getThreats(board, win_length: int, player: int) -> int:
+    rows, columns = board.shape
+    count = 0
+    for row in range(rows):
+        for col in range(columns):
+            for row_step, col_step in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row, end_col = row + row_step * (win_length - 1), col + col_step * (win_length - 1)
+                if end_row >= rows or end_col < 0 or end_col >= columns:
+                    continue
+                line = [board[row + i * row_step, col + i * col_step] for i in range(win_length)]
+                count += line.count(player) == win_length - 1 and line.count(0) == 1
+    return count
+
+
+
+class TestBatchEvaluation:
+    """
+    Test cases for vectorised board evaluation
+    """
+
+    @pytest.mark.parametrize("rows,columns,win_length", [(3, 3, 3), (4, 5, 3), (6, 4, 4), (7, 7, 5), (2, 6, 3)])
+    def test_matches_updateStatus(self, rows, columns, win_length):
+        generator = random.Random(rows * 100 + columns * 10 + win_length)
+        games = [getRandomGame(generator, rows, columns, win_length) for _ in range(400)]
+
+        status, legal, threats = evaluateBoards(getBoardArray(games), win_length)
+
+        assert [STATUSES[code] for code in status] == [game.status for game in games]
+        for index, game in enumerate(games):
+            in_progress = game.status == GameStatus.IN_PROGRESS
+            assert legal[index].tolist() == [[in_progress and isValidSpot(row, col, game.board)
+                for col in range(columns)] for row in range(rows)]
+            board = getBoardArray([game])[0]
+            assert threats[index].tolist() == [getThreats(board, win_length, 1), getThreats(board, win_length, 2)]
+
+
+    def test_full_board_tie(self):
+        boards = np.array([[[1, 2, 1], [1, 2, 2], [2, 1, 1]]], dtype=np.int8)
+        status, legal, _ = evaluateBoards(boards, 3)
+
+        assert status.tolist() == [TIED]
+        assert not legal.any()
+
+
+    def test_win_length_longer_than_rows(self):
+        # only horizontal lines fit
+        boards = np.array([[[1, 1, 1, 0], [2, 2, 0, 0]], [[1, 0, 0, 0], [1, 2, 2, 0]]], dtype=np.int8)
+        status, _, threats = evaluateBoards(boards, 3)
+
+        assert [STATUSES[code] for code in status] == [GameStatus.PLAYER_1_WINS, GameStatus.IN_PROGRESS]
+        assert threats.tolist() == [[1, 1], [0, 1]]
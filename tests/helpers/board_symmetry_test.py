@@ -0,0 +1,35 @@
+from mnk.helpers.board_symmetry import *
+
+
+
+class TestBoardSymmetry:
+    """
+    Test cases for board symmetry helper methods
+    """
+
+    def test_getSymmetries_count(self):
+        assert len(getSymmetries(3, 3)) == 8
+        assert len(set(getSymmetries(3, 3))) == 8
+        assert len(getSymmetries(3, 4)) == 4
+
+
+    def test_invertPermutation(self):
+        for permutation in getSymmetries(3, 3):
+            inverse = invertPermutation(permutation)
+            assert [inverse[permutation[cell]] for cell in range(9)] == list(range(9))
+
+
+    def test_getBase3Key(self):
+        assert getBase3Key([0, 0, 0]) == 0
+        assert getBase3Key([1, 2, 0]) == 1 + 2*3
+
+
+    def test_getCanonicalKey_same_for_equivalent_positions(self):
+        # corner stone in each of the 4 corners
+        keys = set()
+        for corner in (0, 2, 6, 8):
+            cells = [0] * 9
+            cells[corner] = 1
+            keys.add(getCanonicalKey(cells, 3, 3)[0])
+
+        assert len(keys) == 1
@@ -1,8 +1,10 @@
 from datetime import datetime
+import random
 
 import pytest
 
 from mnk.helpers.tictactoe_helper import *
+from mnk.svc.tictactoe_service import TicTacToe
 
 
 
@@ -16,6 +18,18 @@ class TestTicTacToeHelper:
         assert getDateToStr(dt) == "20/05/2021, 00:00:00:000000"
 
 
+    def test_getDateToStr_matches_strftime(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            dt = datetime.fromtimestamp(rng.uniform(0, 4e9)).replace(microsecond=rng.randrange(1_000_000))
+            assert getDateToStr(dt) == dt.strftime(Constants.DATE_FORMAT)
+
+
+    def test_getMovesJson(self):
+        moves = [Move("x", 1, 2, datetime(2021, 5, 20, 10, 30, 5, 123))]
+        assert getMovesJson(moves) == [{"pawn": "x", "row": 1, "column": 2, "created": "20/05/2021, 10:30:05:000123"}]
+
+
     def test_getDateFromStr(self):
         dt_str = "20/05/2021, 00:00:00:000000"
         assert getDateFromStr(dt_str) == datetime(2021,5,20)
@@ -152,9 +166,9 @@ class TestTicTacToeHelper:
         mode=GameMode.TWO_PLAYER, player_1="x", player_2="o",
         player_turn="x")
         
-        game.board[0][0] = "x"
-        game.board[0][1] = "x"
-        game.board[0][2] = "x"
+        placePawn(0, 0, "x", game)
+        placePawn(0, 1, "x", game)
+        placePawn(0, 2, "x", game)
         updateStatus(0,2,game)
 
         assert game.status == GameStatus.PLAYER_1_WINS
@@ -165,9 +179,9 @@ class TestTicTacToeHelper:
         mode=GameMode.TWO_PLAYER, player_1="x", player_2="o",
         player_turn="o")
         
-        game.board[0][0] = "o"
-        game.board[1][0] = "o"
-        game.board[2][0] = "o"
+        placePawn(0, 0, "o", game)
+        placePawn(1, 0, "o", game)
+        placePawn(2, 0, "o", game)
         updateStatus(2,0,game)
 
         assert game.status == GameStatus.PLAYER_2_WINS
@@ -178,9 +192,9 @@ class TestTicTacToeHelper:
         mode=GameMode.TWO_PLAYER, player_1="o", player_2="x",
         player_turn="o")
         
-        game.board[0][0] = "o"
-        game.board[1][1] = "o"
-        game.board[2][2] = "o"
+        placePawn(0, 0, "o", game)
+        placePawn(1, 1, "o", game)
+        placePawn(2, 2, "o", game)
         updateStatus(2,2,game)
 
         assert game.status == GameStatus.PLAYER_1_WINS
@@ -191,9 +205,9 @@ class TestTicTacToeHelper:
         mode=GameMode.TWO_PLAYER, player_1="o", player_2="x",
         player_turn="x")
         
-        game.board[0][2] = "x"
-        game.board[1][1] = "x"
-        game.board[2][0] = "x"
+        placePawn(0, 2, "x", game)
+        placePawn(1, 1, "x", game)
+        placePawn(2, 0, "x", game)
         updateStatus(2,0,game)
 
         assert game.status == GameStatus.PLAYER_2_WINS
@@ -204,16 +218,106 @@ class TestTicTacToeHelper:
         mode=GameMode.TWO_PLAYER, player_1="o", player_2="x",
         player_turn="x")
         
-        game.board[0][0] = "o"
-        game.board[0][1] = "o"
-        game.board[0][2] = "x"
-        game.board[1][0] = "x"
-        game.board[1][1] = "x"
-        game.board[1][2] = "o"
-        game.board[2][0] = "o"
-        game.board[2][1] = "x"
-        game.board[2][2] = "x"
-        game.number_of_vacant_cells = 0
+        placePawn(0, 0, "o", game)
+        placePawn(0, 1, "o", game)
+        placePawn(0, 2, "x", game)
+        placePawn(1, 0, "x", game)
+        placePawn(1, 1, "x", game)
+        placePawn(1, 2, "o", game)
+        placePawn(2, 0, "o", game)
+        placePawn(2, 1, "x", game)
+        placePawn(2, 2, "x", game)
         updateStatus(2,2,game)
 
-        assert game.status == GameStatus.TIED
\ No newline at end of file
+        assert game.status == GameStatus.TIED
+
+
+    def test_updateStatus_ignores_other_lines(self):
+        # a line of the other player elsewhere on the board is not this move's win
+        game = TicTacToeData(id="123", status=GameStatus.IN_PROGRESS, created= "",
+        mode=GameMode.TWO_PLAYER, player_1="x", player_2="o",
+        player_turn="x", rows=5, columns=5, win_length=3)
+        for col in range(3):
+            placePawn(4, col, "o", game)
+        placePawn(0, 0, "x", game)
+        updateStatus(0, 0, game)
+
+        assert game.status == GameStatus.IN_PROGRESS
+
+
+    def test_getLineRuns(self):
+        board = getInitialsedBoard(5, 5)
+        for col in range(1, 4):
+            board[2][col] = "x"
+        board[1][1] = "x"
+
+        assert getLineRuns(2, 2, board, "x", 5) == [3, 1, 2, 1]
+        # runs are only counted up to k-1 cells out on each side
+        assert getLineRuns(2, 2, board, "x", 2) == [3, 1, 2, 1]
+        assert getLineRuns(2, 1, board, "x", 2) == [2, 2, 1, 1]
+
+
+    def test_restoreBoard(self):
+        game = TicTacToeData("game-1", GameStatus.IN_PROGRESS, "", mode=GameMode.TWO_PLAYER,
+            player_1="x", player_2="o", player_turn="x", rows=6, columns=7, win_length=4)
+        for row, col, pawn in [(0, 0, "x"), (5, 6, "o"), (2, 3, "x"), (0, 6, "o"), (5, 0, "x")]:
+            placePawn(row, col, pawn, game)
+            game.moves.append(Move(pawn, row, col, ""))
+
+        restored = TicTacToeData("game-1", GameStatus.IN_PROGRESS, "", mode=GameMode.TWO_PLAYER,
+            player_1="x", player_2="o", player_turn="x", rows=6, columns=7, win_length=4)
+        restoreBoard(game.bitboard.getSnapshot(), restored)
+
+        assert restored.board == game.board
+        assert restored.bitboard.stones == game.bitboard.stones
+        assert restored.number_of_vacant_cells == game.number_of_vacant_cells
+        assert getMoveCount(restored) == 5
+        assert restored.moves == []
+        assert restored.moves_loaded == False
+
+
+
+def bruteForceStatus(game: TicTacToeData) -> GameStatus:
+    """
+    oracle: scan every line of win_length cells on the board
+    """
+    for row in range(game.rows):
+        for col in range(game.columns):
+            pawn = game.board[row][col]
+            if pawn == '-':
+                continue
+            for row_step, col_step in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row = row + row_step * (game.win_length - 1)
+                end_col = col + col_step * (game.win_length - 1)
+                if not (0 <= end_row < game.rows and 0 <= end_col < game.columns):
+                    continue
+                if all(game.board[row + row_step * i][col + col_step * i] == pawn for i in range(game.win_length)):
+                    return GameStatus.PLAYER_1_WINS if (pawn == game.player_1) else GameStatus.PLAYER_2_WINS
+    return GameStatus.TIED if game.number_of_vacant_cells == 0 else GameStatus.IN_PROGRESS
+
+
+
+class TestUpdateStatusOracle:
+    """
+    Random games played through the game service, checked move by move against a brute force scan of the board
+    """
+
+    @pytest.mark.parametrize("rows, columns, win_length", [(3, 3, 3), (4, 4, 3), (3, 5, 3), (6, 7, 4), (10, 10, 5)])
+    def test_makeMove_random_games(self, rows, columns, win_length):
+        rng = random.Random(rows * 100 + columns * 10 + win_length)
+        for _ in range(100):
+            game = TicTacToeData(id="123", status=GameStatus.IN_PROGRESS, created= "",
+            mode=GameMode.TWO_PLAYER, player_1="x", player_2="o",
+            player_turn="x", rows=rows, columns=columns, win_length=win_length)
+            cells = [(row, col) for row in range(rows) for col in range(columns)]
+            rng.shuffle(cells)
+
+            for row, col in cells:
+                player = 0 if (game.player_turn == game.player_1) else 1
+                TicTacToe.makeMove(game.player_turn, row, col, game)
+                assert game.status == bruteForceStatus(game)
+                # the whole board check of the bitboard engine must agree as well
+                assert game.bitboard.hasWon(player) == (game.status in (GameStatus.PLAYER_1_WINS, GameStatus.PLAYER_2_WINS))
+
+                if game.status != GameStatus.IN_PROGRESS:
+                    break
@@ -0,0 +1,98 @@
+import os
+import time
+
+import pytest
+
+from mnk.exceptions.mnk_exceptions import InvalidMoveException
+from mnk.metrics import Histogram, Metrics, SamplingProfiler
+
+
+
+class TestMetrics:
+    """
+    Test cases for stage spans and the prometheus text output
+    """
+
+    def setup_method(self):
+        Metrics.reset()
+
+
+    def test_histogram_cumulative(self):
+        histogram = Histogram(buckets=(0.01, 0.1))
+        for value in (0.005, 0.05, 0.05, 2.0):
+            histogram.observe(value)
+
+        assert histogram.getCumulative() == [("0.01", 1), ("0.1", 3), ("+Inf", 4)]
+        assert histogram.count == 4
+
+
+    def test_histogram_count_at_or_below(self):
+        histogram = Histogram(buckets=(0.01, 0.1))
+        for value in (0.005, 0.01, 0.05, 2.0):
+            histogram.observe(value)
+
+        assert histogram.countAtOrBelow(0.01) == 2
+        assert histogram.countAtOrBelow(0.1) == 3
+        # bounds between buckets count the buckets below them
+        assert histogram.countAtOrBelow(0.05) == 2
+        assert histogram.countAtOrBelow(0.001) == 0
+        assert histogram.countAtOrBelow(10.0) == 3
+
+
+    def test_span_counts_errors(self):
+        with Metrics.span("game_logic"):
+            pass
+        with pytest.raises(ValueError):
+            with Metrics.span("game_logic"):
+                raise ValueError()
+
+        # a move rejected as invalid is answered with a 400, not a failure of the stage
+        with pytest.raises(InvalidMoveException):
+            with Metrics.span("game_logic"):
+                raise InvalidMoveException()
+
+        assert Metrics.stages["game_logic"].count == 3
+        assert Metrics.stage_errors["game_logic"] == 1
+
+
+    def test_render(self):
+        with Metrics.span("db_write"):
+            pass
+        Metrics.observeRequest("makeMove", 200, 0.02)
+        Metrics.observeRequest("makeMove", 404, 0.002)
+        text = Metrics.render()
+
+        assert '# TYPE mnk_stage_duration_seconds histogram' in text
+        assert 'mnk_stage_duration_seconds_count{stage="db_write"} 1' in text
+        assert 'mnk_request_duration_seconds_bucket{route="makeMove",le="0.0025"} 1' in text
+        assert 'mnk_request_duration_seconds_bucket{route="makeMove",le="+Inf"} 2' in text
+        assert 'mnk_responses_total{route="makeMove",status="404"} 1' in text
+        assert text.endswith("\n")
+
+
+
+class TestSamplingProfiler:
+    """
+    Test cases for the slow request profiler
+    """
+
+    def test_writes_profile_of_slow_request(self, tmp_path):
+        profiler = SamplingProfiler(str(tmp_path), threshold=0.05, interval=0.001)
+        profiler.start()
+        try:
+            start = time.perf_counter()
+            # busy, so the sampled stack is inside this test
+            while time.perf_counter() - start < 0.1:
+                pass
+            end = time.perf_counter()
+            profiler.onRequest("fastRequest", start, start + 0.01)
+            profiler.onRequest("slowRequest", start, end)
+        finally:
+            profiler.stop()
+
+        files = os.listdir(tmp_path)
+        assert len(files) == 1 and "slowRequest" in files[0]
+        with open(tmp_path / files[0]) as profile_file:
+            lines = profile_file.read().splitlines()
+        assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert any("test_writes_profile_of_slow_request" in line for line in lines)
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+# needs a postgres database, like the router tests
+if "DATABASE_URL" not in os.environ:
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+import sqlalchemy
+
+from mnk.migrations import MIGRATIONS, migrate
+from mnk.repository.game_db_repository import getGameData
+from mnk.models.tictactoe_models import Difficulty
+
+
+SCHEMA = "upgrade_test"
+
+## tables as created by the first version, before any migration
+BASELINE_SQL = [
+    """CREATE TABLE games (id VARCHAR(128) PRIMARY KEY, mode VARCHAR(128) NOT NULL, player_1_pawn VARCHAR(128) NOT NULL,
+        player_2_pawn VARCHAR(128) NOT NULL, player_turn VARCHAR(128) NOT NULL, status VARCHAR(128) NOT NULL, created TIMESTAMPTZ NOT NULL)""",
+    """CREATE TABLE moves (id SERIAL PRIMARY KEY, game VARCHAR(128) REFERENCES games (id), pawn VARCHAR(128) NOT NULL,
+        "row" INTEGER NOT NULL, "column" INTEGER NOT NULL, created TIMESTAMPTZ NOT NULL)""",
+    "INSERT INTO games VALUES ('old-game', 'TWO_PLAYER', 'x', 'o', 'o', 'IN_PROGRESS', now())",
+    """INSERT INTO moves (game, pawn, "row", "column", created) VALUES ('old-game', 'x', 1, 1, now())""",
+]
+
+
+
+class TestMigrations:
+    """
+    Test cases for upgrading a database created by the first version
+    """
+
+    def setup_method(self):
+        url = os.environ["DATABASE_URL"]
+        # its own schema, so the tables of the other tests are left alone
+        self.url = url + ("&" if "?" in url else "?") + f"options=-csearch_path%3D{SCHEMA}"
+        self.engine = sqlalchemy.create_engine(url)
+        with self.engine.begin() as connection:
+            connection.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            connection.execute(f"CREATE SCHEMA {SCHEMA}")
+            connection.execute(f"SET LOCAL search_path TO {SCHEMA}")
+            for statement in BASELINE_SQL:
+                connection.execute(statement)
+
+
+    def teardown_method(self):
+        with self.engine.begin() as connection:
+            connection.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        self.engine.dispose()
+
+
+    def test_upgrade_from_baseline(self):
+        assert migrate(self.url) == len(MIGRATIONS)
+        assert migrate(self.url) == 0
+
+        with self.engine.connect() as connection:
+            row = connection.execute(f"SELECT * FROM {SCHEMA}.games WHERE id = 'old-game'").fetchone()
+            moves = connection.execute(f"SELECT count(*) FROM {SCHEMA}.moves WHERE game = 'old-game'").scalar()
+
+        # games saved before board sizes and difficulty were configurable
+        game = getGameData(row)
+        assert (game.rows, game.columns, game.win_length) == (3, 3, 3)
+        assert game.difficulty == Difficulty.EASY
+        assert game.version == 0
+        assert moves == 1
@@ -0,0 +1,102 @@
+from mnk.models.bitboard import BitBoard, hasRun
+
+
+
+class TestBitBoard:
+    """
+    Test cases for bitboard engine
+    """
+
+    def test_place_and_isVacant(self):
+        bitboard = BitBoard(3, 3, 3)
+        bitboard.place(1, 2, 0)
+
+        assert bitboard.isVacant(1, 2) == False
+        assert bitboard.isVacant(0, 0) == True
+        assert bitboard.isVacant(3, 0) == False
+        assert bitboard.isVacant(0, -1) == False
+
+
+    def test_vacantCells(self):
+        bitboard = BitBoard(2, 2, 2)
+        bitboard.place(0, 1, 0)
+        bitboard.place(1, 0, 1)
+
+        assert list(bitboard.vacantCells()) == [(0, 0), (1, 1)]
+
+
+    def test_hasRun(self):
+        assert hasRun(0b1111, 1, 4) == True
+        assert hasRun(0b1011, 1, 3) == False
+        assert hasRun(0b1, 1, 1) == True
+
+
+    def test_hasWon_all_directions_gomoku(self):
+        lines = [
+            [(7, c) for c in range(3, 8)], # horizontal
+            [(r, 4) for r in range(10, 15)], # vertical
+            [(i, i) for i in range(5)], # main diagonal
+            [(i, 14 - i) for i in range(10, 15)], # reverse diagonal
+        ]
+        for line in lines:
+            bitboard = BitBoard(15, 15, 5)
+            for row, col in line[:-1]:
+                bitboard.place(row, col, 1)
+            assert bitboard.hasWon(1) == False
+            bitboard.place(*line[-1], 1)
+            assert bitboard.hasWon(1) == True
+            assert bitboard.hasWon(0) == False
+
+
+    def test_hasWon_does_not_wrap_rows(self):
+        bitboard = BitBoard(4, 4, 3)
+        # end of row 0 followed by start of row 1
+        bitboard.place(0, 2, 0)
+        bitboard.place(0, 3, 0)
+        bitboard.place(1, 0, 0)
+        # reverse diagonal leaving the board on the left edge
+        bitboard.place(2, 1, 0)
+        bitboard.place(3, 0, 0)
+
+        assert bitboard.hasWon(0) == False
+
+
+    def test_getLineRuns(self):
+        bitboard = BitBoard(5, 5, 5)
+        for col in range(1, 4):
+            bitboard.place(2, col, 0)
+        bitboard.place(1, 1, 0)
+        bitboard.place(3, 3, 1)
+
+        assert bitboard.getLineRuns(2, 2, 0) == [3, 1, 2, 1]
+        assert bitboard.getLineRuns(3, 3, 1) == [1, 1, 1, 1]
+        # end of row 0 and start of row 1 are not a line, the guard bit ends the row
+        bitboard.place(0, 4, 1)
+        bitboard.place(1, 0, 1)
+        assert bitboard.getLineRuns(0, 4, 1) == [1, 1, 1, 1]
+
+
+    def test_copy(self):
+        bitboard = BitBoard(3, 3, 3)
+        bitboard.place(0, 0, 0)
+        copied = bitboard.copy()
+        copied.place(1, 1, 1)
+
+        assert copied.isVacant(0, 0) == False
+        assert bitboard.isVacant(1, 1) == True
+        assert copied.run_shifts == bitboard.run_shifts
+
+
+    def test_snapshot(self):
+        bitboard = BitBoard(15, 15, 5)
+        bitboard.place(0, 0, 0)
+        bitboard.place(14, 14, 1)
+        bitboard.place(7, 3, 0)
+        restored = BitBoard(15, 15, 5)
+        restored.loadSnapshot(bitboard.getSnapshot())
+
+        assert restored.stones == bitboard.stones
+        assert sorted(restored.stoneCells(0)) == [(0, 0), (7, 3)]
+        assert list(restored.stoneCells(1)) == [(14, 14)]
+        assert restored.stoneCount() == 3
+        assert BitBoard().getSnapshot() == "0:0"
@@ -0,0 +1,61 @@
+import pickle
+from datetime import datetime, timedelta, timezone
+
+from mnk.helpers.tictactoe_helper import getMovesJson, placePawn
+from mnk.models.compact_game import CompactGame
+from mnk.models.tictactoe_models import GameMode, GameStatus, Move, TicTacToeData
+
+
+
+def getGame(created: datetime) -> TicTacToeData:
+    game = TicTacToeData("game-1", GameStatus.IN_PROGRESS, created, mode=GameMode.TWO_PLAYER,
+        player_1="x", player_2="o", player_turn="x", rows=4, columns=5, win_length=4, version=3)
+    for index, (pawn, row, col) in enumerate([("x", 0, 0), ("o", 3, 4), ("x", 2, 1)]):
+        placePawn(row, col, pawn, game)
+        game.moves.append(Move(pawn, row, col, created + timedelta(seconds=index, microseconds=123457)))
+    return game
+
+
+
+class TestCompactGame:
+    """
+    Test cases for the compact game representation
+    """
+
+    def test_round_trip(self):
+        created = datetime(2021, 11, 20, 10, 30, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+        game = getGame(created)
+        restored = CompactGame(game).toGame()
+
+        assert restored == game
+        assert restored.number_of_vacant_cells == 17
+        assert restored.bitboard.stones == game.bitboard.stones
+        assert restored.moves[1].created.utcoffset() == timedelta(hours=5, minutes=30)
+
+
+    def test_naive_timestamps(self):
+        game = getGame(datetime(2021, 11, 20, 10, 30))
+        restored = CompactGame(game).toGame()
+
+        assert restored.created == game.created and restored.created.tzinfo is None
+        assert restored.moves == game.moves
+
+
+    def test_restored_game_without_moves(self):
+        game = getGame(datetime(2021, 11, 20, tzinfo=timezone.utc))
+        game.moves, game.moves_loaded = game.moves[2:], False
+        restored = pickle.loads(pickle.dumps(CompactGame(game))).toGame()
+
+        assert restored.moves_loaded == False
+        assert restored.moves == game.moves
+        assert restored.board == game.board
+
+
+    def test_getResponse(self):
+        game = getGame(datetime(2021, 11, 20, tzinfo=timezone.utc))
+        response = CompactGame(game).getResponse()
+
+        assert response["game_board"] == game.board
+        assert response["game_status"] == GameStatus.IN_PROGRESS
+        assert response["moves"] == getMovesJson(game.moves)
+        assert response["moves"][2] == {"pawn": "x", "row": 2, "column": 1, "created": "20/11/2021, 00:00:02:123457"}
@@ -0,0 +1,155 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from mnk.models.tictactoe_models import GameMode, GameStatus, TicTacToeData
+from mnk.repository.cache_backend import (LocalCacheBackend, SharedCacheBackend, SharedCacheManager,
+    VersionedStore, checkAuthkey, initSharedStore)
+from mnk.repository.game_cache import GameCache
+
+
+
+def getGame(version: int = 0) -> TicTacToeData:
+    return TicTacToeData("game-1", GameStatus.IN_PROGRESS, datetime(2021, 11, 20, 10, tzinfo=timezone.utc),
+        mode=GameMode.TWO_PLAYER, player_1="X", player_2="O", player_turn="X", version=version)
+
+
+
+@pytest.fixture(scope="module")
+def cacheServer():
+    manager = SharedCacheManager(address=("127.0.0.1", 0), authkey=b"test")
+    manager.start(initSharedStore, (100, 60, "LRU", True))
+    yield manager
+    manager.shutdown()
+
+
+
+class TestVersionedStore:
+    """
+    Test cases for compare-and-set of cached games
+    """
+
+    def test_compare_and_set(self):
+        store = VersionedStore(GameCache(capacity=10, ttl=60))
+
+        assert store.compareAndSet("a", "v1", 1, None)
+        # update based on the cached version
+        assert store.compareAndSet("a", "v2", 2, 1)
+        # update based on an older version
+        assert not store.compareAndSet("a", "stale", 2, 1)
+        assert not store.compareAndSet("a", "stale", 3, 1)
+        # db read never replaces a cached copy of the same or newer version
+        assert not store.compareAndSet("a", "db", 2, None)
+
+        assert store.get("a") == (2, "v2")
+        assert store.getStats()["version_conflicts"] == 3
+
+
+    def test_missing_entry_accepts_update(self):
+        store = VersionedStore(GameCache(capacity=10, ttl=60))
+
+        assert store.compareAndSet("a", "v5", 5, 4)
+        assert store.get("a") == (5, "v5")
+
+
+
+class TestLocalCacheBackend:
+    """
+    Test cases for the in process cache backend
+    """
+
+    def test_stale_game_not_cached(self):
+        backend = LocalCacheBackend(GameCache(capacity=10, ttl=60))
+        backend.compareAndSet(getGame(version=2), None)
+
+        assert not backend.compareAndSet(getGame(version=2), 1)
+        assert backend.compareAndSet(getGame(version=3), 2)
+        assert backend.get("game-1").version == 3
+        assert backend.getStats()["backend"] == "LOCAL"
+
+
+    def test_changes_need_compare_and_set(self):
+        backend = LocalCacheBackend(GameCache(capacity=10, ttl=60))
+        backend.compareAndSet(getGame(version=1), None)
+
+        # a request changing its copy does not change the cached game
+        game = backend.get("game-1")
+        game.board[0][0] = "X"
+        game.player_turn = "O"
+        assert backend.get("game-1").board[0][0] == "-"
+        assert backend.get("game-1").player_turn == "X"
+
+
+
+class TestSharedCacheBackend:
+    """
+    Test cases for the cache backend shared by worker processes
+    """
+
+    def test_workers_share_games(self, cacheServer):
+        worker_1 = SharedCacheBackend(cacheServer.address, b"test")
+        worker_2 = SharedCacheBackend(cacheServer.address, b"test")
+        worker_1.clear()
+
+        game = getGame(version=1)
+        assert worker_1.compareAndSet(game, None)
+        cached = worker_2.get(game.id)
+        assert cached == game
+        assert cached.bitboard.rows == 3
+
+
+    def test_concurrent_updates(self, cacheServer):
+        worker_1 = SharedCacheBackend(cacheServer.address, b"test")
+        worker_2 = SharedCacheBackend(cacheServer.address, b"test")
+        worker_1.clear()
+        worker_1.compareAndSet(getGame(version=1), None)
+
+        # both workers update version 1, only the first one is cached
+        game_1, game_2 = worker_1.get("game-1"), worker_2.get("game-1")
+        game_1.player_turn, game_1.version = "O", 2
+        game_2.player_turn, game_2.version = "X", 2
+        assert worker_1.compareAndSet(game_1, 1)
+        assert not worker_2.compareAndSet(game_2, 1)
+
+        assert worker_2.get("game-1").player_turn == "O"
+        assert worker_2.getStats()["version_conflicts"] >= 1
+
+
+    def test_remove(self, cacheServer):
+        worker = SharedCacheBackend(cacheServer.address, b"test")
+        worker.compareAndSet(getGame(version=1), None)
+        worker.remove("game-1")
+
+        assert worker.get("game-1") is None
+
+
+    def test_cache_server_restart(self):
+        server = SharedCacheManager(address=("127.0.0.1", 0), authkey=b"test")
+        server.start(initSharedStore, (100, 60, "LRU", True))
+        address = server.address
+        worker = SharedCacheBackend(address, b"test")
+        worker.compareAndSet(getGame(version=1), None)
+        server.shutdown()
+
+        # cache calls fail as misses while the server is down
+        assert worker.get("game-1") is None
+        assert not worker.compareAndSet(getGame(version=2), 1)
+        worker.remove("game-1")
+        assert worker.getStats()["available"] is False
+
+        restarted = SharedCacheManager(address=address, authkey=b"test")
+        restarted.start(initSharedStore, (100, 60, "LRU", True))
+        try:
+            worker.retry_at = 0.0
+            assert worker.compareAndSet(getGame(version=2), None)
+            assert worker.get("game-1").version == 2
+        finally:
+            restarted.shutdown()
+
+
+    def test_authkey_required(self):
+        with pytest.raises(ValueError):
+            checkAuthkey("")
+        with pytest.raises(ValueError):
+            checkAuthkey("mnk-cache")
+        checkAuthkey("a-secret")
@@ -0,0 +1,34 @@
+import json
+from datetime import datetime, timezone
+
+from mnk.repository.game_archive import getMonths, getPartitionSql
+from mnk.repository.game_db_repository import getArchivedMoves
+
+
+
+class TestGameArchive:
+    """
+    Test cases for archive partitions and archived moves
+    """
+
+    def test_getMonths(self):
+        months = getMonths(datetime(2021, 11, 20, 13, 5, tzinfo=timezone.utc), datetime(2022, 1, 3, tzinfo=timezone.utc))
+
+        assert [(month.year, month.month, month.day) for month in months] == [(2021, 11, 1), (2021, 12, 1), (2022, 1, 1)]
+
+
+    def test_getPartitionSql(self):
+        sql = getPartitionSql(datetime(2021, 12, 1, tzinfo=timezone.utc))
+
+        assert "games_archive_2021_12 PARTITION OF games_archive" in sql
+        assert "FROM ('2021-12-01 00:00:00+00') TO ('2022-01-01 00:00:00+00')" in sql
+
+
+    def test_getArchivedMoves(self):
+        created = datetime(2021, 11, 20, 0, 0, 2, 123457, tzinfo=timezone.utc)
+        micros = int((created - datetime(1970, 1, 1, tzinfo=timezone.utc)).total_seconds()) * 1_000_000 + 123457
+        db_game = {"player_1_pawn": "x", "player_2_pawn": "o", "moves": json.dumps([[7, 1, 1, 0, micros], [9, 0, 2, 1, micros]])}
+
+        moves = getArchivedMoves(db_game)
+        assert [(move_id, move.pawn, move.row, move.column) for move_id, move in moves] == [(7, "x", 1, 1), (9, "o", 0, 2)]
+        assert moves[0][1].created == created
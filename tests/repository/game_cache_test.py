@@ -0,0 +1,144 @@
+import math
+
+from mnk.repository.game_cache import CachePolicy, CountMinSketch, GameCache
+
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+
+class TestGameCache:
+    """
+    Test cases for game cache
+    """
+
+    def test_hit_miss_stats(self):
+        cache = GameCache(capacity=2, ttl=10)
+        cache.put("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        stats = cache.getStats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+        assert stats["size"] == 1
+
+
+    def test_lru_eviction(self):
+        cache = GameCache(capacity=2, ttl=10, policy=CachePolicy.LRU)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.getStats()["evictions"] == 1
+
+
+    def test_lfu_eviction(self):
+        cache = GameCache(capacity=2, ttl=10, policy=CachePolicy.LFU)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.get("a")
+        cache.get("b")
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+
+
+    def test_tiny_lfu_admission(self):
+        cache = GameCache(capacity=2, ttl=10, policy=CachePolicy.TINY_LFU)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        for _ in range(3):
+            cache.get("a")
+            cache.get("b")
+        # one-off key is not popular enough to push out a used one
+        cache.put("c", 3)
+        assert cache.get("c") is None
+        assert cache.getStats()["admission_rejections"] == 1
+
+        # but a key requested often enough gets in
+        for _ in range(6):
+            cache.get("d")
+        cache.put("d", 4)
+        assert cache.get("d") == 4
+
+
+    def test_sliding_expiry(self):
+        timer = FakeTimer()
+        cache = GameCache(capacity=2, ttl=10, sliding=True, timer=timer)
+        cache.put("a", 1)
+        timer.now = 8
+        assert cache.get("a") == 1
+        timer.now = 16
+        # ttl restarted on last read
+        assert cache.get("a") == 1
+        timer.now = 27
+        assert cache.get("a") is None
+        assert cache.getStats()["expirations"] == 1
+
+
+    def test_fixed_expiry(self):
+        timer = FakeTimer()
+        cache = GameCache(capacity=2, ttl=10, sliding=False, timer=timer)
+        cache.put("a", 1)
+        timer.now = 8
+        assert cache.get("a") == 1
+        timer.now = 11
+        assert cache.get("a") is None
+
+
+    def test_expired_entry_makes_room(self):
+        timer = FakeTimer()
+        cache = GameCache(capacity=1, ttl=10, policy=CachePolicy.TINY_LFU, timer=timer)
+        cache.put("a", 1)
+        for _ in range(5):
+            cache.get("a")
+        timer.now = 20
+        cache.put("b", 2)
+
+        assert cache.get("b") == 2
+        assert cache.getStats()["evictions"] == 0
+
+
+    def test_invalidate(self):
+        cache = GameCache(capacity=2, ttl=10)
+        cache.put("a", 1)
+        cache.invalidate("a")
+        cache.invalidate("missing")
+
+        assert cache.get("a") is None
+        assert cache.getStats()["removals"] == 1
+
+
+    def test_stats_without_ttl_skip_expiry(self):
+        calls = []
+        cache = GameCache(capacity=2, ttl=math.inf, timer=lambda: calls.append(1) or 0.0)
+        cache.put("a", 1)
+        calls.clear()
+
+        assert cache.getStats()["size"] == 1
+        # no expiry sweep over the entries
+        assert calls == []
+
+
+    def test_count_min_sketch_aging(self):
+        sketch = CountMinSketch(16)
+        for _ in range(8):
+            sketch.add("a")
+        assert sketch.estimate("a") >= 8
+        sketch.age()
+        assert sketch.estimate("a") >= 4
+        assert sketch.estimate("a") < 8
@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+
+from mnk.metrics import BUCKETS
+from mnk.repository.game_db_repository import SLOW_POOL_WAIT, getMoveData
+
+
+
+class TestGameDBRepository:
+    """
+    Test cases for reading db rows into games and moves
+    """
+
+    def test_move_data(self):
+        created = datetime(2021, 5, 20, 10, 30, 5, 123, tzinfo=timezone.utc)
+        row = {"pawn": "x", "row": 1, "column": 2, "created": created}
+        assert getMoveData(row).created == created
+
+        # raw sql on sqlite returns the timestamp as text
+        move = getMoveData(dict(row, created="2021-05-20 10:30:05.000123+00:00"))
+        assert (move.pawn, move.row, move.column, move.created) == ("x", 1, 2, created)
+
+
+    def test_slow_pool_wait_is_a_bucket_bound(self):
+        # otherwise waits_over_10ms would count part of a bucket as slow
+        assert SLOW_POOL_WAIT in BUCKETS
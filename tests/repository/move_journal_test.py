@@ -0,0 +1,237 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from mnk.exceptions.mnk_exceptions import ConcurrentUpdateException, JournalLockedException
+from mnk.helpers.tictactoe_helper import copyGame, restoreBoard
+from mnk.models.tictactoe_models import CreateGameRequest
+from mnk.repository.move_journal import MoveJournal, OP_CREATE, OP_MOVES, getMove
+from mnk.svc.tictactoe_service import TicTacToe
+
+
+
+class RecordingWriter:
+    """
+    stands in for the db writer, records every batch written
+    """
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, entries):
+        if self.fail:
+            raise RuntimeError("db down")
+        self.batches.append([entry["seq"] for entry in entries])
+
+
+def newGameWithMove():
+    game = TicTacToe.createGame(CreateGameRequest(mode="TWO_PLAYER", player_1="x"))
+    TicTacToe.makeMove("x", 1, 1, game)
+    return game
+
+
+
+class TestMoveJournal:
+    """
+    Test cases for write-behind move journal
+    """
+
+    def test_append_and_flush(self, tmp_path):
+        writer = RecordingWriter()
+        journal = MoveJournal(str(tmp_path / "moves.journal"), writer, batch_size=2)
+        game = newGameWithMove()
+        asyncio.run(journal.appendCreate(game))
+        asyncio.run(journal.appendMoves(game, game.moves[-1:], game.version))
+        asyncio.run(journal.appendMoves(game, game.moves[-1:], game.version))
+
+        assert journal.getPendingGame(game.id) == game
+        assert journal.getStats()["pending_entries"] == 3
+
+        asyncio.run(journal.flushAll())
+
+        assert writer.batches == [[1, 2], [3]]
+        assert journal.getPendingGame(game.id) is None
+        assert journal.getStats()["pending_entries"] == 0
+        assert journal.getStats()["flushed_entries_total"] == 3
+        assert journal.checkpoint == 3
+
+
+    def test_entries(self, tmp_path):
+        journal = MoveJournal(str(tmp_path / "moves.journal"), RecordingWriter())
+        game = newGameWithMove()
+        asyncio.run(journal.appendCreate(game))
+        asyncio.run(journal.appendMoves(game, game.moves[-1:], game.version))
+
+        create, moves = journal.pending
+        assert create["op"] == OP_CREATE
+        assert create["game"]["id"] == game.id
+        assert moves["op"] == OP_MOVES
+        assert moves["start"] == 0
+        assert moves["moves"][0][:3] == ["x", 1, 1]
+        assert moves["player_turn"] == "o"
+        assert moves["board"] == game.bitboard.getSnapshot()
+
+        # timestamps survive the round trip through the journal
+        assert getMove(moves["moves"][0]) == game.moves[-1]
+        assert getMove(["x", 1, 1, "20/05/2021, 10:30:05:000123"]).created == datetime(2021, 5, 20, 10, 30, 5, 123)
+
+
+    def test_entry_of_restored_game(self, tmp_path):
+        journal = MoveJournal(str(tmp_path / "moves.journal"), RecordingWriter())
+        game = newGameWithMove()
+        # game read back from its snapshot, without the move history
+        restoreBoard(game.bitboard.getSnapshot(), game)
+        TicTacToe.makeMove("o", 0, 0, game)
+        asyncio.run(journal.appendMoves(game, game.moves[-1:], game.version))
+
+        assert journal.pending[0]["start"] == 1
+
+
+    def test_replay_unflushed_after_restart(self, tmp_path):
+        path = str(tmp_path / "moves.journal")
+        journal = MoveJournal(path, RecordingWriter(), batch_size=1)
+        game = newGameWithMove()
+        asyncio.run(journal.appendCreate(game))
+        asyncio.run(journal.appendMoves(game, game.moves[-1:], game.version))
+        # only the first entry makes it to the db before the crash
+        asyncio.run(journal.flush())
+        journal.close()
+
+        writer = RecordingWriter()
+        restarted = MoveJournal(path, writer)
+        assert [entry["seq"] for entry in restarted.pending] == [2]
+
+        asyncio.run(restarted.flushAll())
+        asyncio.run(restarted.appendMoves(game, game.moves[-1:], game.version))
+
+        assert writer.batches == [[2]]
+        # sequence numbers keep increasing after restart
+        assert restarted.pending[0]["seq"] == 3
+
+
+    def test_failed_flush_keeps_entries(self, tmp_path):
+        journal = MoveJournal(str(tmp_path / "moves.journal"), RecordingWriter(fail=True))
+        game = newGameWithMove()
+        asyncio.run(journal.appendCreate(game))
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(journal.flush())
+
+        assert journal.getStats()["pending_entries"] == 1
+        assert journal.getStats()["flush_failures_total"] == 1
+        assert journal.getPendingGame(game.id) == game
+
+
+    def test_concurrent_update_rejected(self, tmp_path):
+        journal = MoveJournal(str(tmp_path / "moves.journal"), RecordingWriter())
+        game = newGameWithMove()
+        asyncio.run(journal.appendCreate(game))
+        # two requests read the game at the same version
+        first, second = copyGame(game), copyGame(game)
+
+        TicTacToe.makeMove("o", 0, 0, first)
+        first.version += 1
+        asyncio.run(journal.appendMoves(first, first.moves[-1:], game.version))
+
+        TicTacToe.makeMove("o", 0, 1, second)
+        second.version += 1
+        with pytest.raises(ConcurrentUpdateException):
+            asyncio.run(journal.appendMoves(second, second.moves[-1:], game.version))
+
+        assert journal.getPendingGame(game.id) == first
+        assert journal.getStats()["pending_entries"] == 2
+
+
+    def test_pending_game_changed_only_by_append(self, tmp_path):
+        journal = MoveJournal(str(tmp_path / "moves.journal"), RecordingWriter())
+        game = newGameWithMove()
+        asyncio.run(journal.appendCreate(game))
+
+        # a request makes a move on its copy, e.g. while waiting on the db for another game of its batch
+        playing = journal.getPendingGame(game.id)
+        TicTacToe.makeMove("o", 0, 0, playing)
+        playing.version += 1
+
+        # other requests do not see the move before it is journaled
+        pending = journal.getPendingGame(game.id)
+        assert len(pending.moves) == 1
+        assert pending.version == 0
+
+        # nor can they build on a copy from before it
+        asyncio.run(journal.appendMoves(playing, playing.moves[-1:], 0))
+        TicTacToe.makeMove("o", 0, 1, pending)
+        pending.version += 1
+        with pytest.raises(ConcurrentUpdateException):
+            asyncio.run(journal.appendMoves(pending, pending.moves[-1:], 0))
+
+
+    def test_journal_used_by_one_process(self, tmp_path):
+        path = str(tmp_path / "moves.journal")
+        journal = MoveJournal(path, RecordingWriter())
+
+        # e.g. a second uvicorn worker started with the same journal path
+        with pytest.raises(JournalLockedException):
+            MoveJournal(path, RecordingWriter())
+
+        journal.close()
+        MoveJournal(path, RecordingWriter()).close()
+
+
+    def test_flush_game(self, tmp_path):
+        writer = RecordingWriter()
+        journal = MoveJournal(str(tmp_path / "moves.journal"), writer, batch_size=1)
+        first, second = newGameWithMove(), newGameWithMove()
+        asyncio.run(journal.appendCreate(first))
+        asyncio.run(journal.appendCreate(second))
+        asyncio.run(journal.appendMoves(first, first.moves[-1:], first.version))
+
+        # entries are written in order, up to the last one of the game
+        asyncio.run(journal.flushGame(second.id))
+        assert writer.batches == [[1], [2]]
+        assert journal.getPendingGame(second.id) is None
+        assert journal.getPendingGame(first.id) == first
+
+        asyncio.run(journal.flushGame(second.id))
+        assert writer.batches == [[1], [2]]
+
+
+    def test_concurrent_flushes_write_once(self, tmp_path):
+        writer = RecordingWriter()
+
+        async def slowWriter(entries):
+            await asyncio.sleep(0.01)
+            await writer(entries)
+
+        journal = MoveJournal(str(tmp_path / "moves.journal"), slowWriter, batch_size=2)
+        game = newGameWithMove()
+        asyncio.run(journal.appendCreate(game))
+        asyncio.run(journal.appendMoves(game, game.moves[-1:], game.version))
+        asyncio.run(journal.appendMoves(game, game.moves[-1:], game.version))
+
+        # e.g. the flush worker and a history request flushing the game
+        async def run():
+            await asyncio.gather(journal.flushAll(), journal.flushGame(game.id), journal.flushGame(game.id))
+
+        asyncio.run(run())
+        assert writer.batches == [[1, 2], [3]]
+        assert journal.checkpoint == 3
+
+
+    def test_group_commit(self, tmp_path):
+        path = str(tmp_path / "moves.journal")
+        journal = MoveJournal(path, RecordingWriter())
+        games = [newGameWithMove() for _ in range(20)]
+
+        async def run():
+            await asyncio.gather(*[journal.appendCreate(game) for game in games])
+
+        # requests appending while a sync is pending share its fsync
+        asyncio.run(run())
+        assert journal.getStats()["syncs_total"] == 1
+        assert journal.getStats()["last_sync_entries"] == 20
+        assert journal.synced_seq == 20
+
+        # and every entry is on disk when its request returns
+        journal.close()
+        assert len(MoveJournal(path, RecordingWriter()).pending) == 20
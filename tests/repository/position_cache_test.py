@@ -0,0 +1,123 @@
+import threading
+
+from mnk.models.bitboard import BitBoard
+from mnk.models.tictactoe_models import Difficulty, GameMode, GameStatus, TicTacToeData
+from mnk.helpers.tictactoe_helper import placePawn
+from mnk.repository.position_cache import OUTCOME_UNKNOWN, PositionCache, getOutcome
+from mnk.repository.table_repository import OUTCOME_DRAW, OUTCOME_WIN
+from mnk.svc.tictactoe_service import TicTacToe
+
+
+
+def getBoard(size: int, stones, transform=lambda row, col: (row, col)) -> BitBoard:
+    bitboard = BitBoard(size, size, 3)
+    for row, col, player in stones:
+        bitboard.place(*transform(row, col), player)
+    return bitboard
+
+
+def getGame(stones, transform) -> TicTacToeData:
+    game = TicTacToeData("game", GameStatus.IN_PROGRESS, None, mode=GameMode.SINGLE_PLAYER, player_1="x",
+        player_2="o", player_turn="o", rows=5, columns=5, win_length=4, difficulty=Difficulty.MEDIUM)
+    for row, col, pawn in stones:
+        placePawn(*transform(row, col), pawn, game)
+    return game
+
+
+ROTATE_90 = lambda row, col: (col, 3 - row)
+MIRROR = lambda row, col: (row, 3 - col)
+
+
+
+class TestPositionCache:
+    """
+    Test cases for the cache of searched positions
+    """
+
+    def test_equivalent_positions_share_entry(self):
+        positions = PositionCache(capacity=10)
+        stones = [(0, 0, 0), (1, 2, 1), (3, 1, 0)]
+        positions.putMove(getBoard(4, stones), 1, Difficulty.MEDIUM, (2, 3), OUTCOME_UNKNOWN)
+
+        # the move comes back in the orientation of the board asked for
+        assert positions.getMove(getBoard(4, stones, ROTATE_90), 1, Difficulty.MEDIUM) == ROTATE_90(2, 3)
+        assert positions.getMove(getBoard(4, stones, MIRROR), 1, Difficulty.MEDIUM) == MIRROR(2, 3)
+        # other difficulty or player to move is another position
+        assert positions.getMove(getBoard(4, stones), 1, Difficulty.HARD) is None
+        assert positions.getMove(getBoard(4, stones), 0, Difficulty.MEDIUM) is None
+        assert positions.getStats()["hits"] == 2
+
+
+    def test_bounded(self):
+        positions = PositionCache(capacity=2)
+        # corner, edge and inner cell, no two are symmetric
+        for row, col in [(0, 0), (0, 1), (1, 1)]:
+            positions.putMove(getBoard(4, [(row, col, 0)]), 1, Difficulty.MEDIUM, (3, 3), OUTCOME_UNKNOWN)
+
+        assert positions.getStats()["size"] == 2
+        assert positions.getStats()["evictions"] == 1
+        assert positions.getMove(getBoard(4, [(0, 0, 0)]), 1, Difficulty.MEDIUM) is None
+
+
+    def test_save_and_load(self, tmp_path):
+        path = str(tmp_path / "positions" / "cache.json")
+        positions = PositionCache(capacity=10)
+        positions.putMove(getBoard(4, [(0, 0, 0)]), 1, Difficulty.MEDIUM, (1, 1), OUTCOME_DRAW)
+        positions.putMove(getBoard(4, [(2, 1, 0)]), 1, Difficulty.HARD, (2, 2), OUTCOME_WIN)
+        positions.save(path)
+
+        loaded = PositionCache(capacity=10)
+        loaded.load(path)
+        assert loaded.getMove(getBoard(4, [(0, 3, 0)]), 1, Difficulty.MEDIUM) == (1, 2)
+        assert loaded.getMove(getBoard(4, [(2, 1, 0)]), 1, Difficulty.HARD) == (2, 2)
+        assert loaded.getStats()["size"] == 2
+
+
+    def test_moves_wait_for_save(self, tmp_path):
+        path = str(tmp_path / "cache.json")
+        positions = PositionCache(capacity=10)
+        positions.putMove(getBoard(4, [(0, 0, 0)]), 1, Difficulty.MEDIUM, (1, 1), OUTCOME_DRAW)
+
+        # held by a save (or stats) while it walks the entries
+        with positions.lock:
+            writer = threading.Thread(target=positions.putMove,
+                args=(getBoard(4, [(0, 1, 0)]), 1, Difficulty.MEDIUM, (1, 1), OUTCOME_DRAW))
+            writer.start()
+            writer.join(0.05)
+            assert writer.is_alive()
+        writer.join()
+        positions.save(path)
+
+        loaded = PositionCache(capacity=10)
+        loaded.load(path)
+        assert loaded.getStats()["size"] == 2
+
+
+    def test_getOutcome(self):
+        assert getOutcome(900, True, 800) == OUTCOME_WIN
+        assert getOutcome(0, True, 800) == OUTCOME_DRAW
+        assert getOutcome(900, False, 800) == OUTCOME_UNKNOWN
+
+
+
+class TestAutoMoveWithPositionCache:
+    """
+    Test cases for computer moves looked up in the position cache
+    """
+
+    def test_search_reused_for_symmetric_position(self):
+        PositionCache.active = PositionCache(capacity=100)
+        try:
+            transform = lambda row, col: (col, 4 - row)
+            stones = [(0, 0, "x"), (2, 2, "o"), (1, 3, "x")]
+            game = getGame(stones, lambda row, col: (row, col))
+            TicTacToe.makeAutoMove(game)
+            rotated = getGame(stones, transform)
+            TicTacToe.makeAutoMove(rotated)
+
+            stats = PositionCache.active.getStats()
+            assert (stats["misses"], stats["hits"]) == (1, 1)
+            last, rotated_last = game.moves[-1], rotated.moves[-1]
+            assert (rotated_last.row, rotated_last.column) == transform(last.row, last.column)
+        finally:
+            PositionCache.active = None
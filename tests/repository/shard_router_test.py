@@ -0,0 +1,96 @@
+from uuid import uuid4
+
+import pytest
+
+from mnk.exceptions.mnk_exceptions import CrossShardBatchException, MisdirectedShardException
+from mnk.repository.shard_router import HashRing, ShardRouter, getNodes
+
+
+NODES = ["http://127.0.0.1:8001", "http://127.0.0.1:8002", "http://127.0.0.1:8003"]
+
+
+
+@pytest.fixture
+def shards():
+    ShardRouter.configure(NODES, NODES[0])
+    yield
+    ShardRouter.configure([], None)
+
+
+
+class TestHashRing:
+    """
+    Test cases for consistent hashing of game ids
+    """
+
+    def test_owner_is_stable(self):
+        keys = [str(uuid4()) for _ in range(100)]
+
+        # same owners whatever the order nodes are listed in, e.g. in another process
+        assert [HashRing(NODES).getNode(key) for key in keys] == [HashRing(NODES[::-1]).getNode(key) for key in keys]
+
+
+    def test_balance(self):
+        ring = HashRing(NODES)
+        owners = [ring.getNode(str(uuid4())) for _ in range(6000)]
+
+        for node in NODES:
+            assert 1500 < owners.count(node) < 2500
+        assert abs(sum(ring.getShares().values()) - 1) < 1e-9
+
+
+    def test_adding_node_moves_only_its_share(self):
+        keys = [str(uuid4()) for _ in range(4000)]
+        before = HashRing(NODES)
+        after = HashRing(NODES + ["http://127.0.0.1:8004"])
+
+        moved = [key for key in keys if before.getNode(key) != after.getNode(key)]
+        # only keys taken over by the new node move
+        assert all(after.getNode(key) == "http://127.0.0.1:8004" for key in moved)
+        assert len(moved) < len(keys) / 3
+
+
+    def test_getNodes(self):
+        assert getNodes(" http://a:1/, http://b:2 ,") == ["http://a:1", "http://b:2"]
+        assert getNodes("") == []
+
+
+
+class TestShardRouter:
+    """
+    Test cases for routing requests to the node owning the game
+    """
+
+    def test_sharding_disabled(self):
+        assert ShardRouter.isOwner("any-game")
+        assert ShardRouter.getForwardNode(["any-game"], None) is None
+
+
+    def test_created_games_are_owned(self, shards):
+        for _ in range(20):
+            assert ShardRouter.isOwner(ShardRouter.getOwnedId(str(uuid4())))
+
+
+    def test_forward_node(self, shards):
+        ring = HashRing(NODES)
+        game_ids = [str(uuid4()) for _ in range(30)]
+        owned = next(game_id for game_id in game_ids if ring.getNode(game_id) == NODES[0])
+        other = next(game_id for game_id in game_ids if ring.getNode(game_id) != NODES[0])
+
+        assert ShardRouter.getForwardNode([owned], None) is None
+        assert ShardRouter.getForwardNode([other, other], None) == ring.getNode(other)
+        # forwarded requests are never forwarded again, and only handled by the owner
+        assert ShardRouter.getForwardNode([owned], NODES[1]) is None
+        with pytest.raises(MisdirectedShardException) as e:
+            ShardRouter.getForwardNode([other], NODES[1])
+        assert ring.getNode(other) in str(e.value)
+        assert ShardRouter.getStats()["misrouted"] >= 1
+        # an empty batch has nothing to route
+        assert ShardRouter.getForwardNode([], None) is None
+        with pytest.raises(CrossShardBatchException):
+            ShardRouter.getForwardNode([owned, other], None)
+
+
+    def test_self_must_be_a_node(self):
+        with pytest.raises(ValueError):
+            ShardRouter.configure(NODES, "http://127.0.0.1:9000")
@@ -0,0 +1,52 @@
+import os
+
+from mnk.models.bitboard import BitBoard
+from mnk.repository.table_repository import OUTCOME_DRAW, OUTCOME_WIN, TABLES_DIR, TableRepo
+from mnk.svc.perfect_play import PerfectPlaySolver
+
+
+
+class TestTableRepo:
+    """
+    Test cases for perfect play tables
+    """
+
+    def test_shipped_table_matches_solver(self):
+        with open(os.path.join(TABLES_DIR, "3x3x3.bin"), "rb") as table_file:
+            shipped = table_file.read()
+
+        solver = PerfectPlaySolver(3, 3, 3)
+        assert shipped[8:] == solver.buildTable()
+        # reachable non terminal positions of tic tac toe, reduced by symmetry
+        assert len(solver.solved) == 627
+
+
+    def test_lookup_empty_board_is_draw(self):
+        table = TableRepo.getTable(3, 3, 3)
+        row, col, outcome = table.lookup(BitBoard(3, 3, 3), 0)
+
+        assert outcome == OUTCOME_DRAW
+        assert 0 <= row < 3 and 0 <= col < 3
+
+
+    def test_lookup_takes_win_in_any_orientation(self):
+        table = TableRepo.getTable(3, 3, 3)
+        # same position rotated: player 1 to move with two in a line, player 0 elsewhere
+        for own, opponent, winning_cell in [
+            (((0, 0), (0, 1)), ((1, 0), (1, 1)), (0, 2)),
+            (((0, 2), (1, 2)), ((0, 1), (1, 1)), (2, 2)),
+            (((2, 2), (2, 1)), ((1, 2), (1, 1)), (2, 0)),
+        ]:
+            bitboard = BitBoard(3, 3, 3)
+            for row, col in own:
+                bitboard.place(row, col, 1)
+            for row, col in opponent:
+                bitboard.place(row, col, 0)
+
+            row, col, outcome = table.lookup(bitboard, 1)
+            assert outcome == OUTCOME_WIN
+            assert (row, col) == winning_cell
+
+
+    def test_getTable_missing_config(self):
+        assert TableRepo.getTable(7, 7, 4) is None
@@ -0,0 +1,178 @@
+import asyncio
+import os
+import random
+
+import pytest
+
+# end to end through the app, needs the database from docker-compose
+if "DATABASE_URL" not in os.environ:
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+httpx = pytest.importorskip("httpx")
+app_module = pytest.importorskip("mnk.app")
+
+from mnk.database import getDatabase
+from mnk.migrations import migrate
+from mnk.repository.game_db_repository import GameDBRepo
+from mnk.repository.game_repository import GameRepo, getCacheBackend
+from mnk.repository.move_journal import MoveJournal
+
+
+PARALLEL_REQUESTS = 8
+ROUNDS = 8
+
+
+
+def setup_module():
+    migrate()
+    # the requests below run without the app's startup, which builds the cache backend
+    GameRepo.backend = getCacheBackend()
+
+
+
+async def playConcurrently():
+    """
+    Every turn, the player to move fires PARALLEL_REQUESTS moves at once (including a double submit
+    of the same cell). Exactly one of them may be made, the rest must fail cleanly.
+    """
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/tictactoe/", json={"mode": "TWO_PLAYER", "player_1": "x",
+            "rows": 5, "columns": 5, "win_length": 5})
+        assert response.status_code == 200
+        game_id, turn = response.json()["game_id"], response.json()["player_turn"]
+
+        vacant = [(row, col) for row in range(5) for col in range(5)]
+        random.shuffle(vacant)
+        for _ in range(ROUNDS):
+            cells = [vacant[0]] + vacant[:PARALLEL_REQUESTS - 1]
+            responses = await asyncio.gather(*[client.post("/tictactoe/move",
+                json={"game_id": game_id, "pawn": turn, "row": row, "column": col}) for row, col in cells])
+
+            made = [response for response in responses if response.status_code == 200]
+            assert len(made) == 1
+            assert all(response.status_code in (400, 409) for response in responses if response.status_code != 200)
+
+            last_move = made[0].json()["moves"][-1]
+            vacant.remove((last_move["row"], last_move["column"]))
+            turn = made[0].json()["player_turn"]
+
+    return game_id
+
+
+
+class TestConcurrentMoves:
+    """
+    Concurrency stress test for making moves in one game
+    """
+
+    def test_parallel_moves_keep_board_consistent(self):
+        async def run():
+            await getDatabase().connect()
+            try:
+                game_id = await playConcurrently()
+                game = await GameDBRepo.getGame(game_id)
+                # read from its board snapshot, the move history is loaded separately
+                await GameDBRepo.loadMoves(game)
+                return game
+            finally:
+                await getDatabase().disconnect()
+
+        game = asyncio.run(run())
+
+        assert len(game.moves) == ROUNDS
+        assert game.version == ROUNDS
+        # players alternate and no cell is played twice
+        assert [move.pawn for move in game.moves] == [game.player_1, game.player_2] * (ROUNDS // 2)
+        assert len({(move.row, move.column) for move in game.moves}) == ROUNDS
+        assert game.number_of_vacant_cells == 25 - ROUNDS
+
+
+
+async def pageThroughHistory():
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/tictactoe/", json={"mode": "TWO_PLAYER", "player_1": "x"})
+        game_id = response.json()["game_id"]
+        for pawn, row, col in [("x", 0, 0), ("o", 1, 1), ("x", 0, 1), ("o", 2, 2), ("x", 1, 0)]:
+            response = await client.post("/tictactoe/move", json={"game_id": game_id, "pawn": pawn, "row": row, "column": col})
+            # only the new move is returned
+            assert [(move["row"], move["column"]) for move in response.json()["moves"]] == [(row, col)]
+
+        pages, cursor = [], 0
+        while cursor is not None:
+            page = (await client.get(f"/tictactoe/{game_id}/moves", params={"after": cursor, "limit": 2})).json()
+            pages.append([(move["pawn"], move["row"], move["column"]) for move in page["moves"]])
+            cursor = page["next_cursor"]
+
+        history = await client.post("/tictactoe/move", params={"history": "true"},
+            json={"game_id": game_id, "pawn": "o", "row": 2, "column": 0})
+        missing = await client.get("/tictactoe/no-such-game/moves")
+
+    return pages, history.json(), missing.status_code
+
+
+
+class TestMoveHistory:
+    """
+    Test cases for move history pagination
+    """
+
+    def test_pages(self):
+        async def run():
+            await getDatabase().connect()
+            try:
+                return await pageThroughHistory()
+            finally:
+                await getDatabase().disconnect()
+
+        pages, history, missing_status = asyncio.run(run())
+
+        assert pages == [[("x", 0, 0), ("o", 1, 1)], [("x", 0, 1), ("o", 2, 2)], [("x", 1, 0)]]
+        assert len(history["moves"]) == 6
+        assert missing_status == 400
+
+
+    def test_pages_in_write_behind_mode(self, tmp_path):
+        async def run():
+            await getDatabase().connect()
+            MoveJournal.active = MoveJournal(str(tmp_path / "moves.journal"), GameDBRepo.saveJournalEntries)
+            try:
+                # moves still in the journal, the flush worker is not running
+                return await pageThroughHistory()
+            finally:
+                MoveJournal.active.close()
+                MoveJournal.active = None
+                await getDatabase().disconnect()
+
+        pages, history, missing_status = asyncio.run(run())
+
+        assert pages == [[("x", 0, 0), ("o", 1, 1)], [("x", 0, 1), ("o", 2, 2)], [("x", 1, 0)]]
+        assert len(history["moves"]) == 6
+        assert missing_status == 400
+
+
+
+
+class TestGameWebSocket:
+    """
+    Test cases for playing a game over its websocket
+    """
+
+    def test_move_events(self):
+        from fastapi.testclient import TestClient
+
+        with TestClient(app_module.app) as client:
+            game_id = client.post("/tictactoe/", json={"mode": "TWO_PLAYER", "player_1": "x"}).json()["game_id"]
+            with client.websocket_connect(f"/tictactoe/ws/{game_id}") as websocket:
+                assert websocket.receive_json()["event"] == "state"
+
+                # moves made through the api are pushed
+                client.post("/tictactoe/move", json={"game_id": game_id, "pawn": "x", "row": 0, "column": 0})
+                assert websocket.receive_json()["placed"] == [[0, 0, "x"]]
+
+                # and the client's own moves are acknowledged
+                websocket.send_json({"pawn": "o", "row": 1, "column": 1})
+                event = websocket.receive_json()
+                assert event["placed"] == [[1, 1, "o"]]
+                assert event["player_turn"] == "x"
@@ -0,0 +1,106 @@
+import asyncio
+
+from mnk.helpers.tictactoe_helper import getMoveEvent, placePawn
+from mnk.models.tictactoe_models import GameMode, GameStatus, Move, TicTacToeData
+from mnk.svc.game_channels import GameChannels
+
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.events = []
+        self.close_code = None
+
+    async def send_json(self, event):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("closed")
+        self.events.append(event)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+
+class TestGameChannels:
+    """
+    Test cases for pushing move events to websocket clients
+    """
+
+    def setup_method(self):
+        GameChannels.subscribers = {}
+        GameChannels.sends = {}
+        GameChannels.dropped = 0
+
+
+    def test_publish_to_game_subscribers(self):
+        player_1, player_2, other_game = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        GameChannels.subscribe("game-1", player_1)
+        GameChannels.subscribe("game-1", player_2)
+        GameChannels.subscribe("game-2", other_game)
+
+        sent = asyncio.run(GameChannels.publish("game-1", {"event": "move"}))
+
+        assert sent == 2
+        assert player_1.events == player_2.events == [{"event": "move"}]
+        assert other_game.events == []
+        assert GameChannels.getStats() == {"games": 2, "subscribers": 3, "dropped": 0}
+
+
+    def test_failed_and_slow_clients_are_dropped(self, monkeypatch):
+        monkeypatch.setattr(GameChannels, "SEND_TIMEOUT", 0.05)
+        ok, closed, slow = FakeWebSocket(), FakeWebSocket(fail=True), FakeWebSocket(delay=1)
+        for websocket in (ok, closed, slow):
+            GameChannels.subscribe("game-1", websocket)
+
+        sent = asyncio.run(GameChannels.publish("game-1", {"event": "move"}))
+
+        assert sent == 1
+        assert GameChannels.subscribers == {"game-1": {ok}}
+        assert GameChannels.getStats()["dropped"] == 2
+        # dropped clients are told, they no longer get events
+        assert closed.close_code == slow.close_code == GameChannels.DROP_CLOSE_CODE
+        assert ok.close_code is None
+
+
+    def test_notify_does_not_wait_for_clients(self, monkeypatch):
+        monkeypatch.setattr(GameChannels, "SEND_TIMEOUT", 0.5)
+        ok, slow = FakeWebSocket(), FakeWebSocket(delay=0.05)
+        GameChannels.subscribe("game-1", ok)
+        GameChannels.subscribe("game-1", slow)
+
+        async def run():
+            GameChannels.notify("game-1", {"version": 1})
+            GameChannels.notify("game-1", {"version": 2})
+            # the moves are answered before their events reach the slow client
+            assert slow.events == []
+            await asyncio.gather(*GameChannels.sends.values())
+
+        asyncio.run(run())
+
+        # in order, one event of the game after the other
+        assert ok.events == slow.events == [{"version": 1}, {"version": 2}]
+        assert GameChannels.sends == {}
+
+
+    def test_unsubscribe(self):
+        websocket = FakeWebSocket()
+        GameChannels.subscribe("game-1", websocket)
+        GameChannels.unsubscribe("game-1", websocket)
+        GameChannels.unsubscribe("game-1", websocket)
+
+        assert GameChannels.subscribers == {}
+        assert asyncio.run(GameChannels.publish("game-1", {"event": "move"})) == 0
+
+
+    def test_move_event(self):
+        game = TicTacToeData("game-1", GameStatus.IN_PROGRESS, None, mode=GameMode.SINGLE_PLAYER,
+            player_1="x", player_2="o", player_turn="x", version=4)
+        moves = [Move("x", 0, 0, None), Move("o", 1, 1, None)]
+        for move in moves:
+            placePawn(move.row, move.column, move.pawn, game)
+
+        assert getMoveEvent(game, moves) == {"event": "move", "game_id": "game-1", "version": 4,
+            "placed": [[0, 0, "x"], [1, 1, "o"]], "game_status": "IN_PROGRESS", "player_turn": "x"}
@@ -0,0 +1,79 @@
+import random
+import time
+
+from mnk.models.bitboard import BitBoard
+from mnk.models.tictactoe_models import CreateGameRequest, Difficulty, GameStatus
+from mnk.svc.negamax_search import NegamaxSearch, TranspositionTable
+from mnk.svc.tictactoe_service import TicTacToe
+
+
+
+class TestNegamaxSearch:
+    """
+    Test cases for search based computer player
+    """
+
+    def test_takes_winning_move(self):
+        bitboard = BitBoard(3, 3, 3)
+        for row, col in ((0, 0), (0, 1)):
+            bitboard.place(row, col, 1)
+        for row, col in ((1, 0), (1, 1)):
+            bitboard.place(row, col, 0)
+
+        search = NegamaxSearch(3, 3, 3)
+        assert search.findMove(bitboard, 1, Difficulty.HARD) == (0, 2)
+
+
+    def test_blocks_losing_move(self):
+        bitboard = BitBoard(3, 3, 3)
+        for row, col in ((0, 0), (1, 1)):
+            bitboard.place(row, col, 0)
+        bitboard.place(0, 2, 1)
+
+        search = NegamaxSearch(3, 3, 3)
+        assert search.findMove(bitboard, 1, Difficulty.HARD) == (2, 2)
+
+
+    def test_hard_never_loses_3x3(self):
+        rng = random.Random(7)
+        for game_number in range(60):
+            request = {
+                        "mode": "SINGLE_PLAYER",
+                        "player_1": "x" if game_number % 2 else "o",
+                        "difficulty": "HARD"
+                    }
+            game = TicTacToe.createGame(CreateGameRequest(**request))
+            while game.status == GameStatus.IN_PROGRESS:
+                row, col = rng.choice(list(game.bitboard.vacantCells()))
+                TicTacToe.makeMove(game.player_1, row, col, game)
+                TicTacToe.makeAutoMove(game)
+
+            assert game.status != GameStatus.PLAYER_1_WINS
+
+
+    def test_gomoku_move_within_budget(self):
+        bitboard = BitBoard(15, 15, 5)
+        for col in range(3, 7):
+            bitboard.place(7, col, 0)
+        for col in range(3, 5):
+            bitboard.place(8, col, 1)
+        bitboard.place(7, 2, 1)
+
+        search = NegamaxSearch(15, 15, 5)
+        start = time.perf_counter()
+        location = search.findMove(bitboard, 1, Difficulty.HARD)
+
+        assert location == (7, 7)
+        assert time.perf_counter() - start < 1
+
+
+    def test_transposition_table_eviction(self):
+        table = TranspositionTable(max_size=2)
+        table.put(1, 1, 0, 0, 0)
+        table.put(2, 1, 0, 0, 0)
+        table.get(1)
+        table.put(3, 1, 0, 0, 0)
+
+        assert len(table) == 2
+        assert table.get(2) is None
+        assert table.get(1) is not None
@@ -0,0 +1,38 @@
+import json
+
+from mnk.models.tictactoe_models import CreateGameRequest, GameMode
+from mnk.svc.simulation import SimulationConfig, playGame, simulate
+from mnk.svc.tictactoe_service import TicTacToe
+
+
+
+class TestSimulation:
+    """
+    Test cases for headless self-play
+    """
+
+    def test_records_replay(self):
+        config = SimulationConfig(rows=4, columns=4, win_length=3, player_1="random", player_2="corner")
+        for number in range(20):
+            record = playGame(config, number)
+            game = TicTacToe.createGame(CreateGameRequest(mode=GameMode.TWO_PLAYER, player_1="x", rows=4, columns=4, win_length=3))
+            for cell in record["moves"]:
+                TicTacToe.makeMove(game.player_turn, cell // 4, cell % 4, game)
+
+            assert game.status.value == record["status"]
+
+
+    def test_same_games_with_any_number_of_workers(self):
+        config = SimulationConfig(seed=3)
+        single = list(simulate(config, 300, workers=1))
+        pooled = list(simulate(config, 300, workers=2))
+
+        assert single == pooled
+        assert [json.loads(record)["game"] for _, record in single] == list(range(300))
+
+
+    def test_hard_never_loses(self):
+        config = SimulationConfig(player_1="random", player_2="hard")
+        statuses = [status for status, _ in simulate(config, 200, workers=1)]
+
+        assert "PLAYER_1_WINS" not in statuses
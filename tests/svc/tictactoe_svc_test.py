@@ -1,10 +1,14 @@
+import asyncio
+import time
 from datetime import datetime
-from mnk.exceptions.mnk_exceptions import IllegalPlayerTurnException, InvalidGameStateException, InvalidMoveException
+from mnk.exceptions.mnk_exceptions import IllegalPlayerTurnException, InvalidGameConfigException, InvalidGameStateException, InvalidMoveException
 
 import pytest
 
+from mnk.svc import tictactoe_service
 from mnk.svc.tictactoe_service import TicTacToe
-from mnk.models.tictactoe_models import CreateGameRequest, GameMode, GameStatus, TicTacToeData
+from mnk.svc.negamax_search import SEARCH_BUDGETS
+from mnk.models.tictactoe_models import CreateGameRequest, Difficulty, GameMode, GameStatus, TicTacToeData
 from mnk.models.tictactoe_constants import Constants
 
 
@@ -116,4 +120,82 @@ class TestTicTacToeSvc:
         assert game.moves[0].row == 0
         assert game.moves[0].column == 0
         assert game.board[0][0] == "o"
-        assert game.player_turn == "x"
\ No newline at end of file
+        assert game.player_turn == "x"
+
+    def test_makeMove_gomoku_win(self):
+        request = {
+                    "mode": "TWO_PLAYER",
+                    "player_1": "x",
+                    "rows": 15,
+                    "columns": 15,
+                    "win_length": 5
+                }
+        game = TicTacToe.createGame(CreateGameRequest(**request))
+
+        for col in range(4):
+            TicTacToe.makeMove("x", 7, col, game)
+            TicTacToe.makeMove("o", 8, col, game)
+        TicTacToe.makeMove("x", 7, 4, game)
+
+        assert len(game.board) == 15
+        assert game.number_of_vacant_cells == 15*15 - 9
+        assert game.status == GameStatus.PLAYER_1_WINS
+
+
+    def test_createGame_invalid_board_config(self):
+        request = {
+                    "mode": "TWO_PLAYER",
+                    "player_1": "x",
+                    "rows": 3,
+                    "columns": 3,
+                    "win_length": 4
+                }
+
+        with pytest.raises(InvalidGameConfigException) as e:
+            TicTacToe.createGame(CreateGameRequest(**request))
+
+        assert str(e.value) == "Win length must fit on the board."
+
+
+    def test_makeAutoMoveAsync(self):
+        request = {
+                    "mode": "SINGLE_PLAYER",
+                    "player_1": "x",
+                    "rows": 4,
+                    "columns": 4,
+                    "difficulty": "HARD"
+                }
+        game = TicTacToe.createGame(CreateGameRequest(**request))
+        TicTacToe.makeMove("x", 0, 0, game)
+
+        asyncio.run(TicTacToe.makeAutoMoveAsync(game))
+
+        assert len(game.moves) == 2
+        assert game.moves[1].pawn == game.player_2
+        assert game.player_turn == "x"
+
+
+    def test_concurrent_searches_keep_to_budget(self, monkeypatch):
+        # 8 HARD moves at once on a board without a perfect play table, each searched to its time budget
+        monkeypatch.setattr(tictactoe_service, "search_executor", None)
+        games = []
+        for _ in range(8):
+            game = TicTacToe.createGame(CreateGameRequest(mode="SINGLE_PLAYER", player_1="x",
+                rows=10, columns=10, win_length=10, difficulty="HARD"))
+            TicTacToe.makeMove("x", 4, 4, game)
+            games.append(game)
+
+        async def run():
+            await tictactoe_service.startSearchProcesses(4)
+            try:
+                start = time.perf_counter()
+                await asyncio.gather(*[TicTacToe.makeAutoMoveAsync(game) for game in games])
+                return time.perf_counter() - start
+            finally:
+                tictactoe_service.stopSearchProcesses()
+
+        elapsed = asyncio.run(run())
+
+        # the budget includes the wait for a search process, one search after the other would take 8 budgets
+        assert elapsed < 2 * SEARCH_BUDGETS[Difficulty.HARD]["time_limit"]
+        assert all(len(game.moves) == 2 and game.player_turn == "x" for game in games)